@@ -0,0 +1,29 @@
+"""Add attempts to generation_jobs
+
+Revision ID: a2b4d6f8c0e1
+Revises: f1a3c5e7b9d2
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2b4d6f8c0e1'
+down_revision: Union[str, Sequence[str], None] = 'f1a3c5e7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # How many times a worker has claimed the job (caps automatic retries)
+    op.add_column('generation_jobs', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('generation_jobs', 'attempts')
@@ -0,0 +1,29 @@
+"""Add colors to generation_jobs
+
+Revision ID: a4c6e8f0b2d5
+Revises: f2c4e6a8b0d3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c6e8f0b2d5'
+down_revision: Union[str, Sequence[str], None] = 'f2c4e6a8b0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Colors of a POST /generate/batch job (NULL for single-color jobs)
+    op.add_column('generation_jobs', sa.Column('colors', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('generation_jobs', 'colors')
@@ -0,0 +1,53 @@
+"""Add job leases and workers table
+
+Revision ID: b3c5e7a9d1f2
+Revises: a2b4d6f8c0e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c5e7a9d1f2'
+down_revision: Union[str, Sequence[str], None] = 'a2b4d6f8c0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lease held by the worker processing a job
+    op.add_column('generation_jobs', sa.Column('worker_id', sa.String(), nullable=True))
+    op.add_column('generation_jobs', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_generation_jobs_lease_expires_at'), 'generation_jobs', ['lease_expires_at'], unique=False)
+
+    op.create_table('workers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(), nullable=False),
+    sa.Column('hostname', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('current_job_id', sa.String(), nullable=True),
+    sa.Column('jobs_completed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('jobs_failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('images_generated', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('busy_seconds', sa.Float(), server_default='0', nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('last_heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_workers_id'), 'workers', ['id'], unique=False)
+    op.create_index(op.f('ix_workers_worker_id'), 'workers', ['worker_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_workers_worker_id'), table_name='workers')
+    op.drop_index(op.f('ix_workers_id'), table_name='workers')
+    op.drop_table('workers')
+    op.drop_index(op.f('ix_generation_jobs_lease_expires_at'), table_name='generation_jobs')
+    op.drop_column('generation_jobs', 'lease_expires_at')
+    op.drop_column('generation_jobs', 'worker_id')
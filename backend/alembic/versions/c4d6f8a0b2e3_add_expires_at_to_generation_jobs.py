@@ -0,0 +1,32 @@
+"""Add expires_at to generation_jobs
+
+Revision ID: c4d6f8a0b2e3
+Revises: b3c5e7a9d1f2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d6f8a0b2e3'
+down_revision: Union[str, Sequence[str], None] = 'b3c5e7a9d1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Pending jobs past this are skipped by workers and marked "expired";
+    # existing rows keep NULL (never expire)
+    op.add_column('generation_jobs', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_generation_jobs_expires_at'), 'generation_jobs', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_generation_jobs_expires_at'), table_name='generation_jobs')
+    op.drop_column('generation_jobs', 'expires_at')
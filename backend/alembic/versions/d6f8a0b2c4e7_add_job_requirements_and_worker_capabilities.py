@@ -0,0 +1,32 @@
+"""Add requirements to generation_jobs and capabilities to workers
+
+Revision ID: d6f8a0b2c4e7
+Revises: c4d6f8a0b2e3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6f8a0b2c4e7'
+down_revision: Union[str, Sequence[str], None] = 'c4d6f8a0b2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL requirements: any worker may run the job; NULL capabilities: the
+    # worker predates routing and claims in plain FIFO order
+    op.add_column('generation_jobs', sa.Column('requirements', sa.JSON(), nullable=True))
+    op.add_column('workers', sa.Column('capabilities', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('workers', 'capabilities')
+    op.drop_column('generation_jobs', 'requirements')
@@ -0,0 +1,30 @@
+"""Add passed_over to generation_jobs
+
+Revision ID: e8b0c2d4f6a9
+Revises: d6f8a0b2c4e7
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b0c2d4f6a9'
+down_revision: Union[str, Sequence[str], None] = 'd6f8a0b2c4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Times a CLAIM_POLICY=affinity claim took a younger job ahead of this one
+    # (capped by AFFINITY_MAX_PASSES)
+    op.add_column('generation_jobs', sa.Column('passed_over', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('generation_jobs', 'passed_over')
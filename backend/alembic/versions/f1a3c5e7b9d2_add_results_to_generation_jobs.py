@@ -0,0 +1,30 @@
+"""Add per-cut results to generation_jobs
+
+Revision ID: f1a3c5e7b9d2
+Revises: e7f2a5b4c8d1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a3c5e7b9d2'
+down_revision: Union[str, Sequence[str], None] = 'e7f2a5b4c8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-cut results (url + metadata) so partial output is visible while processing
+    op.add_column('generation_jobs', sa.Column('results', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('generation_jobs', 'results')
@@ -0,0 +1,40 @@
+"""Add generation_profiles table
+
+Revision ID: f2c4e6a8b0d3
+Revises: e8b0c2d4f6a9
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c4e6a8b0d3'
+down_revision: Union[str, Sequence[str], None] = 'e8b0c2d4f6a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Named generation profiles, selectable per job (GenerationRequest.profile)
+    op.create_table('generation_profiles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('settings', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_generation_profiles_id'), 'generation_profiles', ['id'], unique=False)
+    op.create_index(op.f('ix_generation_profiles_name'), 'generation_profiles', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_generation_profiles_name'), table_name='generation_profiles')
+    op.drop_index(op.f('ix_generation_profiles_id'), table_name='generation_profiles')
+    op.drop_table('generation_profiles')
@@ -5,6 +5,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 
 from app.generation.models import GenerationJob  # Updated import
+from app.generation.queue import JobQueue, get_job_queue
+from app.generation.queue.base import RETRYABLE_STATUSES
+from app.core.config import JOB_TTL_SECONDS
 from app.admin.generations import schemas
 from app.admin.dependencies import get_db
 
@@ -16,7 +19,7 @@ def list_generations(
     db: Session = Depends(get_db),
     family_id: str | None = Query(None, description="Filter by family_id"),
     color_id: str | None = Query(None, description="Filter by color_id"),
-    status_filter: str | None = Query(None, regex="^(pending|processing|completed|failed)$"),
+    status_filter: str | None = Query(None, regex="^(pending|processing|completed|failed|expired)$"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
 ):
@@ -115,6 +118,22 @@ def get_generation(job_id: str, db: Session = Depends(get_db)):
     return job
 
 
+@router.post("/{job_id}/retry", response_model=schemas.GenerationJobRead)
+def retry_generation(job_id: str, db: Session = Depends(get_db), queue: JobQueue = Depends(get_job_queue)):
+    """
+    Re-queue a failed or expired job. Cuts that already finished are kept, so
+    the worker only renders the missing ones (with the same derived seeds).
+    """
+    job = queue.get(job_id)
+    if not job:
+        raise HTTPException(404, "Generation job not found")
+    if job.status not in RETRYABLE_STATUSES or queue.retry(job_id, ttl_seconds=JOB_TTL_SECONDS) is None:
+        raise HTTPException(409, f"Only failed or expired jobs can be retried (status={job.status})")
+
+    # The transition went through the queue; the response is the stored row
+    return db.query(GenerationJob).filter(GenerationJob.job_id == job_id).first()
+
+
 @router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_generation(job_id: str, db: Session = Depends(get_db)):
     """Delete a generation job and its metadata (images remain in storage)."""
@@ -1,6 +1,6 @@
 """Pydantic schemas for generation job management."""
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -13,8 +13,15 @@ class GenerationJobRead(BaseModel):
     color_id: str
     cuts: List[str]
     seed: Optional[int] = None
+    requirements: Optional[Dict[str, Any]] = None
     result_urls: Optional[List[str]] = None
+    results: Optional[List[Dict[str, Any]]] = None
     error_message: Optional[str] = None
+    attempts: int = 0
+    passed_over: int = 0
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     started_at: Optional[datetime] = None
@@ -0,0 +1,5 @@
+"""Worker fleet visibility submodule."""
+
+from app.admin.workers.router import router
+
+__all__ = ["router"]
@@ -0,0 +1,46 @@
+# app/admin/workers/router.py
+"""Admin endpoints for worker liveness and capacity."""
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.generation.models import Worker
+from app.generation.queue.routing import WORKER_STALE_SECONDS
+from app.admin.workers import schemas
+from app.admin.dependencies import get_db
+
+router = APIRouter(prefix="/admin/workers", tags=["admin:workers"])
+
+
+def _to_read(worker: Worker, now: datetime) -> schemas.WorkerRead:
+    alive = worker.status != "stopped" and \
+        now - worker.last_heartbeat_at < timedelta(seconds=WORKER_STALE_SECONDS)
+    busy_hours = (worker.busy_seconds or 0) / 3600
+    return schemas.WorkerRead(
+        worker_id=worker.worker_id,
+        hostname=worker.hostname,
+        status=worker.status if alive or worker.status == "stopped" else "dead",
+        current_job_id=worker.current_job_id if alive else None,
+        alive=alive,
+        capabilities=worker.capabilities,
+        jobs_completed=worker.jobs_completed,
+        jobs_failed=worker.jobs_failed,
+        images_generated=worker.images_generated,
+        images_per_hour=round(worker.images_generated / busy_hours, 1) if busy_hours else 0.0,
+        started_at=worker.started_at,
+        last_heartbeat_at=worker.last_heartbeat_at,
+    )
+
+
+@router.get("", response_model=list[schemas.WorkerRead])
+def list_workers(
+    db: Session = Depends(get_db),
+    include_dead: bool = Query(False, description="Include stopped/stale workers"),
+):
+    """List generation workers with liveness, current job and throughput."""
+    now = datetime.utcnow()
+    workers = db.query(Worker).order_by(desc(Worker.last_heartbeat_at)).all()
+    items = [_to_read(w, now) for w in workers]
+    return items if include_dead else [w for w in items if w.alive]
@@ -0,0 +1,22 @@
+"""Pydantic schemas for generation worker status."""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class WorkerRead(BaseModel):
+    worker_id: str
+    hostname: Optional[str] = None
+    status: str
+    current_job_id: Optional[str] = None
+    alive: bool
+    capabilities: Optional[Dict[str, Any]] = None
+    jobs_completed: int
+    jobs_failed: int
+    images_generated: int
+    images_per_hour: float
+    started_at: datetime
+    last_heartbeat_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
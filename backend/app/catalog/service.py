@@ -1,12 +1,23 @@
 import json
+from functools import lru_cache
 from pathlib import Path
+from typing import List, Optional
 from app.catalog.schemas import CatalogResponse, Family, Color
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "fabrics.json"
 
-def load_catalog() -> CatalogResponse:
+@lru_cache(maxsize=1)
+def _load_raw() -> dict:
+    """fabrics.json, parsed once per process (it ships with the code; callers must not mutate it)."""
     with open(DATA_PATH, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+        return json.load(f)
+
+@lru_cache(maxsize=1)
+def _families_by_id() -> dict:
+    return {fam["family_id"]: fam for fam in _load_raw().get("families", [])}
+
+def load_catalog() -> CatalogResponse:
+    raw = _load_raw()
     families = []
     for fam in raw.get("families", []):
         colors = [Color(**c) for c in fam.get("colors", [])]
@@ -18,3 +29,13 @@ def load_catalog() -> CatalogResponse:
             colors=colors
         ))
     return CatalogResponse(families=families)
+
+def family_lora_id(family_id: str) -> Optional[str]:
+    """LoRA adapter a family is rendered with (fabrics.json lora_id), if any."""
+    fam = _families_by_id().get(family_id)
+    return fam.get("lora_id") if fam is not None else None
+
+def family_colors(family_id: str) -> Optional[List[Color]]:
+    """A family's colors (fabrics.json), or None for an unknown family."""
+    fam = _families_by_id().get(family_id)
+    return [Color(**c) for c in fam.get("colors", [])] if fam is not None else None
@@ -24,6 +24,10 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# Pending jobs older than this are never rendered: the frontend stops polling
+# after maxWaitMs (5 min), so nobody would see the images.
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "300"))
+
 # single source of truth for the rest of the app
 PUBLIC_BASE_URL: str | None = settings.public_base_url
 
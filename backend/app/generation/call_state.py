@@ -0,0 +1,124 @@
+"""
+Per-call pipeline state, so one loaded pipeline can serve concurrent renders.
+
+diffusers keeps per-request knobs on shared objects: set_ip_adapter_scale()
+writes the scale into the UNet's attention processors, and every pipeline
+call stores its guidance scale, timestep count and interrupt flag on the
+pipeline and steps the pipeline's one scheduler. Two renders on the same
+pipeline (threads, or a batch split across calls) would see each other's.
+
+- enable_call_scale(unet) turns the UNet's IP-Adapter processors into ones
+  that read the scale of the current call, set with
+  `with ip_adapter_scale(0.7): pipe(...)`. The value lives in a ContextVar,
+  so each thread sees its own; without one the loaded scale applies.
+- pipeline_for_call(pipe) is a copy of pipe for one call: the same modules,
+  its own scheduler and call attributes.
+- pipeline_replica(pipe) is the same for a long-lived replica in a
+  pipeline_pool.PipelinePool.
+"""
+from __future__ import annotations
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Sequence, Union
+
+import torch
+from diffusers.models.attention_processor import IPAdapterAttnProcessor, IPAdapterAttnProcessor2_0
+
+Scale = Union[float, Sequence[float]]  # one value, or one per loaded IP-Adapter
+
+_call_scale: ContextVar[Optional[Scale]] = ContextVar("ip_adapter_scale", default=None)
+
+
+@contextmanager
+def ip_adapter_scale(scale: Scale) -> Iterator[None]:
+    """IP-Adapter scale for pipeline calls made inside the block (this thread only)."""
+    token = _call_scale.set(scale)
+    try:
+        yield
+    finally:
+        _call_scale.reset(token)
+
+
+def _per_adapter(scale: Scale, count: int) -> List[float]:
+    if isinstance(scale, (int, float)):
+        return [float(scale)] * count
+    scales = [float(s) for s in scale]
+    if len(scales) != count:
+        raise ValueError(f"ip_adapter_scale has {len(scales)} values for {count} loaded IP-Adapters")
+    return scales
+
+
+class _CallScale:
+    """Mixin for IP-Adapter attention processors: the call's scale overrides self.scale."""
+
+    def __call__(self, attn, hidden_states, *args, **kwargs):
+        scale = _call_scale.get()
+        if scale is None:
+            return super().__call__(attn, hidden_states, *args, **kwargs)
+        # A shallow copy shares the to_k_ip / to_v_ip weights; only .scale differs
+        view = copy.copy(self)
+        view.scale = _per_adapter(scale, len(self.scale))
+        return super(_CallScale, view).__call__(attn, hidden_states, *args, **kwargs)
+
+
+class CallScaledIPAdapterAttnProcessor(_CallScale, IPAdapterAttnProcessor):
+    pass
+
+
+class CallScaledIPAdapterAttnProcessor2_0(_CallScale, IPAdapterAttnProcessor2_0):
+    pass
+
+
+_CALL_SCALED = {
+    IPAdapterAttnProcessor: CallScaledIPAdapterAttnProcessor,
+    IPAdapterAttnProcessor2_0: CallScaledIPAdapterAttnProcessor2_0,
+}
+
+
+def enable_call_scale(unet) -> int:
+    """
+    Let ip_adapter_scale() set the scale of the UNet's IP-Adapter processors
+    per call. Call after load_ip_adapter(), which installs new processors.
+    Returns how many processors were converted.
+    """
+    converted = 0
+    for processor in unet.attn_processors.values():
+        call_scaled = _CALL_SCALED.get(type(processor))
+        if call_scaled is not None:
+            processor.__class__ = call_scaled  # same layout and weights, no copy
+            converted += 1
+    return converted
+
+
+def call_scaled(unet) -> bool:
+    """Whether enable_call_scale() converted any of unet's processors."""
+    return any(isinstance(processor, _CallScale) for processor in unet.attn_processors.values())
+
+
+def pipeline_for_call(pipe):
+    """pipe's modules with a scheduler and call attributes of their own."""
+    view = copy.copy(pipe)
+    view.scheduler = copy.deepcopy(pipe.scheduler)  # rebinds view's config only
+    return view
+
+
+def pipeline_replica(pipe, mode: str = "shared", vae=None):
+    """
+    A replica of pipe for a PipelinePool (None stays None). "copy" deep-copies
+    the weights; "shared" is pipeline_for_call() plus, for an fp16 VAE that
+    upcasts to fp32 while decoding (SDXL's force_upcast), a VAE of its own,
+    since that upcast converts the shared module in place mid-call. vae
+    replaces pipe's (a refiner replica decodes with its base replica's).
+    """
+    if pipe is None:
+        return None
+    if mode == "copy":
+        return copy.deepcopy(pipe, {id(pipe.vae): vae} if vae is not None else {})
+    replica = pipeline_for_call(pipe)
+    own = getattr(pipe, "vae", None)
+    if vae is None and own is not None and own.config.force_upcast and own.dtype == torch.float16:
+        vae = copy.deepcopy(own)
+    if vae is not None:
+        replica.vae = vae
+    return replica
@@ -0,0 +1,139 @@
+"""
+CPU inference, for workers without a GPU.
+
+device_and_dtype() falls back to the CPU when CUDA is unavailable. A CPU
+render is one to two orders of magnitude slower than a GPU one, so this
+mode trades quality for a usable latency while the GPU workers are down:
+
+- bfloat16 weights when the CPU has native bf16 (AVX512-BF16, AMX, Arm
+  BF16), float32 otherwise; CPU_DTYPE forces one
+- UNets and VAE in channels-last layout (oneDNN's fast convolution path)
+- intra-op / inter-op thread pools sized by CPU_THREADS / CPU_INTEROP_THREADS
+  (0: torch's default, one per physical core)
+- CPU_COMPILE_BACKEND compiles the UNets and the VAE encoder / decoder with
+  that torch.compile backend, e.g. "openvino" (pip install openvino) or
+  "onnxrt" (onnxruntime, on torch versions that ship it); when the backend
+  is not available the modules run eagerly. Empty: TORCH_COMPILE applies
+- CPU_FAST_MODEL: a distilled SDXL checkpoint (SDXL-Turbo, SDXL-Lightning)
+  whose UNet replaces the base one; full-mode renders then run
+  CPU_FAST_STEPS steps with a trailing-spacing Euler scheduler, without
+  classifier-free guidance or the refiner
+- full-mode renders are scaled down to CPU_MAX_SIDE on their long side
+
+tools/cpu_benchmark.py compares the settings on the machine it runs on.
+"""
+from __future__ import annotations
+import os
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+CPU_DTYPE = os.getenv("CPU_DTYPE", "auto").lower()  # auto | bfloat16 | float32
+CPU_THREADS = int(os.getenv("CPU_THREADS", "0"))
+CPU_INTEROP_THREADS = int(os.getenv("CPU_INTEROP_THREADS", "0"))
+CPU_CHANNELS_LAST = os.getenv("CPU_CHANNELS_LAST", "1") == "1"
+CPU_COMPILE_BACKEND = os.getenv("CPU_COMPILE_BACKEND", "").lower()
+CPU_FAST_MODEL = os.getenv("CPU_FAST_MODEL", "")  # e.g. stabilityai/sdxl-turbo
+CPU_FAST_STEPS = int(os.getenv("CPU_FAST_STEPS", "4"))
+CPU_MAX_SIDE = int(os.getenv("CPU_MAX_SIDE", "1024"))  # 0: render at full size
+
+# CPU flags (Linux /proc/cpuinfo) of a native bf16 matmul unit
+BF16_CPU_FLAGS = {"avx512_bf16", "amx_bf16", "bf16"}
+
+_configured = False
+_lock = threading.Lock()
+
+
+def configure_threads() -> None:
+    """Size torch's thread pools (once; the inter-op pool is fixed after the first parallel op)."""
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        import torch
+        if CPU_THREADS > 0:
+            torch.set_num_threads(CPU_THREADS)
+        if CPU_INTEROP_THREADS > 0:
+            try:
+                torch.set_num_interop_threads(CPU_INTEROP_THREADS)
+            except RuntimeError as e:
+                print(f"[cpu] could not set inter-op threads: {e}")
+        print(f"[cpu] threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
+
+
+def native_bf16(cpuinfo: str = "/proc/cpuinfo") -> bool:
+    try:
+        text = Path(cpuinfo).read_text()
+    except OSError:
+        return False
+    for line in text.splitlines():
+        if line.startswith(("flags", "Features")):
+            return bool(BF16_CPU_FLAGS & set(line.split(":", 1)[1].split()))
+    return False
+
+
+def cpu_dtype() -> Any:
+    import torch
+    if CPU_DTYPE == "auto":
+        return torch.bfloat16 if native_bf16() else torch.float32
+    dtypes = {"bfloat16": torch.bfloat16, "float32": torch.float32}
+    if CPU_DTYPE not in dtypes:
+        raise ValueError(f"CPU_DTYPE must be auto, bfloat16 or float32, got {CPU_DTYPE!r}")
+    return dtypes[CPU_DTYPE]
+
+
+def compile_backend() -> Optional[str]:
+    """The usable torch.compile backend for CPU_COMPILE_BACKEND, or None (eager / TORCH_COMPILE)."""
+    if not CPU_COMPILE_BACKEND:
+        return None
+    import torch._dynamo
+    if CPU_COMPILE_BACKEND == "openvino":
+        try:
+            import openvino.torch  # noqa: F401  (registers the backend)
+        except ImportError:
+            print("[cpu] CPU_COMPILE_BACKEND=openvino but the openvino package is not installed; running eagerly")
+            return None
+    if CPU_COMPILE_BACKEND not in torch._dynamo.list_backends(None):
+        print(f"[cpu] torch.compile backend {CPU_COMPILE_BACKEND!r} is not available; running eagerly")
+        return None
+    return CPU_COMPILE_BACKEND
+
+
+def optimize(module: Any, parts: Tuple[str, ...] = (), compiled: bool = True) -> Any:
+    """
+    Channels-last module, compiled with compile_backend() if there is one.
+    parts names submodules to compile instead of module itself, for modules
+    the pipelines call through methods other than forward (the VAE's encode
+    and decode). compiled=False leaves compiling to the caller (the UNets,
+    see model_registry.compile_unet).
+    """
+    import torch
+    from app.generation.model_registry import TORCH_COMPILE, compile_module
+    if CPU_CHANNELS_LAST:
+        module.to(memory_format=torch.channels_last)
+    backend = compile_backend() or ("inductor" if TORCH_COMPILE else None)
+    if backend and compiled:
+        for target in [getattr(module, name) for name in parts] or [module]:
+            compile_module(target, backend)
+    return module
+
+
+def fast_model_enabled() -> bool:
+    import torch
+    return bool(CPU_FAST_MODEL) and not torch.cuda.is_available()
+
+
+def fast_profile(profile):
+    """profile as the distilled model runs it: few steps, no guidance, no refiner."""
+    return replace(profile, total_steps=CPU_FAST_STEPS, guidance=0.0, use_refiner=False)
+
+
+def render_size(width: int, height: int, multiple: int = 8) -> Tuple[int, int]:
+    """(width, height) scaled down so the long side fits CPU_MAX_SIDE, rounded to multiple."""
+    scale = CPU_MAX_SIDE / max(width, height) if CPU_MAX_SIDE else 1.0
+    if scale >= 1.0:
+        return width, height
+    return (max(multiple, int(width * scale) // multiple * multiple),
+            max(multiple, int(height * scale) // multiple * multiple))
@@ -1,157 +1,248 @@
 """Main SDXL generator with ControlNet and refiner support."""
 from __future__ import annotations
-import io, os, time, uuid, secrets, gc, hashlib, base64
-from typing import List
+import io, os, time, secrets, gc, hashlib, base64
+from typing import Iterator
 import urllib.request
-from urllib.parse import urljoin, urlparse
+from dataclasses import replace
+from urllib.parse import urlparse
 from PIL import Image
 import torch
 from diffusers import (
     StableDiffusionXLPipeline,
     StableDiffusionXLImg2ImgPipeline,
-    DPMSolverMultistepScheduler,
     StableDiffusionXLControlNetPipeline,
-    ControlNetModel,
 )
 
-from app.generation.schemas import GenerationRequest, GenerationResponse, ImageResult
+from app.generation.schemas import GenerationRequest
 from app.generation.storage import Storage
-from app.generation.watermark import apply_watermark_image
+from app.generation.postprocess import RenderedCut
 from app.generation.generator_config import (
-    GUIDANCE, MAX_CUTS, USE_REFINER, TOTAL_STEPS, REFINER_SPLIT,
-    CONTROLNET_ENABLED, CONTROLNET_MODEL, CONTROLNET_WEIGHT,
-    CONTROLNET_GUIDANCE_START, CONTROLNET_GUIDANCE_END,
-    CONTROL_IMAGE_RECTO, CONTROL_IMAGE_CRUZADO,
-    CONTROLNET2_ENABLED, CONTROLNET2_MODEL, CONTROLNET2_WEIGHT,
-    CONTROLNET2_GUIDANCE_START, CONTROLNET2_GUIDANCE_END,
-    CONTROL_IMAGE_RECTO_CANNY, CONTROL_IMAGE_CRUZADO_CANNY,
-    IP_ADAPTER_ENABLED, IP_ADAPTER_REPO, IP_ADAPTER_SUBFOLDER,
-    IP_ADAPTER_WEIGHT, IP_ADAPTER_SCALE, IP_ADAPTER_IMAGE,
-    WATERMARK_PATH,
+    BATCH_MAX_COLORS, MAX_CUTS, WARMUP_PROFILES, WARMUP_STEPS, log_config, resolve_watermark_path,
 )
-from app.core.config import PUBLIC_BASE_URL
-from app.generation.generator_mock import Generator
+from app.generation.generator_mock import Generator, StopCheck, step_interrupt
+from app.generation.call_state import (
+    call_scaled, enable_call_scale, ip_adapter_scale, pipeline_for_call, pipeline_replica,
+)
+from app.generation.pipeline_pool import PIPELINE_REPLICA_MODE, ConfigGate, PipelinePool, replicas_for
+from app.generation.step_cache import enable_step_cache, step_caching
+from app.generation.prefix_cache import PrefixCache, PrefixCapture, remap_control_guidance, resume
+from app.generation import cpu_backend
+from app.generation.lora import LoraAdapters, load_unet_lora, loras_available
+from app.generation.profiles import GenerationProfile, ModelKey, profile_catalog
+from app.generation.model_registry import (
+    SDXL_BASE_MODEL, SDXL_REFINER_MODEL, ComponentSet, compile_unet, device_and_dtype, image_encoder_subfolder,
+    ip_adapter_weights,
+)
+
+
+def _blank_ip_image() -> Image.Image:
+    """Neutral IP-Adapter image (white), for calls at scale 0: a loaded IP-Adapter needs one on every call."""
+    return Image.new("RGB", (512, 512), color=(255, 255, 255))
+
+
+def _compile_blockers(unet) -> list[str]:
+    """The features in use that keep the base UNet eager (see model_registry.compile_unet)."""
+    blockers = []
+    if any(profile_catalog.get(name).step_cache_interval > 1 for name in profile_catalog.names()):
+        blockers.append("step cache")
+    if call_scaled(unet):
+        blockers.append("IP-Adapter call scale")
+    if loras_available():
+        blockers.append("LoRA adapters")
+    return blockers
+
+
+def color_batches(colors: list, size: int) -> list[list]:
+    """
+    A batch job's (color_id, ip_image, ip_scale) entries as pipeline calls:
+    grouped by IP-Adapter scale (one per call), at most `size` per call.
+    """
+    by_scale: dict = {}
+    for entry in colors:
+        by_scale.setdefault(entry[2], []).append(entry)
+    size = max(1, size)
+    return [group[i:i + size] for group in by_scale.values() for i in range(0, len(group), size)]
 
 
 class SdxlTurboGenerator(Generator):
-    """Production SDXL generator with optional ControlNet and refiner."""
-    _base = None     # lazy singletons
+    """Production SDXL generator with optional ControlNet and refiner, tuned per job by profile."""
+    _base = None     # lazy singletons, rebuilt when a profile needs other weights
     _refiner = None
+    _model_key: ModelKey | None = None  # GenerationProfile.model_key() _base / _refiner were built for
     _device = "cpu"
+    _components = ComponentSet()  # registry references held by _base / _refiner
+    _loras: LoraAdapters | None = None  # adapters loaded into the base UNet
+    _pool: PipelinePool | None = None  # (base, refiner) replicas, one per concurrent render
+    _gate = ConfigGate()  # concurrent renders share the model_key() and LoRA in the UNet
+    _prefixes = PrefixCache()  # shared-prefix snapshots by (profile, LoRA, cut, seed, size)
+    render_size = (1344, 2016)  # vertical, the bigger it is, the more details the image will have
 
     def __init__(self, storage: Storage, watermark_path: str | None = None):
         self.storage = storage
-        self.watermark_path = watermark_path or WATERMARK_PATH
+        self.watermark_path = watermark_path or resolve_watermark_path()
+        if device_and_dtype()[0] == "cpu":
+            self.max_resolution = max(cpu_backend.render_size(*self.render_size))
+        log_config()
 
     @classmethod
-    def _get_pipes(cls):
-        if cls._base is not None:
+    def _get_pipes(cls, profile: GenerationProfile | None = None):
+        """
+        Pipelines for profile's weights (default profile if None). Profiles
+        with the same model_key() share them; another key builds new
+        pipelines from the registry, so only the components that differ
+        (ControlNets, refiner, IP-Adapter) are loaded or freed.
+        """
+        profile = profile or profile_catalog.get()
+        key = profile.model_key()
+        if cls._base is not None and cls._model_key == key:
             return cls._base, cls._refiner
 
+        previous = cls._components
+        if cls._base is not None:
+            print(f"[sdxl] profile {profile.name} needs other weights; swapping components")
+            if cls._model_key.ip_adapter is not None:
+                cls._base.unload_ip_adapter()  # its attention processors live in the shared UNet
+        cls._components = ComponentSet()
+        try:
+            cls._base, cls._refiner = cls._build_pipes(profile, cls._components)
+        except Exception:
+            previous.release_all()
+            cls.unload()
+            raise
+        previous.release_all()  # frees only what the new pipelines don't hold
+        cls._model_key = key
+
+        # --- Per-family LoRA adapters (loaded on first use, switched per job);
+        # they live in the UNet, which every full profile shares
+        if cls._loras is None or cls._loras.unet is not cls._base.unet:
+            cls._loras = LoraAdapters(cls._base.unet, lambda lora_id: load_unet_lora(cls._base, lora_id))
+        cls._pool = cls._replica_pool(cls._base, cls._refiner)
+        return cls._base, cls._refiner
+
+    @classmethod
+    def _replica_pool(cls, base, refiner) -> PipelinePool:
+        def replica():
+            base_replica = pipeline_replica(base, PIPELINE_REPLICA_MODE)
+            return base_replica, pipeline_replica(refiner, PIPELINE_REPLICA_MODE, vae=base_replica.vae)
+
+        return PipelinePool(replica, replicas_for(cls._device))
+
+    @classmethod
+    def _build_pipes(cls, profile: GenerationProfile, components: ComponentSet):
         t0 = time.time()
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        dtype = torch.float16 if device == "cuda" else torch.float32
+        device, _ = device_and_dtype()
 
+        # VAE, text encoders and tokenizers come from the shared registry
+        # (one copy for this pipeline, the refiner and the inpaint pipeline)
         print("[sdxl] init: base on", device)
-        cls._base = StableDiffusionXLPipeline.from_pretrained(
-            "stabilityai/stable-diffusion-xl-base-1.0",
-            torch_dtype=dtype,
-            use_safetensors=True,
-        ).to(device)
-        try:
-            if device == "cuda":
-                cls._base.enable_xformers_memory_efficient_attention()
-        except Exception:
-            pass
-        # --- Scheduler: DPM-Solver (Karras) + VAE memory helpers
-        cls._base.scheduler = DPMSolverMultistepScheduler.from_config(
-            cls._base.scheduler.config, use_karras_sigmas=True
-        )
-        cls._base.enable_attention_slicing()
-        cls._base.enable_vae_tiling()
-        cls._base.enable_vae_slicing()
+        shared = components.sdxl_shared()
+        if device == "cpu" and cpu_backend.CPU_FAST_MODEL:
+            # Distilled few-step UNet (same SDXL text encoders and VAE)
+            print(f"[sdxl] init: CPU fast model {cpu_backend.CPU_FAST_MODEL}")
+            unet = components.unet(cpu_backend.CPU_FAST_MODEL)
+            scheduler = components.distilled_scheduler(cpu_backend.CPU_FAST_MODEL)
+        else:
+            unet = components.unet(SDXL_BASE_MODEL)
+            scheduler = components.scheduler(SDXL_BASE_MODEL)
+        enable_step_cache(unet)  # inert unless a profile sets step_cache_interval
+        ip_kwargs = {}
+        if profile.ip_adapter_enabled:
+            ip_kwargs["image_encoder"] = components.image_encoder(
+                profile.ip_adapter_repo,
+                image_encoder_subfolder(profile.ip_adapter_weight, profile.ip_adapter_subfolder),
+            )
 
         # --- Optional ControlNet(s) ----------------------------------------------
-        if CONTROLNET_ENABLED and CONTROLNET_MODEL:
-            print(f"[controlnet] loading {CONTROLNET_MODEL}")
-            cn_modules = []
-            cn_depth = ControlNetModel.from_pretrained(
-                CONTROLNET_MODEL,
-                torch_dtype=dtype,
-                use_safetensors=True,
-            ).to(device)
-            cn_modules.append(cn_depth)
+        cn_modules = []
+        if profile.controlnet_enabled:
+            print(f"[controlnet] loading {profile.controlnet_model}")
+            cn_modules.append(components.controlnet(profile.controlnet_model))
 
             # Second CN (Canny), if enabled
-            if CONTROLNET2_ENABLED and CONTROLNET2_MODEL:
-                print(f"[controlnet-2] loading {CONTROLNET2_MODEL}")
-                cn_canny = ControlNetModel.from_pretrained(
-                    CONTROLNET2_MODEL,
-                    torch_dtype=dtype,
-                    use_safetensors=True,
-                ).to(device)
-                cn_modules.append(cn_canny)
+            if profile.uses_controlnet2:
+                print(f"[controlnet-2] loading {profile.controlnet2_model}")
+                cn_modules.append(components.controlnet(profile.controlnet2_model))
 
+        if cn_modules:
             # For broad diffusers compatibility:
             # - if 1 CN → pass the single ControlNetModel
             # - if 2 CNs → pass a list; SDXL ControlNet pipeline accepts List[ControlNetModel]
             controlnet = cn_modules[0] if len(cn_modules) == 1 else cn_modules
-
-            cls._base = StableDiffusionXLControlNetPipeline(
-                vae=cls._base.vae,
-                text_encoder=cls._base.text_encoder,
-                text_encoder_2=cls._base.text_encoder_2,
-                tokenizer=cls._base.tokenizer,
-                tokenizer_2=cls._base.tokenizer_2,
-                unet=cls._base.unet,
-                controlnet=controlnet,
-                scheduler=cls._base.scheduler,
-                feature_extractor=cls._base.feature_extractor,
-            ).to(device)
-            try:
-                if device == "cuda":
-                    cls._base.enable_xformers_memory_efficient_attention()
-            except Exception:
-                pass
-            cls._base.enable_vae_tiling()
-            cls._base.enable_attention_slicing()
-            cls._base.enable_vae_slicing()
+            base = StableDiffusionXLControlNetPipeline(
+                **shared, **ip_kwargs, unet=unet, controlnet=controlnet, scheduler=scheduler,
+            )
             print("[controlnet] enabled")
+        else:
+            base = StableDiffusionXLPipeline(**shared, **ip_kwargs, unet=unet, scheduler=scheduler)
 
-        # --- Optional IP-Adapter -------------------------------------------------
-        # (supported on SDXL text2img and ControlNet pipelines)
-        if IP_ADAPTER_ENABLED:
-            print(f"[ip-adapter] loading {IP_ADAPTER_REPO}/{IP_ADAPTER_WEIGHT}")
-            cls._base.load_ip_adapter(
-                IP_ADAPTER_REPO,
-                subfolder=IP_ADAPTER_SUBFOLDER,
-                weight_name=IP_ADAPTER_WEIGHT,
-            )
-            cls._base.set_ip_adapter_scale(IP_ADAPTER_SCALE)
+        try:
+            if device == "cuda":
+                base.enable_xformers_memory_efficient_attention()
+        except Exception:
+            pass
+        # --- VAE memory helpers
+        base.enable_attention_slicing()
+        base.enable_vae_tiling()
+        base.enable_vae_slicing()
 
-        if USE_REFINER:
+        # --- Optional IP-Adapter -------------------------------------------------
+        # (supported on SDXL text2img and ControlNet pipelines; the image
+        # encoder is already set, so only the adapter weights are loaded)
+        if profile.ip_adapter_enabled:
+            print(f"[ip-adapter] loading {profile.ip_adapter_repo}/{profile.ip_adapter_weight}")
+            base.load_ip_adapter(**ip_adapter_weights(
+                profile.ip_adapter_repo, profile.ip_adapter_subfolder, profile.ip_adapter_weight,
+            ))
+            base.set_ip_adapter_scale(profile.ip_adapter_scale)
+            enable_call_scale(base.unet)  # each render passes its profile's scale
+        compile_unet(base.unet, _compile_blockers(base.unet))  # after the wrappers, or not at all
+
+        refiner = None
+        if profile.use_refiner:
+            # The refiner only has the second text encoder, identical to base's
             print("[sdxl] init: refiner on", device)
-            cls._refiner = StableDiffusionXLImg2ImgPipeline.from_pretrained(
-                "stabilityai/stable-diffusion-xl-refiner-1.0",
-                torch_dtype=dtype,
-                use_safetensors=True,
-            ).to(device)
+            refiner = StableDiffusionXLImg2ImgPipeline(
+                vae=shared["vae"],
+                text_encoder=None,
+                text_encoder_2=shared["text_encoder_2"],
+                tokenizer=None,
+                tokenizer_2=shared["tokenizer_2"],
+                unet=components.unet(SDXL_REFINER_MODEL),
+                scheduler=components.scheduler(SDXL_REFINER_MODEL),
+                requires_aesthetics_score=True,
+                force_zeros_for_empty_prompt=False,
+            )
             try:
                 if device == "cuda":
-                    cls._refiner.enable_xformers_memory_efficient_attention()
+                    refiner.enable_xformers_memory_efficient_attention()
             except Exception:
                 pass
-            # --- Scheduler + VAE helpers for refiner as well
-            cls._refiner.scheduler = DPMSolverMultistepScheduler.from_config(
-                cls._refiner.scheduler.config, use_karras_sigmas=True
-            )
-            cls._refiner.enable_attention_slicing()
-            cls._refiner.enable_vae_tiling()
-            cls._refiner.enable_vae_slicing()
+            refiner.enable_attention_slicing()
+            refiner.enable_vae_tiling()
+            refiner.enable_vae_slicing()
+            compile_unet(refiner.unet)  # no per-call wrappers
 
-        print(f"[sdxl] init: done in {time.time()-t0:.2f}s")
+        print(f"[sdxl] init: done in {time.time()-t0:.2f}s (profile {profile.name})")
         cls._device = device
-        return cls._base, cls._refiner
+        return base, refiner
+
+    @classmethod
+    def unload(cls) -> None:
+        """Drop the pipelines; components still used by another generator stay loaded."""
+        if cls._loras is not None:
+            cls._loras.clear()
+        cls._base = cls._refiner = cls._loras = cls._model_key = cls._pool = None
+        cls._prefixes.clear()
+        cls._components.release_all()
+
+    def loaded_loras(self) -> list[str]:
+        return self._loras.loaded() if self._loras is not None else []
+
+    def concurrency(self) -> int:
+        return replicas_for(device_and_dtype()[0])
+
+    def profile_names(self) -> list[str]:
+        return profile_catalog.names()
 
     @staticmethod 
     def _to_data_url(img: Image.Image) -> str:
@@ -160,53 +251,53 @@ class SdxlTurboGenerator(Generator):
         return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("utf-8")
 
 
-    def _control_images_for_cut(self, cut: str, size: tuple[int,int]):
+    def _control_images_for_cut(self, cut: str, size: tuple[int,int], profile: GenerationProfile):
         """
         Returns (images, scales, starts, ends) for enabled controlnets, resized to size.
         Each list can have length 0, 1, or 2 depending on what is enabled/available.
         """
         print(f"[DEBUG _control_images_for_cut] Called for cut='{cut}', size={size}")
-        print(f"[DEBUG] CONTROLNET_ENABLED={CONTROLNET_ENABLED}")
-        print(f"[DEBUG] CONTROLNET_WEIGHT={CONTROLNET_WEIGHT}")
-        print(f"[DEBUG] CONTROLNET2_ENABLED={CONTROLNET2_ENABLED}")
+        print(f"[DEBUG] controlnet_enabled={profile.controlnet_enabled}")
+        print(f"[DEBUG] controlnet_weight={profile.controlnet_weight}")
+        print(f"[DEBUG] controlnet2_enabled={profile.uses_controlnet2}")
 
         images, scales, starts, ends = [], [], [], []
 
         # Depth (primary)
-        if CONTROLNET_ENABLED:
-            dpath = CONTROL_IMAGE_RECTO if cut == "recto" else CONTROL_IMAGE_CRUZADO
+        if profile.controlnet_enabled:
+            dpath = profile.control_image_recto if cut == "recto" else profile.control_image_cruzado
             print(f"[DEBUG] Depth ControlNet: checking path '{dpath}'")
             print(f"  Path exists: {os.path.exists(dpath) if dpath else 'dpath is None/empty'}")
 
             if dpath and os.path.exists(dpath):
                 img = Image.open(dpath).convert("RGB").resize(size, Image.BICUBIC)
                 images.append(img)
-                scales.append(CONTROLNET_WEIGHT)
-                starts.append(CONTROLNET_GUIDANCE_START)
-                ends.append(CONTROLNET_GUIDANCE_END)
-                print(f"[DEBUG] ✅ Depth ControlNet image loaded, weight={CONTROLNET_WEIGHT}")
+                scales.append(profile.controlnet_weight)
+                starts.append(profile.controlnet_guidance_start)
+                ends.append(profile.controlnet_guidance_end)
+                print(f"[DEBUG] ✅ Depth ControlNet image loaded, weight={profile.controlnet_weight}")
             else:
                 print(f"[DEBUG] ❌ Depth ControlNet NOT loaded (path invalid or missing)")
         else:
-            print(f"[DEBUG] Depth ControlNet DISABLED (CONTROLNET_ENABLED=False)")
+            print(f"[DEBUG] Depth ControlNet DISABLED (controlnet_enabled=False)")
 
         # Canny (secondary)
-        if CONTROLNET2_ENABLED:
-            cpath = CONTROL_IMAGE_RECTO_CANNY if cut == "recto" else CONTROL_IMAGE_CRUZADO_CANNY
+        if profile.uses_controlnet2:
+            cpath = profile.control_image_recto_canny if cut == "recto" else profile.control_image_cruzado_canny
             print(f"[DEBUG] Canny ControlNet: checking path '{cpath}'")
             print(f"  Path exists: {os.path.exists(cpath) if cpath else 'cpath is None/empty'}")
 
             if cpath and os.path.exists(cpath):
                 img = Image.open(cpath).convert("RGB").resize(size, Image.BICUBIC)
                 images.append(img)
-                scales.append(CONTROLNET2_WEIGHT)
-                starts.append(CONTROLNET2_GUIDANCE_START)
-                ends.append(CONTROLNET2_GUIDANCE_END)
-                print(f"[DEBUG] ✅ Canny ControlNet image loaded, weight={CONTROLNET2_WEIGHT}")
+                scales.append(profile.controlnet2_weight)
+                starts.append(profile.controlnet2_guidance_start)
+                ends.append(profile.controlnet2_guidance_end)
+                print(f"[DEBUG] ✅ Canny ControlNet image loaded, weight={profile.controlnet2_weight}")
             else:
                 print(f"[DEBUG] ❌ Canny ControlNet NOT loaded (path invalid or missing)")
         else:
-            print(f"[DEBUG] Canny ControlNet DISABLED (CONTROLNET2_ENABLED=False)")
+            print(f"[DEBUG] Canny ControlNet DISABLED (controlnet2_enabled=False)")
 
         print(f"[DEBUG _control_images_for_cut] Returning {len(images)} control image(s)")
         print(f"  scales={scales}")
@@ -215,46 +306,63 @@ class SdxlTurboGenerator(Generator):
 
         return images, scales, starts, ends
 
-    def generate(self, req: GenerationRequest) -> GenerationResponse:
-        # DEBUG: Print comprehensive config being used for this generation
+    @staticmethod
+    def _profile(name: str | None) -> GenerationProfile:
+        """The named profile as this worker runs it (with the CPU fast model: its steps, no guidance)."""
+        profile = profile_catalog.get(name)
+        return cpu_backend.fast_profile(profile) if cpu_backend.fast_model_enabled() else profile
+
+    def render(self, req: GenerationRequest, should_stop: StopCheck | None = None) -> Iterator[RenderedCut]:
+        return self._render(req, self._profile(req.profile), should_stop)
+
+    def render_colors(self, req: GenerationRequest, should_stop: StopCheck | None = None) -> Iterator[RenderedCut]:
+        return self._render(req, self._profile(req.profile), should_stop)  # _render_with batches req.colors
+
+    def warm_up(self) -> None:
+        """Build each WARMUP_PROFILES profile's pipelines and render every cut with WARMUP_STEPS steps."""
+        for name in WARMUP_PROFILES:
+            t0 = time.time()
+            profile = replace(self._profile(name), total_steps=WARMUP_STEPS)  # same model_key()
+            req = GenerationRequest(family_id="warmup", color_id="warmup", seed=0)  # default cuts: all of them
+            for _ in self._render(req, profile):
+                pass
+            print(f"[sdxl] warm-up: profile {name} in {time.time()-t0:.2f}s")
+
+    def _render(self, req: GenerationRequest, profile: GenerationProfile,
+                should_stop: StopCheck | None = None) -> Iterator[RenderedCut]:
+        # DEBUG: Print the profile used for this generation
         print(f"\n{'='*80}")
-        print(f"[DEBUG generator.generate()] Starting generation with configuration:")
+        print(f"[DEBUG generator.generate()] Starting generation with profile {profile.name} ({profile.fingerprint}):")
         print(f"{'='*80}")
         print(f"  Request: family_id={req.family_id}, color_id={req.color_id}, cuts={req.cuts}, seed={req.seed}")
-        print(f"\n  Core SDXL Settings (from module variables):")
-        print(f"    GUIDANCE = {GUIDANCE}")
-        print(f"    TOTAL_STEPS = {TOTAL_STEPS}")
-        print(f"    USE_REFINER = {USE_REFINER}")
-        print(f"    REFINER_SPLIT = {REFINER_SPLIT}")
-        print(f"\n  ControlNet #1 (Depth):")
-        print(f"    CONTROLNET_ENABLED = {CONTROLNET_ENABLED}")
-        print(f"    CONTROLNET_WEIGHT = {CONTROLNET_WEIGHT}")
-        print(f"    CONTROLNET_GUIDANCE_START = {CONTROLNET_GUIDANCE_START}")
-        print(f"    CONTROLNET_GUIDANCE_END = {CONTROLNET_GUIDANCE_END}")
-        print(f"\n  ControlNet #2 (Canny):")
-        print(f"    CONTROLNET2_ENABLED = {CONTROLNET2_ENABLED}")
-        print(f"    CONTROLNET2_WEIGHT = {CONTROLNET2_WEIGHT}")
-        print(f"    CONTROLNET2_GUIDANCE_START = {CONTROLNET2_GUIDANCE_START}")
-        print(f"    CONTROLNET2_GUIDANCE_END = {CONTROLNET2_GUIDANCE_END}")
-        print(f"\n  IP-Adapter:")
-        print(f"    IP_ADAPTER_ENABLED = {IP_ADAPTER_ENABLED}")
-        print(f"    IP_ADAPTER_SCALE = {IP_ADAPTER_SCALE}")
-        print(f"\n  Direct env var verification:")
-        print(f"    os.getenv('CONTROLNET_WEIGHT') = {os.getenv('CONTROLNET_WEIGHT', 'NOT SET')}")
-        print(f"    os.getenv('CONTROLNET2_WEIGHT') = {os.getenv('CONTROLNET2_WEIGHT', 'NOT SET')}")
-        print(f"    os.getenv('GUIDANCE') = {os.getenv('GUIDANCE', 'NOT SET')}")
-        print(f"    os.getenv('TOTAL_STEPS') = {os.getenv('TOTAL_STEPS', 'NOT SET')}")
+        for name, value in profile.to_dict().items():
+            print(f"    {name} = {value}")
         print(f"{'='*80}\n")
 
-        t0 = time.time()
-        base, refiner = self._get_pipes()
+        def configure():
+            self._get_pipes(profile)
+            return self._loras.activate(req.lora_id)  # base stage only; the refiner has no LoRA
+
+        # Renders run concurrently on pool replicas while they need the same
+        # weights and LoRA; switching waits for the running ones to finish
+        with self._gate.use((profile.model_key(), req.lora_id or None), configure) as lora, \
+                self._pool.checkout() as (base, refiner):
+            yield from self._render_with(req, profile, base, refiner, lora, should_stop)
+
+    def _render_with(self, req: GenerationRequest, profile: GenerationProfile, base, refiner, lora: str | None,
+                     should_stop: StopCheck | None = None) -> Iterator[RenderedCut]:
         device = self._device
+        offload = self._pool.size == 1  # other replicas may be mid-render on the shared modules
 
         cuts = (req.cuts or ["recto", "cruzado"])[:MAX_CUTS]
 
-        # Calidad (SDXL Base en GPU)
-        width, height = 1344, 2016  # vertical, the bigger it is, the more details the image will have
-        steps, guidance = TOTAL_STEPS, GUIDANCE  # tune via env GUIDANCE (e.g., 4.5–4.7)
+        # Calidad (SDXL Base en GPU; smaller on the CPU backend)
+        width, height = self.render_size
+        if device == "cpu":
+            width, height = cpu_backend.render_size(width, height)
+        steps, guidance = profile.total_steps, profile.guidance  # tune via the profile's guidance (e.g., 4.5–4.7)
+        # Base stage only: the refiner's few low-noise steps are where detail is set
+        step_cache = (profile.step_cache_interval, profile.step_cache_depth)
 
         # Common product-photo prompt (neutral, high detail, e-comm style)
         base_prompt = (
@@ -306,225 +414,296 @@ class SdxlTurboGenerator(Generator):
             except Exception as e:
                 print(f"[ip-adapter] failed to load image: {e}")
                 return None
-        # Use swatch_url from request if provided, otherwise fall back to env var
-        ip_source = req.swatch_url if req.swatch_url else IP_ADAPTER_IMAGE
-        ip_image = _load_ip_image(ip_source)
-        if req.swatch_url:
-            print(f"[ip-adapter] Using swatch from request: {req.swatch_url}")
-
-        # --- IP-Adapter kwargs (version-safe): pass image directly -------------
-        # IMPORTANT: Once load_ip_adapter() is called at init, the UNet is modified
-        # to expect image_embeds on EVERY forward pass. We MUST always pass an image.
-        # If no swatch is available, pass a blank image with scale=0 (neutral effect).
-        ip_kwargs_base = {}
-        if IP_ADAPTER_ENABLED:
+        def ip_conditioning(swatch_url: str | None):
+            """(IP-Adapter image or None, scale) for one color."""
+            # Use swatch_url from request if provided, otherwise fall back to env var
+            ip_image = _load_ip_image(swatch_url if swatch_url else profile.ip_adapter_image)
+            if swatch_url:
+                print(f"[ip-adapter] Using swatch from request: {swatch_url}")
+
+            # --- IP-Adapter image (version-safe): pass image directly ----------
+            # IMPORTANT: Once load_ip_adapter() is called at init, the UNet is modified
+            # to expect image_embeds on EVERY forward pass. We MUST always pass an image.
+            # If no swatch is available, pass a blank image with scale=0 (neutral effect).
+            # The scale is set per call (ip_adapter_scale), not on the shared pipeline.
+            if not profile.ip_adapter_enabled:
+                return None, profile.ip_adapter_scale
             if ip_image is None:
                 print("[ip-adapter] enabled but no image; using blank image with scale=0")
-                # Create a neutral blank image (white) - IP-Adapter needs something
-                blank_img = Image.new("RGB", (512, 512), color=(255, 255, 255))
-                ip_kwargs_base["ip_adapter_image"] = blank_img
-                ip_kwargs_base["ip_adapter_scale"] = [0.0]  # Zero effect
-            else:
-                ip_kwargs_base["ip_adapter_image"] = ip_image
-                ip_kwargs_base["ip_adapter_scale"] = [float(IP_ADAPTER_SCALE)]
-
-        run_id = uuid.uuid4().hex[:10]
-        images: List[ImageResult] = []
+                return _blank_ip_image(), 0.0  # Zero effect
+            return ip_image, profile.ip_adapter_scale
+
+        # The request's color, or every color of a batch job: those are rendered
+        # together, up to BATCH_MAX_COLORS per call sharing prompt, pose and seed
+        if req.colors:
+            batches = color_batches([(c.color_id, *ip_conditioning(c.swatch_url)) for c in req.colors],
+                                    BATCH_MAX_COLORS)
+        else:
+            batches = [[(None, *ip_conditioning(req.swatch_url))]]
 
         base_seed = req.seed if req.seed is not None else secrets.randbits(32)
 
+        def prefix_key(cut: str, seed: int, base_steps: int):
+            """Shared-prefix cache key, or None: the profile has no prefix, the seed is random or too few steps."""
+            k = profile.shared_prefix_steps
+            if req.seed is None or not 0 < k < base_steps:
+                return None
+            return (profile.fingerprint, lora, cut, seed, width, height)
+
         for cut in cuts:
             # derive a per-cut seed from base_seed (stable & distinct)
             derived = hashlib.sha256(f"{base_seed}:{cut}".encode()).digest()
             seed = int.from_bytes(derived[:4], "little")
-            g = torch.Generator(device=device).manual_seed(seed)
-
-            # --- Ensure base components are on GPU (may have been offloaded in previous cut)
-            if device == "cuda":
-                try:
-                    if hasattr(base, "unet") and base.unet is not None:
-                        base.unet.to(device)
-                    cn = getattr(base, "controlnet", None)
-                    if cn is not None:
-                        if isinstance(cn, (list, tuple)):
-                            for m in cn:
-                                m.to(device)
-                        else:
-                            cn.to(device)
-                    for enc in ("text_encoder", "text_encoder_2"):
-                        mod = getattr(base, enc, None)
-                        if mod is not None:
-                            mod.to(device)
-                except Exception as e:
-                    print(f"[mem] reload base to GPU warn: {e}")
-
-            print(f"[sdxl] {cut}: infer start")
-            t1 = time.time()
             pos, neg = build_prompts(base_prompt, neg_prompt, cut)
-            if refiner:
-                # Optional ControlNet kwargs (apply only on base stage)
-                imgs, scales, starts, ends = self._control_images_for_cut(cut, (width, height))
-                extra = {}
-                if imgs:
-                    # Support 1 or 2 controlnets transparently
-                    payload = imgs if len(imgs) > 1 else imgs[0]
-                    w = scales if len(scales) > 1 else scales[0]
-                    s = starts if len(starts) > 1 else starts[0]
-                    e = ends if len(ends) > 1 else ends[0]
-                    extra = dict(
-                        image=payload,
-                        controlnet_conditioning_scale=w,
-                        control_guidance_start=s,
-                        control_guidance_end=e,
-                    )
-                    print(f"[DEBUG pipeline] Passing ControlNet params to base pipeline:")
-                    print(f"  controlnet_conditioning_scale={w}")
-                    print(f"  control_guidance_start={s}")
-                    print(f"  control_guidance_end={e}")
-                # Base → latent (0 → split)
-                ip_kwargs = dict(ip_kwargs_base)
-                base_out = base(
-                    prompt=pos,
-                    negative_prompt=neg,
-                    num_inference_steps=steps,
-                    denoising_end=REFINER_SPLIT,
-                    guidance_scale=guidance,
-                    width=width,
-                    height=height,
-                    generator=g,
-                    num_images_per_prompt=1,
-                    output_type="latent",
-                    **ip_kwargs,
-                    **extra,
+
+            # Optional ControlNet kwargs (apply only on base stage)
+            imgs, scales, starts, ends = self._control_images_for_cut(cut, (width, height), profile)
+            extra = {}
+            if imgs:
+                # Support 1 or 2 controlnets transparently
+                payload = imgs if len(imgs) > 1 else imgs[0]
+                w = scales if len(scales) > 1 else scales[0]
+                s = starts if len(starts) > 1 else starts[0]
+                e = ends if len(ends) > 1 else ends[0]
+                extra = dict(
+                    image=payload,
+                    controlnet_conditioning_scale=w,
+                    control_guidance_start=s,
+                    control_guidance_end=e,
                 )
-                latents = base_out.images  # latent tensor
-
-                # --- VRAM relief before refiner ---------------------------------
-                # Share a single VAE (avoid duplicate copy) and keep it tiled.
-                try:
-                    refiner.vae = base.vae
-                    refiner.vae.to(device)
-                    # refiner device (don't assume "cuda": query module)
+                print(f"[DEBUG pipeline] Passing ControlNet params to base pipeline:")
+                print(f"  controlnet_conditioning_scale={w}")
+                print(f"  control_guidance_start={s}")
+                print(f"  control_guidance_end={e}")
+
+            for batch in batches:
+                # --- Ensure base components are on GPU (may have been offloaded in previous cut)
+                if device == "cuda" and offload:
                     try:
-                        ref_device = next(refiner.parameters()).device
-                    except Exception:
-                        ref_device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                    refiner.vae.to(ref_device)
-                    if hasattr(refiner.vae, "enable_tiling"): refiner.vae.enable_tiling()
-                    if hasattr(refiner.vae, "enable_slicing"): refiner.vae.enable_slicing()
-                except Exception as e:
-                    print(f"[mem] VAE share/tiling warn: {e}")
-
-                # Offload heavy base modules to CPU to free space for VAE decode.
-                try:
-                    # unet
-                    if hasattr(base, "unet") and base.unet is not None:
-                        base.unet.to("cpu")
-                    # controlnet (can be a model or a wrapper with .to)
-                    cn = getattr(base, "controlnet", None)
-                    if cn is not None:
+                        if hasattr(base, "unet") and base.unet is not None:
+                            base.unet.to(device)
+                        cn = getattr(base, "controlnet", None)
+                        if cn is not None:
+                            if isinstance(cn, (list, tuple)):
+                                for m in cn:
+                                    m.to(device)
+                            else:
+                                cn.to(device)
+                        for enc in ("text_encoder", "text_encoder_2"):
+                            mod = getattr(base, enc, None)
+                            if mod is not None:
+                                mod.to(device)
+                    except Exception as e:
+                        print(f"[mem] reload base to GPU warn: {e}")
+
+                colors = [color_id for color_id, _, _ in batch]
+                print(f"[sdxl] {cut}: infer start" + (f" ({', '.join(colors)})" if req.colors else ""))
+                t1 = time.time()
+                ip_images, ip_scale = [image for _, image, _ in batch], batch[0][2]
+                if len(batch) == 1:
+                    prompts = dict(prompt=pos, negative_prompt=neg)
+                    ip_kwargs = {"ip_adapter_image": ip_images[0]} if ip_images[0] is not None else {}
+                    g = torch.Generator(device=device).manual_seed(seed)
+                else:
+                    # One call for the colors: the prompt encoded once, one IP-Adapter
+                    # embedding per color and the cut's seed for every image
+                    prompts = self._prompt_embeds(base, pos, neg, len(batch), guidance)
+                    ip_kwargs = self._ip_embeds(base, ip_images, guidance) if ip_images[0] is not None else {}
+                    g = [torch.Generator(device=device).manual_seed(seed) for _ in batch]
+                base_steps = int(steps * profile.refiner_split) if refiner else steps
+                key = prefix_key(cut, seed, base_steps) if len(batch) == 1 else None
+                if refiner:
+                    # Base → latent (0 → split)
+                    base_out, prefix = self._run_base(
+                        base, profile, key, ip_scale, step_cache,
+                        **prompts,
+                        num_inference_steps=steps,
+                        denoising_end=profile.refiner_split,
+                        guidance_scale=guidance,
+                        width=width,
+                        height=height,
+                        generator=g,
+                        num_images_per_prompt=1,
+                        output_type="latent",
+                        **ip_kwargs,
+                        **extra,
+                        **step_interrupt(should_stop),
+                    )
+                    latents = base_out.images  # latent tensor
+
+                    # --- VRAM relief before refiner ---------------------------------
+                    # Share a single VAE (avoid duplicate copy) and keep it tiled.
+                    try:
+                        refiner.vae = base.vae
+                        refiner.vae.to(device)
+                        # refiner device (don't assume "cuda": query module)
                         try:
-                            cn.to("cpu")
-                        except AttributeError:
-                            # handle list-like just in case
-                            for m in cn if isinstance(cn, (list, tuple)) else []:
-                                try: m.to("cpu")
-                                except Exception: pass
-                    for enc in ("text_encoder", "text_encoder_2"):
-                        mod = getattr(base, enc, None)
-                        if mod is not None: mod.to("cpu")
-                except Exception as e:
-                    print(f"[mem] offload base warn: {e}")
-                gc.collect(); torch.cuda.empty_cache()
-
-                # Refiner → image (split → 1.0)
-                refiner_steps = max(5, int(round(steps * (1.0 - REFINER_SPLIT))))
-                img: Image.Image = refiner(
-                    prompt=pos,
-                    negative_prompt=neg,
-                    num_inference_steps=refiner_steps,
-                    denoising_start=REFINER_SPLIT,
-                    guidance_scale=guidance,
-                    image=latents,
-                    generator=g,
-                ).images[0]
-            else:
-                # Optional ControlNet kwargs (no refiner path)
-                imgs, scales, starts, ends = self._control_images_for_cut(cut, (width, height))
-                print(f"[DEBUG] After _control_images_for_cut (no refiner): got {len(imgs)} images")
-                extra = {}
-                if imgs:
-                    payload = imgs if len(imgs) > 1 else imgs[0]
-                    w = scales if len(scales) > 1 else scales[0]
-                    s = starts if len(starts) > 1 else starts[0]
-                    e = ends if len(ends) > 1 else ends[0]
-                    extra = dict(
-                        image=payload,
-                        controlnet_conditioning_scale=w,
-                        control_guidance_start=s,
-                        control_guidance_end=e,
+                            ref_device = next(refiner.parameters()).device
+                        except Exception:
+                            ref_device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                        refiner.vae.to(ref_device)
+                        if hasattr(refiner.vae, "enable_tiling"): refiner.vae.enable_tiling()
+                        if hasattr(refiner.vae, "enable_slicing"): refiner.vae.enable_slicing()
+                    except Exception as e:
+                        print(f"[mem] VAE share/tiling warn: {e}")
+
+                    # Refiner prompts (its own text encoder) before the base modules leave the GPU
+                    refiner_prompts = prompts if len(batch) == 1 else \
+                        self._prompt_embeds(refiner, pos, neg, len(batch), guidance)
+
+                    # Offload heavy base modules to CPU to free space for VAE decode
+                    # (not while other replicas may be mid-render on them).
+                    if offload:
+                        try:
+                            # unet
+                            if hasattr(base, "unet") and base.unet is not None:
+                                base.unet.to("cpu")
+                            # controlnet (can be a model or a wrapper with .to)
+                            cn = getattr(base, "controlnet", None)
+                            if cn is not None:
+                                try:
+                                    cn.to("cpu")
+                                except AttributeError:
+                                    # handle list-like just in case
+                                    for m in cn if isinstance(cn, (list, tuple)) else []:
+                                        try: m.to("cpu")
+                                        except Exception: pass
+                            for enc in ("text_encoder", "text_encoder_2"):
+                                mod = getattr(base, enc, None)
+                                if mod is not None: mod.to("cpu")
+                        except Exception as e:
+                            print(f"[mem] offload base warn: {e}")
+                        gc.collect(); torch.cuda.empty_cache()
+
+                    # Refiner → image (split → 1.0)
+                    refiner_steps = max(5, int(round(steps * (1.0 - profile.refiner_split))))
+                    images: list[Image.Image] = pipeline_for_call(refiner)(
+                        **refiner_prompts,
+                        num_inference_steps=refiner_steps,
+                        denoising_start=profile.refiner_split,
+                        guidance_scale=guidance,
+                        image=latents,
+                        generator=g,
+                        **step_interrupt(should_stop),
+                    ).images
+                else:
+                    base_out, prefix = self._run_base(
+                        base, profile, key, ip_scale, step_cache,
+                        **prompts,
+                        num_inference_steps=steps,
+                        guidance_scale=guidance,
+                        width=width,
+                        height=height,
+                        generator=g,
+                        num_images_per_prompt=1,
+                        **ip_kwargs,
+                        **extra,
+                        **step_interrupt(should_stop),
+                    )
+                    images: list[Image.Image] = base_out.images
+                print(f"[sdxl] {cut}: infer done in {time.time()-t1:.2f}s (seed={seed}, {len(batch)} image(s))")
+
+                for color_id, img in zip(colors, images):
+                    yield RenderedCut(
+                        cut=cut,
+                        image=img,
+                        width=width,
+                        height=height,
+                        color_id=color_id,
+                        meta={
+                            "seed": str(seed),
+                            "steps": str(steps),
+                            "guidance": str(guidance),
+                            "engine": "sdxl-refiner" if refiner else "sdxl-base",
+                            "refiner_split": str(profile.refiner_split),
+                            "refiner_steps": str(refiner_steps) if refiner else "0",
+                            "step_cache": f"{step_cache[0]}/{step_cache[1]}" if step_cache[0] > 1 else "off",
+                            "shared_prefix": prefix,
+                            "batch": str(len(batch)),
+                            "lora": lora or "none",
+                            "profile": profile.name,
+                            "profile_fingerprint": profile.fingerprint,
+                            },
                     )
-                    print(f"[DEBUG pipeline] Passing ControlNet params to base pipeline (no refiner):")
-                    print(f"  controlnet_conditioning_scale={w}")
-                    print(f"  control_guidance_start={s}")
-                    print(f"  control_guidance_end={e}")
-                ip_kwargs = dict(ip_kwargs_base)
-                img: Image.Image = base(
-                    prompt=pos,
-                    negative_prompt=neg,
-                    num_inference_steps=steps,
-                    guidance_scale=guidance,
-                    width=width,
-                    height=height,
-                    generator=g,
-                    num_images_per_prompt=1,
-                    **ip_kwargs,
-                    **extra,
-                ).images[0]
-            print(f"[sdxl] {cut}: infer done in {time.time()-t1:.2f}s (seed={seed})")
-
-            # bytes -> watermark -> storage URL
-            buf = io.BytesIO()
-            img.save(buf, format="JPEG", quality=95)
-            raw_bytes = buf.getvalue()
-
-            wm_bytes = apply_watermark_image(raw_bytes, self.watermark_path, scale=0.30)
-            key = f"generated/{req.family_id}/{req.color_id}/{run_id}/{cut}.jpg"
-            saved_url  = self.storage.save_bytes(wm_bytes, key)
-
-            # --- Force public domain if env is set ---
-            if PUBLIC_BASE_URL:
-                parsed = urlparse(saved_url)
-                # if storage returned absolute (e.g., http://localhost:8000/...),
-                # strip domain and keep only the path; if it was already relative, keep it
-                path = parsed.path if parsed.scheme else saved_url
-                public_url = urljoin(PUBLIC_BASE_URL.rstrip('/') + '/', path.lstrip('/'))
-            else:
-                public_url = saved_url
-            # ---------------------------------------------
-
-            images.append(
-                ImageResult(
-                    cut=cut,
-                    url=public_url,
-                    width=width,
-                    height=height,
-                    watermark=True,
-                    meta={
-                        "seed": str(seed),
-                        "steps": str(steps),
-                        "guidance": str(guidance),
-                        "engine": "sdxl-refiner" if refiner else "sdxl-base",
-                        "refiner_split": str(REFINER_SPLIT),
-                        "refiner_steps": str(refiner_steps) if refiner else "0",
-                        },
-                )
-            )
 
-        return GenerationResponse(
-            request_id=run_id,
-            status="completed",
-            images=images,
-            duration_ms=int((time.time() - t0) * 1000),
-            meta={"family_id": req.family_id, "color_id": req.color_id, "device": device},
+    def _run_base(self, base, profile: GenerationProfile, prefix_key, ip_scale, step_cache, **kwargs):
+        """
+        The base pipeline call, as (output, "hit" | "miss" | "off"). With a
+        prefix_key it resumes from that cut's shared prefix: the first
+        profile.shared_prefix_steps steps rendered once with the neutral
+        IP-Adapter conditioning, computed and cached here on a miss.
+        """
+        call, status = pipeline_for_call(base), "off"
+        if prefix_key is not None:
+            state, status = self._prefixes.get(prefix_key), "hit"
+            if state is None:
+                state, status = self._render_prefix(base, profile.shared_prefix_steps, step_cache, kwargs), "miss"
+                if state is not None:
+                    self._prefixes.put(prefix_key, state)
+            if state is not None:
+                call, resumed = resume(base, state)
+                kwargs.update(resumed)
+                if "control_guidance_start" in kwargs:
+                    (kwargs["control_guidance_start"], kwargs["control_guidance_end"],
+                     kwargs["controlnet_conditioning_scale"]) = remap_control_guidance(
+                        kwargs["control_guidance_start"], kwargs["control_guidance_end"],
+                        kwargs["controlnet_conditioning_scale"], state.steps, len(state.scheduler.timesteps),
+                    )
+            else:
+                status = "off"
+        with ip_adapter_scale(ip_scale), step_caching(*step_cache):
+            return call(**kwargs), status
+
+    @staticmethod
+    def _prompt_embeds(pipe, prompt: str, negative_prompt: str, count: int, guidance: float) -> dict:
+        """Prompt kwargs for `count` images of one call: the prompt is encoded once and repeated."""
+        embeds = pipe.encode_prompt(
+            prompt,
+            device=pipe._execution_device,
+            num_images_per_prompt=count,
+            do_classifier_free_guidance=guidance > 1,
+            negative_prompt=negative_prompt,
         )
+        names = ("prompt_embeds", "negative_prompt_embeds", "pooled_prompt_embeds", "negative_pooled_prompt_embeds")
+        return dict(zip(names, embeds))
+
+    @staticmethod
+    def _ip_embeds(pipe, images: list, guidance: float) -> dict:
+        """
+        ip_adapter_image_embeds with its own image for each image of the call
+        (a list of ip_adapter_image would be one multi-image prompt for all).
+        """
+        do_cfg = guidance > 1
+        per_image = [
+            pipe.prepare_ip_adapter_image_embeds([image], None, pipe._execution_device, 1, do_cfg) for image in images
+        ]
+        embeds = []
+        for adapter in zip(*per_image):  # one tensor per loaded IP-Adapter
+            if do_cfg:  # the pipeline splits them into [negatives; positives]
+                negative, positive = zip(*(e.chunk(2) for e in adapter))
+                embeds.append(torch.cat(negative + positive))
+            else:
+                embeds.append(torch.cat(adapter))
+        return {"ip_adapter_image_embeds": embeds}
+
+    @staticmethod
+    def _render_prefix(base, steps: int, step_cache, kwargs: dict):
+        """The PrefixState after `steps` steps of the base call kwargs describe, without the swatch."""
+        t0 = time.time()
+        kwargs = dict(kwargs, output_type="latent")
+        seed = kwargs["generator"].initial_seed()
+        kwargs["generator"] = torch.Generator(device=kwargs["generator"].device).manual_seed(seed)
+        if "ip_adapter_image" in kwargs:
+            kwargs["ip_adapter_image"] = _blank_ip_image()
+        capture = PrefixCapture(steps, then=kwargs.get("callback_on_step_end"))
+        kwargs["callback_on_step_end"] = capture
+        with ip_adapter_scale(0.0), step_caching(*step_cache):
+            pipeline_for_call(base)(**kwargs)
+        if capture.state is None:
+            print(f"[sdxl] shared prefix: the base stage has fewer than {steps} steps; rendering without it")
+        else:
+            print(f"[sdxl] shared prefix: {steps} steps in {time.time()-t0:.2f}s (seed={seed})")
+        return capture.state
+
+    def response_meta(self, req: GenerationRequest) -> dict:
+        return {**super().response_meta(req), "device": self._device}
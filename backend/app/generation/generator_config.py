@@ -8,6 +8,13 @@ MAX_CUTS = int(os.getenv("MAX_CUTS", "2"))
 USE_REFINER = os.getenv("USE_REFINER", "1") == "1"
 TOTAL_STEPS = int(os.getenv("TOTAL_STEPS", "80"))
 REFINER_SPLIT = float(os.getenv("REFINER_SPLIT", "0.70"))
+# Step cache (step_cache.py): deep UNet blocks recomputed every STEP_CACHE_INTERVAL
+# steps (0 or 1: every step), levels 0..STEP_CACHE_DEPTH on every step
+STEP_CACHE_INTERVAL = int(os.getenv("STEP_CACHE_INTERVAL", "0"))
+STEP_CACHE_DEPTH = int(os.getenv("STEP_CACHE_DEPTH", "0"))
+# Shared prefix (prefix_cache.py): with a fixed seed, the first SHARED_PREFIX_STEPS
+# base steps of a cut are rendered once without the swatch and reused (0: off)
+SHARED_PREFIX_STEPS = int(os.getenv("SHARED_PREFIX_STEPS", "0"))
 
 # Primary ControlNet (DEPTH)
 # CRITICAL: Read directly from os.getenv() instead of importing from config.py
@@ -37,26 +44,45 @@ IP_ADAPTER_WEIGHT = os.getenv("IP_ADAPTER_WEIGHT", "ip-adapter_sdxl.bin")
 IP_ADAPTER_SCALE = float(os.getenv("IP_ADAPTER_SCALE", "0.70"))
 IP_ADAPTER_IMAGE = os.getenv("IP_ADAPTER_IMAGE", "")  # leave empty to skip
 
-# DEBUG: Log values read from env vars at module load/reload time
-print(f"[DEBUG generator_config.py MODULE LOAD] Configuration loaded from environment:")
-print(f"  GUIDANCE = {GUIDANCE}")
-print(f"  TOTAL_STEPS = {TOTAL_STEPS}")
-print(f"  USE_REFINER = {USE_REFINER}")
-print(f"  REFINER_SPLIT = {REFINER_SPLIT}")
-print(f"  CONTROLNET_ENABLED = {CONTROLNET_ENABLED}")
-print(f"  CONTROLNET_WEIGHT = {CONTROLNET_WEIGHT}")
-print(f"  CONTROLNET_GUIDANCE_START = {CONTROLNET_GUIDANCE_START}")
-print(f"  CONTROLNET_GUIDANCE_END = {CONTROLNET_GUIDANCE_END}")
-print(f"  CONTROLNET2_ENABLED = {CONTROLNET2_ENABLED}")
-print(f"  CONTROLNET2_WEIGHT = {CONTROLNET2_WEIGHT}")
-print(f"  CONTROLNET2_GUIDANCE_START = {CONTROLNET2_GUIDANCE_START}")
-print(f"  CONTROLNET2_GUIDANCE_END = {CONTROLNET2_GUIDANCE_END}")
-print(f"  IP_ADAPTER_ENABLED = {IP_ADAPTER_ENABLED}")
-print(f"  IP_ADAPTER_SCALE = {IP_ADAPTER_SCALE}")
+# Batch jobs (POST /generate/batch): colors rendered together per cut, at
+# most this many images per pipeline call
+BATCH_MAX_COLORS = int(os.getenv("BATCH_MAX_COLORS", "4"))
+
+# Worker warm-up: a WARMUP_STEPS render of every cut for each of these
+# profiles runs before the worker claims its first job
+WARMUP_PROFILES = [p.strip() for p in os.getenv("WARMUP_PROFILES", "default").split(",") if p.strip()]
+WARMUP_STEPS = int(os.getenv("WARMUP_STEPS", "2"))
+
+
+def log_config():
+    """Log the values read from env vars (when a generator is built, not at import)."""
+    print("[DEBUG generator_config.py] Configuration loaded from environment:")
+    print(f"  GUIDANCE = {GUIDANCE}")
+    print(f"  TOTAL_STEPS = {TOTAL_STEPS}")
+    print(f"  USE_REFINER = {USE_REFINER}")
+    print(f"  REFINER_SPLIT = {REFINER_SPLIT}")
+    print(f"  STEP_CACHE_INTERVAL = {STEP_CACHE_INTERVAL}")
+    print(f"  STEP_CACHE_DEPTH = {STEP_CACHE_DEPTH}")
+    print(f"  SHARED_PREFIX_STEPS = {SHARED_PREFIX_STEPS}")
+    print(f"  BATCH_MAX_COLORS = {BATCH_MAX_COLORS}")
+    print(f"  CONTROLNET_ENABLED = {CONTROLNET_ENABLED}")
+    print(f"  CONTROLNET_WEIGHT = {CONTROLNET_WEIGHT}")
+    print(f"  CONTROLNET_GUIDANCE_START = {CONTROLNET_GUIDANCE_START}")
+    print(f"  CONTROLNET_GUIDANCE_END = {CONTROLNET_GUIDANCE_END}")
+    print(f"  CONTROLNET2_ENABLED = {CONTROLNET2_ENABLED}")
+    print(f"  CONTROLNET2_WEIGHT = {CONTROLNET2_WEIGHT}")
+    print(f"  CONTROLNET2_GUIDANCE_START = {CONTROLNET2_GUIDANCE_START}")
+    print(f"  CONTROLNET2_GUIDANCE_END = {CONTROLNET2_GUIDANCE_END}")
+    print(f"  IP_ADAPTER_ENABLED = {IP_ADAPTER_ENABLED}")
+    print(f"  IP_ADAPTER_SCALE = {IP_ADAPTER_SCALE}")
 
 
 def resolve_watermark_path() -> str:
-    """Resolve watermark image path from environment or defaults."""
+    """
+    Resolve watermark image path from environment or defaults. Called by the
+    generators when they are built, not at import: the API reads this module
+    (profiles) and its image ships without tests/.
+    """
     # 1) env override (deploy.sh can set this)
     p = os.getenv("WATERMARK_PATH")
     if p and Path(p).exists():
@@ -70,6 +96,3 @@ def resolve_watermark_path() -> str:
     if sibling.exists():
         return str(sibling)
     raise FileNotFoundError("Watermark not found. Set WATERMARK_PATH or keep tests/assets/watermark-logo.png")
-
-
-WATERMARK_PATH = resolve_watermark_path()
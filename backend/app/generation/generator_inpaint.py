@@ -16,27 +16,31 @@ import hashlib
 import io
 import os
 import secrets
+import threading
 import time
-import uuid
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import urljoin, urlparse
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
 import urllib.request
+from dataclasses import dataclass
 
 import torch
 from PIL import Image
-from diffusers import (
-    StableDiffusionXLInpaintPipeline,
-    DPMSolverMultistepScheduler,
-)
-from transformers import CLIPVisionModelWithProjection
+from diffusers import StableDiffusionXLInpaintPipeline
 
-from app.generation.schemas import GenerationRequest, GenerationResponse, ImageResult
+from app.generation.call_state import (
+    call_scaled, enable_call_scale, ip_adapter_scale, pipeline_for_call, pipeline_replica,
+)
+from app.generation.schemas import GenerationRequest
 from app.generation.storage import Storage
-from app.generation.watermark import apply_watermark_image
-from app.generation.generator_config import WATERMARK_PATH
-from app.generation.generator_mock import Generator
-from app.core.config import PUBLIC_BASE_URL
+from app.generation.generator_config import WARMUP_STEPS, resolve_watermark_path
+from app.generation.generator_mock import Generator, StopCheck, step_interrupt
+from app.generation.masking import CropRegion, crop_for_inpaint, mask_crop_region, paste_inpainted
+from app.generation.model_registry import (
+    ComponentSet, compile_unet, device_and_dtype, image_encoder_subfolder, ip_adapter_weights,
+)
+from app.generation.pipeline_pool import PIPELINE_REPLICA_MODE, PipelinePool, replicas_for
+from app.generation.postprocess import RenderedCut
 
 
 # =============================================================================
@@ -49,6 +53,14 @@ INPAINT_STRENGTH = float(os.getenv("INPAINT_STRENGTH", "0.85"))
 INPAINT_GUIDANCE = float(os.getenv("INPAINT_GUIDANCE", "7.5"))
 INPAINT_STEPS = int(os.getenv("INPAINT_STEPS", "50"))
 
+# Crop-to-mask: inpaint only the mask's padded bounding box (rendered with its
+# short side at least INPAINT_CROP_MIN_SIDE) and blend it back into the
+# untouched reference, feathered inside the mask
+INPAINT_CROP_TO_MASK = os.getenv("INPAINT_CROP_TO_MASK", "1") == "1"
+INPAINT_CROP_PADDING = int(os.getenv("INPAINT_CROP_PADDING", "48"))
+INPAINT_CROP_MIN_SIDE = int(os.getenv("INPAINT_CROP_MIN_SIDE", "768"))
+INPAINT_CROP_FEATHER = int(os.getenv("INPAINT_CROP_FEATHER", "8"))
+
 # IP-Adapter Plus configuration (inpainting uses separate vars to not conflict with full mode)
 IP_ADAPTER_ENABLED = os.getenv("IP_ADAPTER_ENABLED", "1") == "1"
 IP_ADAPTER_REPO = os.getenv("IP_ADAPTER_REPO", "h94/IP-Adapter")
@@ -73,20 +85,18 @@ MASK_CRUZADO = os.getenv("INPAINT_MASK_CRUZADO", str(ASSETS_DIR / "cruzado_mask.
 
 
 def _log_config():
-    """Log configuration at module load for debugging."""
+    """Log configuration for debugging (when the generator is built)."""
     print(f"[inpaint-config] INPAINT_MODEL = {INPAINT_MODEL}")
     print(f"[inpaint-config] INPAINT_STRENGTH = {INPAINT_STRENGTH}")
     print(f"[inpaint-config] INPAINT_GUIDANCE = {INPAINT_GUIDANCE}")
     print(f"[inpaint-config] INPAINT_STEPS = {INPAINT_STEPS}")
+    print(f"[inpaint-config] INPAINT_CROP_TO_MASK = {INPAINT_CROP_TO_MASK}")
     print(f"[inpaint-config] IP_ADAPTER_ENABLED = {IP_ADAPTER_ENABLED}")
     print(f"[inpaint-config] IP_ADAPTER_WEIGHT = {IP_ADAPTER_WEIGHT}")
     print(f"[inpaint-config] IP_ADAPTER_SCALE = {IP_ADAPTER_SCALE}")
     print(f"[inpaint-config] ASSETS_DIR = {ASSETS_DIR}")
 
 
-_log_config()
-
-
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
@@ -138,6 +148,18 @@ def _download_image_from_url(url: str, timeout: int = 15) -> Optional[Image.Imag
         return None
 
 
+def _asset_signature() -> Tuple:
+    """(path, mtime, size) of every reference and mask file; changes when any is replaced."""
+    signature = []
+    for path in (REFERENCE_RECTO, REFERENCE_CRUZADO, MASK_RECTO, MASK_CRUZADO):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
 def _resize_to_match(
     image: Image.Image,
     target_size: Tuple[int, int],
@@ -149,6 +171,22 @@ def _resize_to_match(
     return image
 
 
+@dataclass
+class PreparedCut:
+    """
+    Everything about a cut that doesn't depend on the job: the resized
+    reference and mask, the crop that goes through diffusion, and its
+    VAE-encoded image, processed mask and masked-image latents.
+    """
+    reference: Image.Image
+    mask: Image.Image
+    region: Optional[CropRegion]
+    render_size: Tuple[int, int]
+    image_latents: torch.Tensor
+    mask_tensor: torch.Tensor
+    masked_image_latents: torch.Tensor
+
+
 # =============================================================================
 # INPAINTING GENERATOR
 # =============================================================================
@@ -166,24 +204,41 @@ class InpaintGenerator(Generator):
     Result: Same photo with different suit fabric, everything else unchanged.
     """
 
+    modes = ("inpaint",)
+    max_resolution = 1536
+
     _pipe = None  # Lazy singleton
     _device = "cpu"
+    _components = ComponentSet()  # registry references held by _pipe
     _references: Dict[str, Image.Image] = {}
     _masks: Dict[str, Image.Image] = {}
     _assets_loaded = False
+    _assets_signature: Optional[Tuple] = None
+    _prepared: Dict[Tuple[str, int, int], PreparedCut] = {}  # (cut, width, height)
+    _pool: Optional[PipelinePool] = None  # replicas of _pipe, one per concurrent render
+    _setup_lock = threading.Lock()  # loading the pipeline and assets, preparing cuts
 
     def __init__(self, storage: Storage, watermark_path: Optional[str] = None):
         self.storage = storage
-        self.watermark_path = watermark_path or WATERMARK_PATH
+        self.watermark_path = watermark_path or resolve_watermark_path()
+        _log_config()
 
     @classmethod
     def _load_assets(cls) -> bool:
         """
-        Load reference images and masks into memory.
+        Load reference images and masks into memory (again, dropping the
+        prepared cuts, if any of the files changed since).
         Returns True if all assets loaded successfully.
         """
-        if cls._assets_loaded:
+        signature = _asset_signature()
+        if cls._assets_loaded and signature == cls._assets_signature:
             return True
+        if cls._assets_loaded:
+            print("[inpaint] Asset files changed; reloading references, masks and cached latents")
+        cls._assets_loaded = False
+        cls._references.clear()
+        cls._masks.clear()
+        cls._prepared.clear()
 
         print("[inpaint] Loading reference images and masks...")
 
@@ -222,34 +277,33 @@ class InpaintGenerator(Generator):
             print(f"[inpaint] Loaded cruzado mask: {cruzado_mask.size}")
 
         cls._assets_loaded = True
+        cls._assets_signature = signature
         return True
 
     @classmethod
     def _get_pipeline(cls):
         """
         Lazy-load the inpainting pipeline (singleton).
+
+        Only the inpainting UNet comes from INPAINT_MODEL; the VAE, text
+        encoders and tokenizers are the SDXL base ones from the shared
+        registry (the same modules SdxlTurboGenerator uses).
         """
         if cls._pipe is not None:
             return cls._pipe
 
         t0 = time.time()
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        dtype = torch.float16 if device == "cuda" else torch.float32
+        device, _ = device_and_dtype()
+        components = cls._components
 
         print(f"[inpaint] Initializing SDXL Inpaint pipeline on {device}...")
         print(f"[inpaint] Loading model: {INPAINT_MODEL}")
 
-        # Load SDXL Inpainting pipeline (must use inpainting-specific model)
-        cls._pipe = StableDiffusionXLInpaintPipeline.from_pretrained(
-            INPAINT_MODEL,
-            torch_dtype=dtype,
-            use_safetensors=True,
-        ).to(device)
-
-        # Configure scheduler (DPM-Solver with Karras sigmas for quality)
-        cls._pipe.scheduler = DPMSolverMultistepScheduler.from_config(
-            cls._pipe.scheduler.config,
-            use_karras_sigmas=True
+        # Scheduler: DPM-Solver with Karras sigmas for quality
+        cls._pipe = StableDiffusionXLInpaintPipeline(
+            **components.sdxl_shared(),
+            unet=components.unet(INPAINT_MODEL),
+            scheduler=components.scheduler(INPAINT_MODEL),
         )
 
         # Memory optimizations
@@ -267,20 +321,31 @@ class InpaintGenerator(Generator):
 
         # Load IP-Adapter (with Plus support)
         if IP_ADAPTER_ENABLED:
-            cls._load_ip_adapter(dtype, device)
+            cls._load_ip_adapter()
+        compile_unet(cls._pipe.unet, ["IP-Adapter call scale"] if call_scaled(cls._pipe.unet) else [])
 
         cls._device = device
+        pipe = cls._pipe
+        cls._pool = PipelinePool(lambda: pipeline_replica(pipe, PIPELINE_REPLICA_MODE), replicas_for(device))
         print(f"[inpaint] Pipeline ready in {time.time() - t0:.2f}s")
 
         return cls._pipe
 
     @classmethod
-    def _load_ip_adapter(cls, dtype, device):
+    def unload(cls) -> None:
+        """Drop the pipeline; components still used by another generator stay loaded."""
+        cls._pipe = cls._pool = None
+        cls._prepared.clear()  # latents of the released VAE
+        cls._components.release_all()
+
+    @classmethod
+    def _load_ip_adapter(cls):
         """
         Load IP-Adapter with proper image encoder support.
 
         IP-Adapter Plus requires the ViT-H image encoder from OpenCLIP.
-        Standard IP-Adapter uses the default CLIP encoder.
+        Standard IP-Adapter uses the default CLIP encoder. Either comes from
+        the shared registry, so it is loaded once if full mode uses it too.
 
         Falls back to standard IP-Adapter if Plus fails.
         """
@@ -290,34 +355,25 @@ class InpaintGenerator(Generator):
         print(f"[inpaint] Is Plus version: {is_plus_version}")
 
         try:
-            # IP-Adapter Plus requires ViT-H image encoder
-            if is_plus_version:
-                print("[inpaint] Loading ViT-H image encoder for IP-Adapter Plus...")
-                try:
-                    image_encoder = CLIPVisionModelWithProjection.from_pretrained(
-                        IP_ADAPTER_REPO,
-                        subfolder="models/image_encoder",
-                        torch_dtype=dtype,
-                    ).to(device)
-
-                    # Set the image encoder on the pipeline BEFORE loading IP-Adapter
-                    cls._pipe.image_encoder = image_encoder
-                    print("[inpaint] ViT-H image encoder loaded successfully")
-
-                except Exception as enc_error:
-                    print(f"[inpaint] WARNING: Failed to load ViT-H encoder: {enc_error}")
-                    print("[inpaint] Falling back to standard IP-Adapter...")
-                    # Fall back to standard version
-                    cls._load_standard_ip_adapter()
-                    return
+            # Set the image encoder on the pipeline BEFORE loading IP-Adapter
+            try:
+                cls._pipe.image_encoder = cls._components.image_encoder(
+                    IP_ADAPTER_REPO, image_encoder_subfolder(IP_ADAPTER_WEIGHT, IP_ADAPTER_SUBFOLDER)
+                )
+                print(f"[inpaint] {'ViT-H' if is_plus_version else 'CLIP'} image encoder ready")
+            except Exception as enc_error:
+                if not is_plus_version:
+                    raise
+                print(f"[inpaint] WARNING: Failed to load ViT-H encoder: {enc_error}")
+                print("[inpaint] Falling back to standard IP-Adapter...")
+                # Fall back to standard version
+                cls._load_standard_ip_adapter()
+                return
 
             # Load IP-Adapter weights
-            cls._pipe.load_ip_adapter(
-                IP_ADAPTER_REPO,
-                subfolder=IP_ADAPTER_SUBFOLDER,
-                weight_name=IP_ADAPTER_WEIGHT,
-            )
+            cls._pipe.load_ip_adapter(**ip_adapter_weights(IP_ADAPTER_REPO, IP_ADAPTER_SUBFOLDER, IP_ADAPTER_WEIGHT))
             cls._pipe.set_ip_adapter_scale(IP_ADAPTER_SCALE)
+            enable_call_scale(cls._pipe.unet)  # each render passes its own scale
 
             adapter_type = "Plus (ViT-H)" if is_plus_version else "Standard"
             print(f"[inpaint] IP-Adapter {adapter_type} loaded, scale={IP_ADAPTER_SCALE}")
@@ -335,15 +391,15 @@ class InpaintGenerator(Generator):
     @classmethod
     def _load_standard_ip_adapter(cls):
         """
-        Fallback: Load standard IP-Adapter (no special encoder needed).
+        Fallback: Load standard IP-Adapter (its image encoder from the shared registry).
         """
         try:
-            cls._pipe.load_ip_adapter(
-                IP_ADAPTER_REPO,
-                subfolder=IP_ADAPTER_SUBFOLDER,
-                weight_name="ip-adapter_sdxl.bin",
+            cls._pipe.image_encoder = cls._components.image_encoder(
+                IP_ADAPTER_REPO, image_encoder_subfolder("ip-adapter_sdxl.bin", IP_ADAPTER_SUBFOLDER)
             )
+            cls._pipe.load_ip_adapter(**ip_adapter_weights(IP_ADAPTER_REPO, IP_ADAPTER_SUBFOLDER, "ip-adapter_sdxl.bin"))
             cls._pipe.set_ip_adapter_scale(IP_ADAPTER_SCALE)
+            enable_call_scale(cls._pipe.unet)
             print(f"[inpaint] Fallback: Standard IP-Adapter loaded, scale={IP_ADAPTER_SCALE}")
         except Exception as e2:
             print(f"[inpaint] ERROR: Could not load standard IP-Adapter: {e2}")
@@ -379,15 +435,99 @@ class InpaintGenerator(Generator):
 
         return reference_resized, mask_resized
 
-    def generate(self, req: GenerationRequest) -> GenerationResponse:
+    def _prepare_cut(self, pipe, cut: str, target_size: Tuple[int, int]) -> Optional[PreparedCut]:
+        """
+        The cut's job-independent inputs, computed once per (cut, resolution)
+        and kept until the asset files change or the pipeline is unloaded.
+        """
+        key = (cut, *target_size)
+        prepared = self._prepared.get(key)
+        if prepared is not None:
+            return prepared
+
+        reference, mask = self._get_assets_for_cut(cut, target_size)
+        if reference is None or mask is None:
+            return None
+
+        # Crop-to-mask: only the suit's bounding box goes through diffusion
+        region = None
+        if INPAINT_CROP_TO_MASK:
+            region = mask_crop_region(mask, INPAINT_CROP_PADDING, INPAINT_CROP_MIN_SIDE, self.max_resolution)
+        if region is not None:
+            image_in, mask_in = crop_for_inpaint(reference, mask, region)
+        else:
+            image_in, mask_in = reference, mask
+
+        t0 = time.time()
+        image_latents, mask_tensor, masked_image_latents = self._encode_inputs(pipe, image_in, mask_in)
+        prepared = PreparedCut(
+            reference=reference,
+            mask=mask,
+            region=region,
+            render_size=image_in.size,
+            image_latents=image_latents,
+            mask_tensor=mask_tensor,
+            masked_image_latents=masked_image_latents,
+        )
+        self._prepared[key] = prepared
+        print(f"[inpaint] Prepared cut '{cut}' at {target_size[0]}x{target_size[1]} "
+              f"(render {image_in.size[0]}x{image_in.size[1]}) in {time.time() - t0:.2f}s")
+        return prepared
+
+    @staticmethod
+    @torch.no_grad()
+    def _encode_inputs(pipe, image: Image.Image, mask: Image.Image) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        (image latents, processed mask, masked-image latents), as the pipeline
+        would compute them, except that the VAE posterior mean is used rather
+        than a seeded sample so they can be reused across jobs.
+        """
+        width, height = image.size
+        pixels = pipe.image_processor.preprocess(image, height=height, width=width).to(torch.float32)
+        mask_tensor = pipe.mask_processor.preprocess(mask, height=height, width=width)
+        masked = pixels * (mask_tensor < 0.5)
+
+        vae = pipe.vae
+        dtype = vae.dtype
+        upcast = vae.config.force_upcast and dtype != torch.float32
+        if upcast:
+            vae.to(dtype=torch.float32)
+        try:
+            batch = torch.cat([pixels, masked]).to(device=vae.device, dtype=vae.dtype)
+            latents = vae.encode(batch).latent_dist.mode() * vae.config.scaling_factor
+        finally:
+            if upcast:
+                vae.to(dtype=dtype)
+        image_latents, masked_image_latents = latents.chunk(2)
+        return image_latents, mask_tensor.to(vae.device), masked_image_latents
+
+    def render(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
+        return self._render(req, INPAINT_STEPS, should_stop)
+
+    def concurrency(self) -> int:
+        return replicas_for(device_and_dtype()[0])
+
+    def warm_up(self) -> None:
+        """Build the pipeline and inpaint every cut with WARMUP_STEPS steps (if the assets are there)."""
+        t0 = time.time()
+        self._get_pipeline()
+        if not self._load_assets():
+            print("[inpaint] warm-up: assets missing, pipeline loaded without a test render")
+            return
+        for _ in self._render(GenerationRequest(family_id="warmup", color_id="warmup", seed=0), WARMUP_STEPS):
+            pass
+        print(f"[inpaint] warm-up done in {time.time() - t0:.2f}s")
+
+    def _render(self, req: GenerationRequest, steps: int,
+                should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
         """
         Generate images using inpainting.
 
         Process:
-        1. Load reference image and mask for each cut
+        1. Get each cut's reference, mask and their latents (cached per cut and resolution)
         2. Download swatch image for IP-Adapter
         3. Run inpainting to replace suit fabric
-        4. Apply watermark and upload to storage
+        4. Yield each raw image (watermark and upload happen downstream)
         """
         print(f"\n{'='*70}")
         print(f"[inpaint] Starting generation")
@@ -397,21 +537,34 @@ class InpaintGenerator(Generator):
         print(f"  Swatch URL: {req.swatch_url}")
         print(f"  INPAINT_STRENGTH: {INPAINT_STRENGTH}")
         print(f"  INPAINT_GUIDANCE: {INPAINT_GUIDANCE}")
-        print(f"  INPAINT_STEPS: {INPAINT_STEPS}")
+        print(f"  INPAINT_STEPS: {steps}")
         print(f"{'='*70}\n")
 
         t0 = time.time()
 
-        # Load assets if not already loaded
-        if not self._load_assets():
-            raise RuntimeError(
-                "Failed to load inpainting assets. "
-                "Ensure reference images and masks exist in assets/inpaint/"
-            )
+        # Load assets if not already loaded, and the pipeline
+        with self._setup_lock:
+            if not self._load_assets():
+                raise RuntimeError(
+                    "Failed to load inpainting assets. "
+                    "Ensure reference images and masks exist in assets/inpaint/"
+                )
+            self._get_pipeline()
+
+        # Concurrent renders each hold a replica (own scheduler and call state)
+        with self._pool.checkout() as pipe:
+            yield from self._render_on(pipe, req, steps, should_stop)
 
-        # Get pipeline
-        pipe = self._get_pipeline()
+        total_time = time.time() - t0
+        print(f"\n[inpaint] All cuts rendered in {total_time:.2f}s")
+
+    def _render_on(self, pipe, req: GenerationRequest, steps: int,
+                   should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
         device = self._device
+        # Shared modules (VAE, text encoders) may have been offloaded to CPU
+        # by a full-mode render in the same worker; no-op if already there
+        if device == "cuda":
+            pipe.to(device)
 
         # Determine cuts to generate
         cuts = (req.cuts or ["recto", "cruzado"])[:2]
@@ -441,8 +594,9 @@ class InpaintGenerator(Generator):
             "wrinkled, dirty, stained, torn fabric"
         )
 
-        # Prepare IP-Adapter kwargs
+        # Prepare IP-Adapter kwargs (the scale is per call: the pipeline is shared)
         ip_kwargs = {}
+        ip_scale = IP_ADAPTER_SCALE
         if IP_ADAPTER_ENABLED and swatch_image is not None:
             ip_kwargs["ip_adapter_image"] = swatch_image
         elif IP_ADAPTER_ENABLED:
@@ -450,22 +604,25 @@ class InpaintGenerator(Generator):
             print("[inpaint] No swatch provided, using neutral IP-Adapter input")
             blank = Image.new("RGB", (512, 512), (200, 200, 200))
             ip_kwargs["ip_adapter_image"] = blank
-            pipe.set_ip_adapter_scale(0.0)
+            ip_scale = 0.0
 
         # Generate for each cut
-        run_id = uuid.uuid4().hex[:10]
         base_seed = req.seed if req.seed is not None else secrets.randbits(32)
-        images: List[ImageResult] = []
 
         for cut in cuts:
             print(f"\n[inpaint] Processing cut: {cut}")
 
-            # Get reference and mask
-            reference, mask = self._get_assets_for_cut(cut, (width, height))
+            # Resized reference and mask, crop and latents (cached per cut and resolution)
+            with self._setup_lock:
+                prepared = self._prepare_cut(pipe, cut, (width, height))
 
-            if reference is None or mask is None:
+            if prepared is None:
                 print(f"[inpaint] ERROR: Missing assets for cut '{cut}', skipping")
                 continue
+            region = prepared.region
+            render_width, render_height = prepared.render_size
+            if region is not None:
+                print(f"[inpaint] Cropped to mask box {region.box}, rendering {render_width}x{render_height}")
 
             # Derive per-cut seed for reproducibility
             derived = hashlib.sha256(f"{base_seed}:{cut}".encode()).digest()
@@ -475,65 +632,48 @@ class InpaintGenerator(Generator):
             print(f"[inpaint] Generating with seed={seed}")
             t1 = time.time()
 
-            # Reset IP-Adapter scale if we have a swatch
-            if IP_ADAPTER_ENABLED and swatch_image is not None:
-                pipe.set_ip_adapter_scale(IP_ADAPTER_SCALE)
-
             try:
-                # Run inpainting
-                result = pipe(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    image=reference,
-                    mask_image=mask,
-                    strength=INPAINT_STRENGTH,
-                    guidance_scale=INPAINT_GUIDANCE,
-                    num_inference_steps=INPAINT_STEPS,
-                    width=width,
-                    height=height,
-                    generator=generator,
-                    **ip_kwargs,
-                ).images[0]
+                # Run inpainting (own scheduler and call state, scale for this call only)
+                with ip_adapter_scale(ip_scale):
+                    result = pipeline_for_call(pipe)(
+                        prompt=prompt,
+                        negative_prompt=negative_prompt,
+                        image=prepared.image_latents.to(device),
+                        mask_image=prepared.mask_tensor.to(device),
+                        masked_image_latents=prepared.masked_image_latents.to(device),
+                        strength=INPAINT_STRENGTH,
+                        guidance_scale=INPAINT_GUIDANCE,
+                        num_inference_steps=steps,
+                        width=render_width,
+                        height=render_height,
+                        generator=generator,
+                        **ip_kwargs,
+                        **step_interrupt(should_stop),
+                    ).images[0]
 
                 print(f"[inpaint] Generation done in {time.time() - t1:.2f}s")
+                if region is not None:
+                    result = paste_inpainted(prepared.reference, result, prepared.mask, region, INPAINT_CROP_FEATHER)
 
             except Exception as e:
                 print(f"[inpaint] ERROR during generation: {e}")
                 raise
 
-            # Post-process: watermark and upload
-            buf = io.BytesIO()
-            result.save(buf, format="JPEG", quality=95)
-            raw_bytes = buf.getvalue()
-
-            wm_bytes = apply_watermark_image(raw_bytes, self.watermark_path, scale=0.30)
-            key = f"generated/{req.family_id}/{req.color_id}/{run_id}/{cut}.jpg"
-            saved_url = self.storage.save_bytes(wm_bytes, key)
-
-            # Apply public URL if configured
-            if PUBLIC_BASE_URL:
-                parsed = urlparse(saved_url)
-                path = parsed.path if parsed.scheme else saved_url
-                public_url = urljoin(PUBLIC_BASE_URL.rstrip('/') + '/', path.lstrip('/'))
-            else:
-                public_url = saved_url
-
-            images.append(
-                ImageResult(
-                    cut=cut,
-                    url=public_url,
-                    width=width,
-                    height=height,
-                    watermark=True,
-                    meta={
-                        "seed": str(seed),
-                        "steps": str(INPAINT_STEPS),
-                        "guidance": str(INPAINT_GUIDANCE),
-                        "strength": str(INPAINT_STRENGTH),
-                        "engine": "sdxl-inpaint",
-                        "ip_adapter_scale": str(IP_ADAPTER_SCALE) if swatch_image else "0",
-                    },
-                )
+            # Hand the raw image to post-processing (watermark + upload)
+            yield RenderedCut(
+                cut=cut,
+                image=result,
+                width=width,
+                height=height,
+                meta={
+                    "seed": str(seed),
+                    "steps": str(steps),
+                    "guidance": str(INPAINT_GUIDANCE),
+                    "strength": str(INPAINT_STRENGTH),
+                    "engine": "sdxl-inpaint",
+                    "ip_adapter_scale": str(IP_ADAPTER_SCALE) if swatch_image else "0",
+                    "crop": ",".join(map(str, region.box)) if region else "full",
+                },
             )
 
             # Clear CUDA cache between cuts
@@ -541,18 +681,5 @@ class InpaintGenerator(Generator):
                 gc.collect()
                 torch.cuda.empty_cache()
 
-        total_time = time.time() - t0
-        print(f"\n[inpaint] All cuts completed in {total_time:.2f}s")
-
-        return GenerationResponse(
-            request_id=run_id,
-            status="completed",
-            images=images,
-            duration_ms=int(total_time * 1000),
-            meta={
-                "family_id": req.family_id,
-                "color_id": req.color_id,
-                "device": device,
-                "engine": "inpaint",
-            },
-        )
+    def response_meta(self, req: GenerationRequest) -> Dict[str, str]:
+        return {**super().response_meta(req), "device": self._device, "engine": "inpaint"}
@@ -1,24 +1,109 @@
 """Mock generator for testing without GPU."""
-import io
 import time
 import uuid
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
 
 from app.generation.schemas import GenerationRequest, GenerationResponse, ImageResult
 from app.generation.storage import Storage
-from app.generation.watermark import apply_watermark_image
-from app.generation.generator_config import WATERMARK_PATH
+from app.generation.generator_config import resolve_watermark_path
+from app.generation.postprocess import RenderedCut, finish_cut
+from app.generation.pipeline_pool import replicas_for
+
+
+# Called with each cut's result as soon as it has been uploaded
+ImageCallback = Callable[[ImageResult], None]
+
+# Polled by render() between denoising steps and cuts; True stops the render
+StopCheck = Callable[[], bool]
+
+
+class GenerationInterrupted(Exception):
+    """render() stopped early (the worker is shutting down); finished cuts are kept."""
+
+
+def step_interrupt(should_stop: Optional[StopCheck]) -> Dict[str, Callable]:
+    """diffusers kwargs that abort denoising at the next step boundary once should_stop() is True."""
+    if should_stop is None:
+        return {}
+
+    def on_step_end(pipe, step, timestep, callback_kwargs):
+        if should_stop():
+            raise GenerationInterrupted(f"render interrupted after step {step + 1}")
+        return callback_kwargs
+
+    return {"callback_on_step_end": on_step_end}
 
 
 class Generator:
-    """Base generator interface."""
-    def generate(self, req: GenerationRequest) -> GenerationResponse:
+    """
+    Base generator interface.
+
+    Subclasses implement render() (inference only, one RenderedCut per cut).
+    render_colors() renders a batch job (req.colors), one RenderedCut per
+    color and cut; generators that can batch the colors override it.
+    generate() runs the simple inline path: encode, watermark and upload each
+    cut right after it is rendered. The worker instead feeds render() into a
+    StagedPipeline so post-processing overlaps the next inference.
+    """
+    storage: Storage
+    watermark_path: str  # set by the subclass (resolve_watermark_path() by default)
+    rewrite_public_url: bool = True  # apply PUBLIC_BASE_URL to storage URLs
+    modes: Tuple[str, ...] = ("full",)  # GenerationRequest.mode values this generator serves
+    max_resolution: int = 2016          # long side of the rendered images
+
+    def render(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
         raise NotImplementedError
 
+    def render_colors(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
+        """A batch job's colors one after another, each image tagged with its color_id."""
+        for color in req.colors:
+            single = req.model_copy(update={"color_id": color.color_id, "swatch_url": color.swatch_url, "colors": []})
+            for rendered in self.render(single, should_stop):
+                yield replace(rendered, color_id=color.color_id)
+
+    def response_meta(self, req: GenerationRequest) -> Dict[str, str]:
+        return {"family_id": req.family_id, "color_id": req.color_id}
+
+    def loaded_loras(self) -> List[str]:
+        """LoRA adapters currently loaded (advertised to the job router)."""
+        return []
+
+    def warm_up(self) -> None:
+        """Load models and run a short dummy render so the first job doesn't pay for it."""
+
+    def concurrency(self) -> int:
+        """How many render() calls may run at once (pipeline_pool replicas)."""
+        return 1
+
+    def profile_names(self) -> Optional[List[str]]:
+        """Generation profiles this generator serves (advertised to the job router); None: any."""
+        return None
+
+    def generate(self, req: GenerationRequest, on_image: Optional[ImageCallback] = None) -> GenerationResponse:
+        t0 = time.time()
+        run_id = uuid.uuid4().hex[:10]
+        images: List[ImageResult] = []
 
-def _placeholder_bytes(text: str, width=1344, height=2016) -> bytes:
+        for rendered in (self.render_colors if req.colors else self.render)(req):
+            result = finish_cut(
+                rendered, req, run_id, self.storage, self.watermark_path, self.rewrite_public_url
+            )
+            images.append(result)
+            if on_image:
+                on_image(result)
+
+        return GenerationResponse(
+            request_id=run_id,
+            status="completed",
+            images=images,
+            duration_ms=int((time.time() - t0) * 1000),
+            meta=self.response_meta(req),
+        )
+
+
+def _placeholder_image(text: str, width=1344, height=2016) -> Image.Image:
     """Generate a placeholder image with text."""
     img = Image.new("RGB", (width, height), (24, 24, 24))
     d = ImageDraw.Draw(img)
@@ -26,41 +111,33 @@ def _placeholder_bytes(text: str, width=1344, height=2016) -> bytes:
     bbox = d.textbbox((0, 0), text, font=font)
     tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
     d.text(((width - tw) // 2, (height - th) // 2), text, fill=(230, 230, 230), font=font)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=92)
-    return buf.getvalue()
+    return img
 
 
 @dataclass
 class MockGenerator(Generator):
     """Mock generator that returns placeholder images (fast, no GPU required)."""
     storage: Storage
+    rewrite_public_url = False  # mock URLs are returned exactly as storage gives them
+    modes = ("full", "inpaint")  # stands in for either generator
 
-    def generate(self, req: GenerationRequest) -> GenerationResponse:
-        t0 = time.time()
-        run_id = uuid.uuid4().hex[:10]
-        images: List[ImageResult] = []
+    def __post_init__(self):
+        self.watermark_path = resolve_watermark_path()
 
+    def render(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
         cuts = (req.cuts or ["recto", "cruzado"])[:2]
         for cut in cuts:
-            raw = _placeholder_bytes(f"{req.family_id}:{req.color_id}:{cut}")
-            wm = apply_watermark_image(raw, WATERMARK_PATH, scale=0.30)  # watermark first
-            key = f"generated/{req.family_id}/{req.color_id}/{run_id}/{cut}.jpg"
-            url = self.storage.save_bytes(wm, key)  # then save → URL
-            images.append(
-                ImageResult(
-                    cut=cut,
-                    url=url,
-                    width=1344,
-                    height=2016,
-                    watermark=True,
-                )
+            if should_stop is not None and should_stop():
+                raise GenerationInterrupted(f"render interrupted before {cut}")
+            yield RenderedCut(
+                cut=cut,
+                image=_placeholder_image(f"{req.family_id}:{req.color_id}:{cut}"),
+                width=1344,
+                height=2016,
             )
 
-        return GenerationResponse(
-            request_id=run_id,
-            status="completed",
-            images=images,
-            duration_ms=int((time.time() - t0) * 1000),
-            meta={"family_id": req.family_id, "color_id": req.color_id, "engine": "mock"},
-        )
+    def concurrency(self) -> int:
+        return replicas_for("cpu")  # placeholders render anywhere; honours PIPELINE_REPLICAS for testing
+
+    def response_meta(self, req: GenerationRequest) -> Dict[str, str]:
+        return {**super().response_meta(req), "engine": "mock"}
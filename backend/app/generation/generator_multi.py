@@ -0,0 +1,65 @@
+"""
+Both generation modes in one worker.
+
+SdxlTurboGenerator and InpaintGenerator build their pipelines from the
+shared model registry, so loading both keeps one VAE, one pair of text
+encoders and (with the same IP-Adapter family) one image encoder; only the
+UNets, ControlNets and adapter weights are per mode. Each job picks its mode
+with GenerationRequest.mode.
+
+Usage:
+    - Set GENERATOR_MODE=multi in environment
+    - MULTI_DEFAULT_MODE (default "full") serves jobs that don't ask for a mode
+"""
+from __future__ import annotations
+import os
+from typing import Dict, Iterator, List, Optional
+
+from app.generation.schemas import GenerationRequest
+from app.generation.storage import Storage
+from app.generation.generator import SdxlTurboGenerator
+from app.generation.generator_inpaint import InpaintGenerator
+from app.generation.generator_mock import Generator, StopCheck
+from app.generation.postprocess import RenderedCut
+
+MULTI_DEFAULT_MODE = os.getenv("MULTI_DEFAULT_MODE", "full").lower()
+
+
+class MultiModeGenerator(Generator):
+    """Dispatches each job to the full (ControlNet) or inpaint generator."""
+
+    modes = ("full", "inpaint")
+    max_resolution = max(SdxlTurboGenerator.max_resolution, InpaintGenerator.max_resolution)
+
+    def __init__(self, storage: Storage, watermark_path: Optional[str] = None):
+        self.storage = storage
+        self.generators: Dict[str, Generator] = {
+            "full": SdxlTurboGenerator(storage, watermark_path),
+            "inpaint": InpaintGenerator(storage, watermark_path),
+        }
+        self.watermark_path = self.generators["full"].watermark_path
+
+    def for_request(self, req: GenerationRequest) -> Generator:
+        return self.generators[req.mode or MULTI_DEFAULT_MODE]
+
+    def render(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
+        return self.for_request(req).render(req, should_stop)
+
+    def render_colors(self, req: GenerationRequest, should_stop: Optional[StopCheck] = None) -> Iterator[RenderedCut]:
+        return self.for_request(req).render_colors(req, should_stop)
+
+    def response_meta(self, req: GenerationRequest) -> Dict[str, str]:
+        return self.for_request(req).response_meta(req)
+
+    def warm_up(self) -> None:
+        for generator in self.generators.values():
+            generator.warm_up()
+
+    def profile_names(self) -> Optional[List[str]]:
+        return self.generators["full"].profile_names()  # inpaint renders ignore profiles
+
+    def concurrency(self) -> int:
+        return max(g.concurrency() for g in self.generators.values())
+
+    def loaded_loras(self) -> List[str]:
+        return sorted({lora for g in self.generators.values() for lora in g.loaded_loras()})
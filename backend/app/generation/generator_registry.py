@@ -0,0 +1,50 @@
+"""
+Generator backends by mode, imported on demand.
+
+Only the selected backend's module is imported, so a mock worker (and the
+API, which never renders) doesn't pay for torch / diffusers / transformers
+at startup.
+
+Usage:
+    generator = create_generator("inpaint", storage)
+"""
+from __future__ import annotations
+import importlib
+from dataclasses import dataclass
+from typing import Dict, Type
+
+from app.generation.storage import Storage
+
+
+@dataclass(frozen=True)
+class GeneratorBackend:
+    module: str
+    class_name: str
+    label: str
+
+    def load(self) -> Type:
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+GENERATORS: Dict[str, GeneratorBackend] = {
+    "mock": GeneratorBackend("app.generation.generator_mock", "MockGenerator", "Mock"),
+    "full": GeneratorBackend("app.generation.generator", "SdxlTurboGenerator", "SDXL Full Generation"),
+    "inpaint": GeneratorBackend("app.generation.generator_inpaint", "InpaintGenerator", "SDXL Inpaint"),
+    "multi": GeneratorBackend("app.generation.generator_multi", "MultiModeGenerator", "SDXL Full + Inpaint"),
+}
+DEFAULT_GENERATOR = "full"
+
+
+def resolve_mode(mode: str) -> str:
+    """mode if it is a known backend, else the default (with a warning)."""
+    mode = (mode or DEFAULT_GENERATOR).lower()
+    if mode not in GENERATORS:
+        print(f"⚠️ [generators] Unknown generator mode {mode!r}; using {DEFAULT_GENERATOR!r} "
+              f"(options: {', '.join(GENERATORS)})")
+        return DEFAULT_GENERATOR
+    return mode
+
+
+def create_generator(mode: str, storage: Storage):
+    """Import the backend for mode and build it."""
+    return GENERATORS[resolve_mode(mode)].load()(storage)
@@ -0,0 +1,112 @@
+"""
+Per-family LoRA adapters with an in-memory LRU.
+
+Each family's lora_id (fabrics.json) names LORA_DIR/{lora_id}.safetensors,
+or the same file in the Hub repo LORA_REPO. Adapters are loaded into the
+UNet under their lora_id and switched with set_adapters(); weights are never
+fused, so activating, switching or deactivating one is a flag/scale change.
+At most LORA_MAX_LOADED stay loaded; the least recently used is deleted.
+
+Only the UNet gets LoRA layers: the text encoders are shared with the other
+pipelines through the model registry and stay untouched.
+"""
+from __future__ import annotations
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+LORA_DIR = os.getenv("LORA_DIR", "/workspace/loras")
+LORA_REPO = os.getenv("LORA_REPO", "")  # optional Hub repo with {lora_id}.safetensors files
+LORA_SCALE = float(os.getenv("LORA_SCALE", "0.8"))
+LORA_MAX_LOADED = int(os.getenv("LORA_MAX_LOADED", "4"))
+
+
+def lora_source(lora_id: str) -> Optional[Tuple[str, str]]:
+    """(directory or repo, weight_name) for lora_id, or None if it isn't available."""
+    weight_name = f"{lora_id}.safetensors"
+    if (Path(LORA_DIR) / weight_name).exists():
+        return LORA_DIR, weight_name
+    if LORA_REPO:
+        return LORA_REPO, weight_name
+    return None
+
+
+def loras_available() -> bool:
+    """Whether any family LoRA can be loaded (LORA_DIR holds one, or LORA_REPO is set)."""
+    return bool(LORA_REPO) or any(Path(LORA_DIR).glob("*.safetensors"))
+
+
+def load_unet_lora(pipe, lora_id: str) -> bool:
+    """Load lora_id's UNet layers into pipe.unet as adapter lora_id; False if it isn't available."""
+    source = lora_source(lora_id)
+    if source is None:
+        return False
+    state_dict, network_alphas = pipe.lora_state_dict(source[0], weight_name=source[1])
+    unet_state = {k: v for k, v in state_dict.items() if k.startswith("unet.")}
+    unet_alphas = {k: v for k, v in (network_alphas or {}).items() if k.startswith("unet.")} or None
+    pipe.load_lora_into_unet(unet_state, unet_alphas, unet=pipe.unet, adapter_name=lora_id)
+    return True
+
+
+class LoraAdapters:
+    """The adapters loaded into one UNet, least recently used first."""
+
+    def __init__(self, unet: Any, loader, max_loaded: int = LORA_MAX_LOADED, scale: float = LORA_SCALE):
+        self.unet = unet
+        self.loader = loader  # loader(lora_id) -> bool, loads the adapter into unet
+        self.max_loaded = max_loaded
+        self.scale = scale
+        self.active: Optional[str] = None
+        self._loaded: "OrderedDict[str, None]" = OrderedDict()
+        self._missing: set = set()
+
+    def loaded(self) -> List[str]:
+        """Loaded adapters, most recently used first."""
+        return list(reversed(self._loaded))
+
+    def activate(self, lora_id: Optional[str]) -> Optional[str]:
+        """
+        Make lora_id the only active adapter, loading it (and evicting the LRU
+        one) if needed. No lora_id, or one with no weights available, renders
+        without LoRA. Returns the active adapter.
+        """
+        if not lora_id or lora_id in self._missing:
+            self.deactivate()
+            return None
+
+        if lora_id not in self._loaded:
+            if not self.loader(lora_id):
+                print(f"[lora] {lora_id} not found in {LORA_DIR or LORA_REPO}; rendering without LoRA")
+                self._missing.add(lora_id)
+                self.deactivate()
+                return None
+            self._loaded[lora_id] = None
+            # Evict after loading, so an unavailable adapter never costs a loaded one
+            while len(self._loaded) > self.max_loaded:
+                evicted, _ = self._loaded.popitem(last=False)
+                if evicted == self.active:
+                    self.deactivate()
+                self.unet.delete_adapters(evicted)
+                print(f"[lora] evicted {evicted}")
+            print(f"[lora] loaded {lora_id} ({len(self._loaded)}/{self.max_loaded})")
+        self._loaded.move_to_end(lora_id)
+
+        if self.active != lora_id:
+            if self.active is None:
+                self.unet.enable_lora()
+            self.unet.set_adapters([lora_id], weights=[self.scale])
+            self.active = lora_id
+        return lora_id
+
+    def deactivate(self) -> None:
+        if self.active is not None:
+            self.unet.disable_lora()
+            self.active = None
+
+    def clear(self) -> None:
+        """Delete every loaded adapter (the UNet may outlive this pipeline in the registry)."""
+        self.deactivate()
+        if self._loaded:
+            self.unet.delete_adapters(list(self._loaded))
+        self._loaded.clear()
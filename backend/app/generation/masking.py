@@ -0,0 +1,92 @@
+"""
+Crop-to-mask inpainting helpers.
+
+The suit mask covers only part of the reference photo, so the inpaint
+generator renders just the mask's padded bounding box (at an SDXL-friendly
+size) and pastes the result back into the untouched reference. The blend
+mask is feathered inwards only: every pixel outside the original mask keeps
+the reference's exact value.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image, ImageChops, ImageFilter
+
+MASK_THRESHOLD = 127  # mask pixels above this are regenerated
+
+
+@dataclass(frozen=True)
+class CropRegion:
+    """Box of the reference to inpaint, and the size it is rendered at."""
+    box: Tuple[int, int, int, int]  # left, top, right, bottom (reference pixels)
+    render_size: Tuple[int, int]    # width, height (multiples of `multiple`)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        left, top, right, bottom = self.box
+        return right - left, bottom - top
+
+
+def _round_to(value: float, multiple: int) -> int:
+    return max(multiple, int(round(value / multiple)) * multiple)
+
+
+def mask_crop_region(
+    mask: Image.Image,
+    padding: int = 48,
+    min_side: int = 768,
+    max_side: int = 1536,
+    multiple: int = 8,
+) -> Optional[CropRegion]:
+    """
+    The mask's bounding box grown by padding (clamped to the image), or None
+    if the mask is empty. The crop is rendered at its own resolution, scaled
+    up so its short side reaches min_side (SDXL degrades on small canvases)
+    and down so its long side fits max_side, rounded to `multiple`.
+    """
+    bbox = mask.convert("L").point(lambda v: 255 if v > MASK_THRESHOLD else 0).getbbox()
+    if bbox is None:
+        return None
+    width, height = mask.size
+    left, top, right, bottom = bbox
+    box = (max(0, left - padding), max(0, top - padding), min(width, right + padding), min(height, bottom + padding))
+    crop_w, crop_h = box[2] - box[0], box[3] - box[1]
+
+    scale = max(1.0, min_side / min(crop_w, crop_h))
+    scale = min(scale, max_side / max(crop_w, crop_h))
+    return CropRegion(box=box, render_size=(_round_to(crop_w * scale, multiple), _round_to(crop_h * scale, multiple)))
+
+
+def crop_for_inpaint(
+    reference: Image.Image, mask: Image.Image, region: CropRegion
+) -> Tuple[Image.Image, Image.Image]:
+    """(reference crop, mask crop), both resized to region.render_size."""
+    return (
+        reference.crop(region.box).resize(region.render_size, Image.LANCZOS),
+        mask.convert("L").crop(region.box).resize(region.render_size, Image.NEAREST),
+    )
+
+
+def paste_inpainted(
+    reference: Image.Image,
+    rendered: Image.Image,
+    mask: Image.Image,
+    region: CropRegion,
+    feather: int = 8,
+) -> Image.Image:
+    """
+    The reference with the rendered crop blended in under the mask.
+
+    The blend mask is the mask blurred by feather and then limited to the
+    mask itself, so the seam fades inside the suit while pixels outside the
+    mask (and outside the box) stay exactly the reference's.
+    """
+    rendered = rendered.convert(reference.mode).resize(region.size, Image.LANCZOS)
+    mask_crop = mask.convert("L").crop(region.box)
+    alpha = mask_crop
+    if feather > 0:
+        alpha = ImageChops.darker(mask_crop.filter(ImageFilter.GaussianBlur(feather)), mask_crop)
+    out = reference.copy()
+    out.paste(Image.composite(rendered, reference.crop(region.box), alpha), region.box[:2])
+    return out
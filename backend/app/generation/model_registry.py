@@ -0,0 +1,248 @@
+"""
+Process-wide registry of SDXL components shared between generators.
+
+Each component (VAE, text encoders, tokenizers, UNets, ControlNets, the
+IP-Adapter image encoder) is loaded once per key and reference-counted.
+SdxlTurboGenerator and InpaintGenerator assemble their pipelines from the
+registry, so a worker running both modes keeps a single copy of everything
+the two share: the SDXL VAE, both text encoders and tokenizers (the
+inpainting checkpoint was fine-tuned from SDXL base with them frozen), and
+the image encoder when both modes use the same IP-Adapter family. The
+refiner shares the VAE and the second text encoder as well.
+
+Components baked into MODEL_SNAPSHOT_DIR (see snapshot.py) are loaded from
+there, offline; the rest come from the hub. Without CUDA they are loaded
+for the CPU backend (see cpu_backend.py).
+
+torch / diffusers are imported inside the loaders only.
+"""
+from __future__ import annotations
+import gc
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.generation import snapshot
+
+# Repo the shared components (VAE, text encoders, tokenizers) come from
+SDXL_BASE_MODEL = os.getenv("SDXL_BASE_MODEL", "stabilityai/stable-diffusion-xl-base-1.0")
+SDXL_REFINER_MODEL = os.getenv("SDXL_REFINER_MODEL", "stabilityai/stable-diffusion-xl-refiner-1.0")
+
+# TORCH_COMPILE=1 compiles the UNets once a generator has installed their
+# per-call wrappers (see compile_unet; the work happens on the first forward,
+# i.e. during the worker's warm-up). Inductor artifacts are cached in
+# TORCH_COMPILE_CACHE_DIR, so a restarted worker reuses them.
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "0") == "1"
+TORCH_COMPILE_MODE = os.getenv("TORCH_COMPILE_MODE", "max-autotune-no-cudagraphs")
+TORCH_COMPILE_CACHE_DIR = os.getenv("TORCH_COMPILE_CACHE_DIR") or os.getenv("TORCHINDUCTOR_CACHE_DIR") \
+    or "/workspace/torch_compile_cache"
+
+
+def device_and_dtype() -> Tuple[str, Any]:
+    import torch
+    if torch.cuda.is_available():
+        return "cuda", torch.float16
+    from app.generation import cpu_backend
+    cpu_backend.configure_threads()
+    return "cpu", cpu_backend.cpu_dtype()
+
+
+def compile_module(module: Any, backend: str = "inductor") -> Any:
+    """
+    torch.compile module in place: it stays the same object, so the registry
+    and the pipelines sharing it still see it (changing its layers later
+    costs a recompile, not an error).
+    """
+    if backend != "inductor":
+        module.compile(backend=backend)
+        print(f"[registry] compiling {type(module).__name__} (backend={backend})")
+        return module
+    import torch._inductor.config
+    # Set, not setdefault: inductor fills the variable in with its /tmp default on first use
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = TORCH_COMPILE_CACHE_DIR
+    torch._inductor.config.fx_graph_cache = True
+    module.compile(mode=TORCH_COMPILE_MODE)
+    print(f"[registry] compiling {type(module).__name__} (mode={TORCH_COMPILE_MODE}, cache {TORCH_COMPILE_CACHE_DIR})")
+    return module
+
+
+def compile_unet(unet: Any, blockers: Sequence[str] = ()) -> Any:
+    """
+    Compile unet after its generator installed the step cache / IP-Adapter
+    call-scale wrappers, with CPU_COMPILE_BACKEND on the CPU, inductor if
+    TORCH_COMPILE. blockers names the features in use that change what a
+    render traces (a step cache, a per-call IP-Adapter scale, per-job LoRA
+    adapters): each render would recompile until dynamo gives up, so with
+    any of them the UNet runs eagerly, and one compiled earlier is reverted.
+    """
+    backend = "inductor" if TORCH_COMPILE else None
+    if unet.device.type == "cpu":
+        from app.generation import cpu_backend
+        backend = cpu_backend.compile_backend() or backend
+    compiled = getattr(unet, "_compiled_call_impl", None) is not None  # set by nn.Module.compile
+    if blockers:
+        if backend or compiled:
+            print(f"[registry] {type(unet).__name__} runs eagerly: {', '.join(blockers)} would retrace it")
+        unet._compiled_call_impl = None
+        return unet
+    return compile_module(unet, backend) if backend and not compiled else unet
+
+
+class ModelRegistry:
+    """Load-once, reference-counted components keyed by what they were loaded from."""
+
+    def __init__(self):
+        self._modules: Dict[str, Any] = {}
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the component for key, calling loader() the first time; adds a reference."""
+        with self._lock:
+            if key not in self._modules:
+                t0 = time.time()
+                self._modules[key] = loader()
+                print(f"[registry] loaded {key} in {time.time() - t0:.2f}s")
+            self._refs[key] = self._refs.get(key, 0) + 1
+            return self._modules[key]
+
+    def release(self, key: str) -> None:
+        """Drop a reference; the last one frees the component."""
+        with self._lock:
+            if key not in self._refs:
+                return
+            self._refs[key] -= 1
+            if self._refs[key] > 0:
+                return
+            del self._refs[key]
+            del self._modules[key]
+            print(f"[registry] freed {key}")
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def refcounts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._refs)
+
+
+def from_pretrained(cls: Any, key: str, repo: str, subfolder: Optional[str] = None, **kwargs: Any) -> Any:
+    """cls.from_pretrained for registry key: from the local snapshot if it has key, else repo/subfolder."""
+    local = snapshot.model_snapshot.path(key) if snapshot.model_snapshot else None
+    if local:
+        return cls.from_pretrained(local, local_files_only=True, **kwargs)
+    return cls.from_pretrained(repo, subfolder=subfolder, **kwargs)
+
+
+def ip_adapter_weights(repo: str, subfolder: str, weight_name: str) -> Dict[str, Any]:
+    """load_ip_adapter() kwargs for these weights, from the local snapshot if it has them."""
+    key = f"ip_adapter:{repo}/{subfolder}/{weight_name}"
+    entry = snapshot.model_snapshot.entry(key) if snapshot.model_snapshot else None
+    if entry:
+        return dict(pretrained_model_name_or_path_or_dict=snapshot.model_snapshot.path(key), subfolder="",
+                    weight_name=entry["weight_name"], local_files_only=True)
+    return dict(pretrained_model_name_or_path_or_dict=repo, subfolder=subfolder, weight_name=weight_name)
+
+
+def image_encoder_subfolder(weight_name: str, subfolder: str) -> str:
+    """IP-Adapter Plus (ViT-H) weights use models/image_encoder; the others ship one next to the weights."""
+    return "models/image_encoder" if "plus" in weight_name.lower() or "vit-h" in weight_name.lower() \
+        else f"{subfolder}/image_encoder"
+
+
+class ComponentSet:
+    """
+    The components one generator holds: acquires through the registry and
+    remembers the keys, so the generator can give them all back at once.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, device_dtype: Optional[Tuple[str, Any]] = None):
+        self.registry = registry if registry is not None else shared_registry
+        self.device_dtype = device_dtype  # None: device_and_dtype()
+        self.keys: List[str] = []
+
+    def acquire(self, key: str, loader: Callable[[], Any]) -> Any:
+        module = self.registry.acquire(key, loader)
+        self.keys.append(key)
+        return module
+
+    def release_all(self) -> None:
+        for key in self.keys:
+            self.registry.release(key)
+        self.keys = []
+
+    # --- SDXL components ----------------------------------------------------
+    def _model(self, cls: Any, key: str, repo: str, subfolder: Optional[str] = None,
+               cpu_parts: Optional[Tuple[str, ...]] = None, **kwargs: Any) -> Any:
+        """cls from repo on the device; with cpu_parts, CPU-optimized too (see cpu_backend.optimize)."""
+        device, dtype = self.device_dtype or device_and_dtype()
+
+        def load():
+            module = from_pretrained(cls, key, repo, subfolder, torch_dtype=dtype, **kwargs).to(device)
+            if device == "cpu" and cpu_parts is not None:
+                from app.generation import cpu_backend
+                return cpu_backend.optimize(module, cpu_parts)
+            return module
+
+        return self.acquire(key, load)
+
+    def sdxl_shared(self) -> Dict[str, Any]:
+        """VAE, text encoders and tokenizers of SDXL_BASE_MODEL (pipeline kwargs)."""
+        from transformers import CLIPTextModel, CLIPTextModelWithProjection, CLIPTokenizer
+        from diffusers import AutoencoderKL
+
+        def tokenizer(subfolder):
+            key = f"{subfolder}:{SDXL_BASE_MODEL}"
+            return self.acquire(key, lambda: from_pretrained(CLIPTokenizer, key, SDXL_BASE_MODEL, subfolder))
+
+        return dict(
+            vae=self._model(AutoencoderKL, f"vae:{SDXL_BASE_MODEL}", SDXL_BASE_MODEL, "vae",
+                            cpu_parts=("encoder", "decoder")),  # the pipelines call encode() / decode()
+            text_encoder=self._model(CLIPTextModel, f"text_encoder:{SDXL_BASE_MODEL}", SDXL_BASE_MODEL, "text_encoder"),
+            text_encoder_2=self._model(CLIPTextModelWithProjection, f"text_encoder_2:{SDXL_BASE_MODEL}",
+                                       SDXL_BASE_MODEL, "text_encoder_2"),
+            tokenizer=tokenizer("tokenizer"),
+            tokenizer_2=tokenizer("tokenizer_2"),
+        )
+
+    def unet(self, repo: str) -> Any:
+        from diffusers import UNet2DConditionModel
+        device, dtype = self.device_dtype or device_and_dtype()
+        key = f"unet:{repo}"
+
+        def load():
+            unet = from_pretrained(UNet2DConditionModel, key, repo, "unet", torch_dtype=dtype, use_safetensors=True)
+            if device == "cpu":
+                from app.generation import cpu_backend
+                return cpu_backend.optimize(unet.to(device), compiled=False)
+            return unet.to(device)  # compiled by its generator (compile_unet)
+
+        return self.acquire(key, load)
+
+    def controlnet(self, repo: str) -> Any:
+        from diffusers import ControlNetModel
+        return self._model(ControlNetModel, f"controlnet:{repo}", repo, cpu_parts=(), use_safetensors=True)
+
+    def image_encoder(self, repo: str, subfolder: str) -> Any:
+        from transformers import CLIPVisionModelWithProjection
+        return self._model(CLIPVisionModelWithProjection, f"image_encoder:{repo}/{subfolder}", repo, subfolder)
+
+    @staticmethod
+    def scheduler(repo: str) -> Any:
+        """DPM-Solver (Karras) from repo's scheduler config; schedulers are per pipeline (they hold state)."""
+        from diffusers import DPMSolverMultistepScheduler
+        return from_pretrained(DPMSolverMultistepScheduler, f"scheduler:{repo}", repo, "scheduler", use_karras_sigmas=True)
+
+    @staticmethod
+    def distilled_scheduler(repo: str) -> Any:
+        """Euler with trailing timesteps, what few-step distilled models (Turbo, Lightning) are sampled with."""
+        from diffusers import EulerDiscreteScheduler
+        return from_pretrained(EulerDiscreteScheduler, f"scheduler:{repo}", repo, "scheduler", timestep_spacing="trailing")
+
+
+shared_registry = ModelRegistry()
@@ -1,7 +1,6 @@
 """Database models for generation jobs."""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import JSON, Column, Integer, Float, String, Text, DateTime
 
 from app.core.database import Base
 
@@ -13,7 +12,7 @@ class GenerationJob(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(String, unique=True, nullable=False, index=True)  # UUID for API
-    status = Column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed, expired
 
     # Request parameters
     family_id = Column(String, nullable=False)
@@ -21,13 +20,62 @@ class GenerationJob(Base):
     cuts = Column(JSON, nullable=False)  # ["recto", "cruzado"]
     seed = Column(Integer, nullable=True)
     swatch_url = Column(String, nullable=True)  # URL to fabric swatch for IP-Adapter
+    colors = Column(JSON, nullable=True)  # batch job: [{color_id, swatch_url}, ...]; color_id / swatch_url are the first
+    requirements = Column(JSON, nullable=True)  # JobRequirements: mode, profile, lora_id (routing)
 
     # Results
     result_urls = Column(JSON, nullable=True)  # Array of generated image URLs
+    results = Column(JSON, nullable=True)  # Per-cut ImageResult dicts, written as each cut finishes
     error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")  # times claimed by a worker
+    passed_over = Column(Integer, nullable=False, default=0, server_default="0")  # times an affinity claim jumped it
+
+    # Lease held by the worker processing the job (renewed by heartbeats)
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+
+    # A job still pending after this is not claimed; the sweeper marks it "expired"
+    expires_at = Column(DateTime, nullable=True, index=True)
 
     # Timestamps
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+
+
+class Worker(Base):
+    """A generation worker process: liveness, current job and throughput counters."""
+
+    __tablename__ = "workers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(String, unique=True, nullable=False, index=True)
+    hostname = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="idle")  # warming, idle, busy, stopped
+    current_job_id = Column(String, nullable=True)
+    capabilities = Column(JSON, nullable=True)  # WorkerCapabilities advertised for job routing
+
+    # Throughput counters
+    jobs_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    jobs_failed = Column(Integer, nullable=False, default=0, server_default="0")
+    images_generated = Column(Integer, nullable=False, default=0, server_default="0")
+    busy_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+
+    # Timestamps
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_heartbeat_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class StoredProfile(Base):
+    """A named generation profile (see profiles.py): settings override the environment's default."""
+
+    __tablename__ = "generation_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False, index=True)
+    settings = Column(JSON, nullable=False)  # {"guidance": 5.0, "total_steps": 40, ...}
+
+    # Timestamps
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
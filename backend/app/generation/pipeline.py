@@ -0,0 +1,238 @@
+"""
+Staged pipeline that overlaps GPU inference with CPU post-processing and upload.
+
+    inference (caller thread)
+        └─▶ encode + watermark + spool to disk (thread pool)
+              └─▶ upload with retry (asyncio loop thread, bounded concurrency)
+                    └─▶ callbacks (on_image / on_complete / on_error)
+
+The caller (the worker's inference thread) iterates Generator.render() and
+submits each RenderedCut. submit() only blocks when PIPELINE_MAX_IN_FLIGHT
+images are already being encoded or uploaded, so the next cut or job starts
+denoising while the previous image is still being finished.
+
+With a spool, an image is on local disk before its upload starts; if the
+upload still fails after retries it is retried from the spool every
+UPLOAD_SPOOL_RETRY_S while the job stays held (heartbeats renew its lease),
+so a storage outage never sends a rendered job back to the queue. Entries
+still spooled when the worker stops are finalized on the next start.
+
+A job's on_error waits for its inference to end as well as for its cuts in
+flight, so an encode failure doesn't hand the job back while later cuts are
+still being rendered.
+
+All callbacks run on the upload loop thread, one at a time, so they can
+read-modify-write job rows without racing each other.
+"""
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from app.generation.schemas import GenerationRequest, ImageResult
+from app.generation.storage import Storage
+from app.generation.postprocess import (
+    RenderedCut, encode_cut, output_key, public_url, to_image_result,
+)
+from app.generation.spool import (
+    SpoolEntry, UploadSpool, UPLOAD_MAX_RETRIES, UPLOAD_SPOOL_RETRY_S, upload_with_retry,
+)
+
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", "2"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+PIPELINE_MAX_IN_FLIGHT = int(os.getenv("PIPELINE_MAX_IN_FLIGHT", "4"))
+
+
+@dataclass
+class JobTicket:
+    """Tracks one job's cuts through the post-processing stages."""
+    job_id: str
+    req: GenerationRequest
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:10])
+    images: List[ImageResult] = field(default_factory=list)
+    started: float = field(default_factory=time.time)
+    pending: int = 0            # cuts submitted but not yet uploaded
+    rendered_all: bool = False  # inference ended (every cut rendered, or aborted)
+    error: Optional[Exception] = None  # first failure (inference, encode, or upload without a spool)
+    done: bool = False          # on_complete or on_error already fired
+
+
+ImageHook = Callable[[JobTicket, ImageResult], None]
+TicketHook = Callable[[JobTicket], None]
+ErrorHook = Callable[[JobTicket, Exception], None]
+
+
+class StagedPipeline:
+    """Bounded encode → upload stages fed by the inference thread."""
+
+    def __init__(
+        self,
+        storage: Storage,
+        watermark_path: str,
+        on_image: Optional[ImageHook] = None,
+        on_complete: Optional[TicketHook] = None,
+        on_error: Optional[ErrorHook] = None,
+        rewrite_public_url: bool = True,
+        spool: Optional[UploadSpool] = None,
+        upload_retries: int = UPLOAD_MAX_RETRIES,
+        spool_retry_seconds: float = UPLOAD_SPOOL_RETRY_S,
+        encode_workers: int = POSTPROCESS_WORKERS,
+        upload_concurrency: int = UPLOAD_CONCURRENCY,
+        max_in_flight: int = PIPELINE_MAX_IN_FLIGHT,
+    ):
+        self.storage = storage
+        self.watermark_path = watermark_path
+        self.on_image = on_image
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.rewrite_public_url = rewrite_public_url
+        self.spool = spool
+        self.upload_retries = upload_retries
+        self.spool_retry_seconds = spool_retry_seconds
+
+        self._encode_pool = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="encode")
+        self._upload_pool = ThreadPoolExecutor(max_workers=upload_concurrency, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(max_in_flight)  # backpressure on inference
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._upload_gate = asyncio.Semaphore(upload_concurrency)
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="upload-loop", daemon=True)
+        self._loop_thread.start()
+
+    # --- inference-thread API -------------------------------------------------
+    def start_job(self, job_id: str, req: GenerationRequest) -> JobTicket:
+        return JobTicket(job_id=job_id, req=req)
+
+    def submit(self, ticket: JobTicket, rendered: RenderedCut) -> None:
+        """Queue one rendered cut for encode + upload (blocks only when the stages are full)."""
+        self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+            ticket.pending += 1
+        self._encode_pool.submit(self._encode, ticket, rendered)
+
+    def finish_job(self, ticket: JobTicket) -> None:
+        """Inference is done for every cut; complete once the last upload lands."""
+        with self._lock:
+            ticket.rendered_all = True
+        self._loop.call_soon_threadsafe(self._maybe_complete, ticket)
+
+    def abort_job(self, ticket: JobTicket, exc: Exception) -> None:
+        """
+        Inference failed or was interrupted; cuts already submitted still upload (and are recorded),
+        and on_error fires once they have landed so a retry only sees missing cuts.
+        """
+        with self._lock:
+            ticket.rendered_all = True  # no more cuts are coming
+        self._loop.call_soon_threadsafe(self._fail, ticket, exc)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted cut has been uploaded (or failed)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Flush and stop the stages. Returns False if cuts were still in flight
+        after timeout; those are abandoned (their images stay in the spool).
+        """
+        drained = self.drain(timeout)
+        # Let already-scheduled completion callbacks run before stopping the loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._encode_pool.shutdown(wait=drained, cancel_futures=not drained)
+        self._upload_pool.shutdown(wait=drained, cancel_futures=not drained)
+        return drained
+
+    # --- stages ---------------------------------------------------------------
+    def _encode(self, ticket: JobTicket, rendered: RenderedCut) -> None:
+        entry = SpoolEntry(
+            job_id=ticket.job_id,
+            cut=rendered.cut,
+            color_id=rendered.color_id,
+            key=output_key(ticket.req, ticket.run_id, rendered.cut, rendered.color_id),
+            rewrite_public_url=self.rewrite_public_url,
+            result={"width": rendered.width, "height": rendered.height, "watermark": True, "meta": rendered.meta},
+        )
+        try:
+            data = encode_cut(rendered, self.watermark_path)
+            if self.spool is not None:
+                self.spool.put(entry, data)
+        except Exception as e:
+            self._loop.call_soon_threadsafe(self._cut_failed, ticket, e)
+            return
+        asyncio.run_coroutine_threadsafe(self._upload(ticket, rendered, entry, data), self._loop)
+
+    async def _upload(self, ticket: JobTicket, rendered: RenderedCut, entry: SpoolEntry, data: bytes) -> None:
+        while True:
+            try:
+                async with self._upload_gate:
+                    saved_url = await self._loop.run_in_executor(
+                        self._upload_pool, upload_with_retry,
+                        self.storage, data, entry.key, entry.content_type, self.upload_retries,
+                    )
+                break
+            except Exception as e:
+                if self.spool is None:
+                    self._cut_failed(ticket, e)
+                    return
+                # The image is safe on disk: keep the job (and this cut) pending instead of re-rendering it
+                print(f"⚠️  [pipeline] {entry.key} still not uploaded ({e}); "
+                      f"kept in spool, retrying in {self.spool_retry_seconds:.0f}s")
+                await asyncio.sleep(self.spool_retry_seconds)
+
+        if self.spool is not None:
+            self.spool.remove(entry)
+        url = public_url(saved_url) if self.rewrite_public_url else saved_url
+        result = to_image_result(rendered, url)
+        ticket.images.append(result)
+        self._call(self.on_image, ticket, result)
+        self._cut_done(ticket)
+
+    # --- bookkeeping (loop thread) --------------------------------------------
+    def _cut_failed(self, ticket: JobTicket, exc: Exception) -> None:
+        self._fail(ticket, exc)
+        self._cut_done(ticket)
+
+    def _cut_done(self, ticket: JobTicket) -> None:
+        with self._lock:
+            ticket.pending -= 1
+            self._in_flight -= 1
+            self._idle.notify_all()
+        self._slots.release()
+        self._maybe_complete(ticket)
+
+    def _maybe_complete(self, ticket: JobTicket) -> None:
+        """Fire on_error or on_complete once inference has ended and nothing of this job is in flight."""
+        with self._lock:
+            if ticket.done or ticket.pending or not ticket.rendered_all:
+                return
+            ticket.done = True
+        if ticket.error is not None:
+            self._call(self.on_error, ticket, ticket.error)
+        else:
+            self._call(self.on_complete, ticket)
+
+    def _fail(self, ticket: JobTicket, exc: Exception) -> None:
+        with self._lock:
+            if ticket.error is None:
+                ticket.error = exc
+        self._maybe_complete(ticket)
+
+    @staticmethod
+    def _call(hook, *args) -> None:
+        if hook is None:
+            return
+        try:
+            hook(*args)
+        except Exception as e:
+            print(f"❌ [pipeline] callback {getattr(hook, '__name__', hook)} failed: {e}")
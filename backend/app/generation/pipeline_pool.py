@@ -0,0 +1,143 @@
+"""
+Pipeline replicas for concurrent renders within one worker.
+
+A generator keeps one loaded pipeline; a PipelinePool hands out up to
+`size` replicas of it, built on first demand by a factory, and a render
+holds one for its whole duration (checkout/checkin). The default replicas
+share the loaded weights and only have their own scheduler and call state
+(call_state.pipeline_replica), so N of them cost almost no memory; with
+PIPELINE_REPLICA_MODE=copy each one is a deep copy with its own weights.
+
+PIPELINE_REPLICAS sets the count: one number for every device ("2") or per
+device type ("cuda=2,cpu=4"; unlisted devices get 1). The async worker
+runs up to that many renders at once (Generator.concurrency()).
+
+Some state can't be per replica, e.g. which weights and LoRA the shared
+UNet has loaded. A ConfigGate lets renders that need the same such
+configuration run together and makes one that needs another wait until
+they are done, then switch.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Generic, Hashable, Iterator, List, Optional, TypeVar
+
+PIPELINE_REPLICAS = os.getenv("PIPELINE_REPLICAS", "1")
+PIPELINE_REPLICA_MODE = os.getenv("PIPELINE_REPLICA_MODE", "shared").lower()  # shared | copy
+
+T = TypeVar("T")
+
+
+def replicas_for(device: str, spec: str = PIPELINE_REPLICAS) -> int:
+    """Replica count for device ("cuda:0" -> the "cuda" entry) from a PIPELINE_REPLICAS spec."""
+    spec = spec.strip()
+    if not spec:
+        return 1
+    if "=" not in spec:
+        return max(1, int(spec))
+    device_type = device.split(":")[0]
+    for part in spec.split(","):
+        name, _, count = part.partition("=")
+        if name.strip() in (device, device_type):
+            return max(1, int(count))
+    return 1
+
+
+class PipelinePool(Generic[T]):
+    """Up to `size` replicas from factory(); checkout() blocks until one is free."""
+
+    def __init__(self, factory: Callable[[], T], size: int = 1):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle: List[T] = []
+        self._created = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[T]:
+        replica = self._acquire(timeout)
+        try:
+            yield replica
+        finally:
+            with self._cond:
+                self._in_use -= 1
+                self._idle.append(replica)
+                self._cond.notify()
+
+    def _acquire(self, timeout: Optional[float]) -> T:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"no pipeline replica free within {timeout}s ({self.size} in use)")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self.factory()  # outside the lock: building a replica may take a while
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+
+class ConfigGate:
+    """
+    Renders run inside use(key, setup). While renders with one key are
+    running, others with the same key join them; a render with another key
+    waits until they have finished, and new arrivals queue behind it so it
+    isn't starved. setup() runs under the gate's lock before every render,
+    so it must be cheap when the key is unchanged.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._key: Any = None
+        self._active = 0
+        self._switching = 0  # renders waiting to switch to another key
+
+    @contextmanager
+    def use(self, key: Hashable, setup: Callable[[], T]) -> Iterator[T]:
+        with self._cond:
+            switching = False
+            try:
+                while True:
+                    if switching:
+                        if not self._active or self._key == key:
+                            break
+                    elif not self._switching:
+                        if not self._active or self._key == key:
+                            break
+                        switching = True
+                        self._switching += 1
+                    self._cond.wait()
+                result = setup()
+                self._key = key
+                self._active += 1
+            finally:
+                if switching:
+                    self._switching -= 1
+                    self._cond.notify_all()
+        try:
+            yield result
+        finally:
+            with self._cond:
+                self._active -= 1
+                if not self._active:
+                    self._cond.notify_all()
@@ -0,0 +1,75 @@
+"""Post-processing shared by all generators: JPEG encode, watermark, upload."""
+from __future__ import annotations
+import io
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urljoin, urlparse
+from PIL import Image
+
+from app.generation.schemas import GenerationRequest, ImageResult
+from app.generation.storage import Storage
+from app.generation.watermark import apply_watermark_image
+from app.core.config import PUBLIC_BASE_URL
+
+WATERMARK_SCALE = 0.30
+
+
+@dataclass
+class RenderedCut:
+    """Raw output of the inference stage for one cut (not yet encoded or uploaded)."""
+    cut: str
+    image: Image.Image
+    width: int
+    height: int
+    meta: Dict[str, str] = field(default_factory=dict)
+    color_id: Optional[str] = None  # batch jobs: the color it was rendered in
+
+
+def output_key(req: GenerationRequest, run_id: str, cut: str, color_id: Optional[str] = None) -> str:
+    """Storage key for a generated cut (in color_id for a batch job)."""
+    return f"generated/{req.family_id}/{color_id or req.color_id}/{run_id}/{cut}.jpg"
+
+
+def encode_cut(rendered: RenderedCut, watermark_path: str) -> bytes:
+    """PIL image -> JPEG bytes -> watermarked JPEG bytes (CPU only)."""
+    buf = io.BytesIO()
+    rendered.image.save(buf, format="JPEG", quality=95)
+    return apply_watermark_image(buf.getvalue(), watermark_path, scale=WATERMARK_SCALE)
+
+
+def public_url(saved_url: str) -> str:
+    """Force the public domain on a storage URL if PUBLIC_BASE_URL is set."""
+    if not PUBLIC_BASE_URL:
+        return saved_url
+    parsed = urlparse(saved_url)
+    # if storage returned absolute (e.g., http://localhost:8000/...),
+    # strip domain and keep only the path; if it was already relative, keep it
+    path = parsed.path if parsed.scheme else saved_url
+    return urljoin(PUBLIC_BASE_URL.rstrip('/') + '/', path.lstrip('/'))
+
+
+def to_image_result(rendered: RenderedCut, url: str) -> ImageResult:
+    return ImageResult(
+        cut=rendered.cut,
+        color_id=rendered.color_id,
+        url=url,
+        width=rendered.width,
+        height=rendered.height,
+        watermark=True,
+        meta=rendered.meta,
+    )
+
+
+def finish_cut(
+    rendered: RenderedCut,
+    req: GenerationRequest,
+    run_id: str,
+    storage: Storage,
+    watermark_path: str,
+    rewrite_public_url: bool = True,
+) -> ImageResult:
+    """Encode, watermark and upload one cut inline (used by Generator.generate)."""
+    data = encode_cut(rendered, watermark_path)
+    saved_url = storage.save_bytes(data, output_key(req, run_id, rendered.cut, rendered.color_id))
+    url = public_url(saved_url) if rewrite_public_url else saved_url
+    return to_image_result(rendered, url)
@@ -0,0 +1,142 @@
+"""
+Shared-prefix denoising: the first steps of a render, computed once per cut and seed.
+
+With a fixed seed and cut, the first denoising steps mostly settle pose and
+silhouette (which the ControlNets pin down anyway) and depend little on the
+swatch, which only enters through the IP-Adapter image. A profile with
+shared_prefix_steps = k renders those k steps once in a swatch-agnostic
+pass (the neutral IP-Adapter conditioning, scale 0) and keeps the state
+after them; every colour of that cut and seed then resumes from it and
+only pays for the remaining steps. Worth it for catalog pre-rendering and
+multi-colour comparisons, where one cut and seed is rendered in many colours.
+
+- PrefixCapture is a callback_on_step_end that snapshots the latents and the
+  scheduler (a multistep solver's history included) after k steps, then
+  stops the call.
+- resume(pipe, state) is a pipeline_for_call() copy of pipe whose scheduler
+  continues from the snapshot, plus the latents to pass it. The pipeline
+  only sees the remaining timesteps, so ControlNet guidance windows, which
+  it applies by fraction of those, go through remap_control_guidance().
+- PrefixCache keeps the snapshots (a few latent-sized tensors each) in an
+  LRU of SHARED_PREFIX_CACHE_SIZE entries, keyed by what the prefix depends
+  on: profile fingerprint, LoRA, cut, seed and size.
+"""
+from __future__ import annotations
+import copy
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+SHARED_PREFIX_CACHE_SIZE = int(os.getenv("SHARED_PREFIX_CACHE_SIZE", "64"))
+
+Guidance = Union[float, List[float]]  # one value, or one per ControlNet
+
+
+@dataclass(frozen=True)
+class PrefixState:
+    """Latents and scheduler after `steps` denoising steps."""
+    latents: Any
+    scheduler: Any
+    steps: int
+
+
+class PrefixCapture:
+    """callback_on_step_end that snapshots the call after `steps` steps and skips the rest; then: another callback."""
+
+    def __init__(self, steps: int, then: Optional[Callable] = None):
+        self.steps = steps
+        self.then = then
+        self.state: Optional[PrefixState] = None
+
+    def __call__(self, pipe, step: int, timestep, callback_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.then is not None:
+            callback_kwargs = self.then(pipe, step, timestep, callback_kwargs)
+        if step + 1 == self.steps:
+            self.state = PrefixState(callback_kwargs["latents"].clone(), copy.deepcopy(pipe.scheduler), self.steps)
+            pipe._interrupt = True  # diffusers skips the remaining steps
+        return callback_kwargs
+
+
+class ResumedScheduler:
+    """
+    A copy of a scheduler snapshot whose timesteps are the ones it has not
+    run yet. Everything else is the copy's own: step() continues from its
+    step index and solver history over the full schedule.
+    """
+
+    def __init__(self, state: PrefixState):
+        self._scheduler = copy.deepcopy(state.scheduler)
+        self._done = state.steps
+
+    @property
+    def timesteps(self):
+        return self._scheduler.timesteps[self._done:]
+
+    def set_timesteps(self, *args, **kwargs) -> None:
+        pass  # the snapshot already has its schedule; setting it again would reset the solver
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_scheduler":  # not set yet (copying)
+            raise AttributeError(name)
+        return getattr(self._scheduler, name)
+
+
+def resume(pipe, state: PrefixState) -> Tuple[Any, Dict[str, Any]]:
+    """(pipe's modules continuing from state, the latents kwarg to call it with)."""
+    view = copy.copy(pipe)
+    view.scheduler = ResumedScheduler(state)
+    # prepare_latents scales given latents by init_noise_sigma; these are already mid-schedule
+    return view, {"latents": state.latents / view.scheduler.init_noise_sigma}
+
+
+def remap_control_guidance(start: Guidance, end: Guidance, scale: Guidance,
+                           done: int, total: int) -> Tuple[Guidance, Guidance, Guidance]:
+    """
+    ControlNet (start, end, scale) for a call that resumes after `done` of
+    `total` steps, so each ControlNet is active on the same absolute steps.
+    One that ended within the prefix gets scale 0.
+    """
+    remaining = total - done
+
+    def one(s: float, e: float, w: float) -> Tuple[float, float, float]:
+        s, e = max(0.0, (s * total - done) / remaining), (e * total - done) / remaining
+        return (s, e, w) if e > s else (0.0, 1.0, 0.0)
+
+    if isinstance(start, list):
+        starts, ends, scales = zip(*(one(s, e, w) for s, e, w in zip(start, end, scale)))
+        return list(starts), list(ends), list(scales)
+    return one(start, end, scale)
+
+
+class PrefixCache:
+    """LRU of PrefixStates."""
+
+    def __init__(self, size: int = SHARED_PREFIX_CACHE_SIZE):
+        self.size = size
+        self._states: "OrderedDict[Hashable, PrefixState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[PrefixState]:
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+            return state
+
+    def put(self, key: Hashable, state: PrefixState) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.size:
+                self._states.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def __len__(self) -> int:
+        return len(self._states)
@@ -0,0 +1,233 @@
+"""
+Named generation profiles.
+
+A GenerationProfile is one frozen, validated set of tuning values for
+SdxlTurboGenerator (guidance, steps, refiner split, step cache, shared
+prefix, ControlNet and IP-Adapter settings). The "default" profile is the environment
+(generator_config.py); more come from GENERATION_PROFILES_PATH, a JSON
+object {"name": {field: value, ...}}, and from the generation_profiles
+table (a row overrides a file entry of the same name). Fields a profile
+leaves out keep the default's value.
+
+Jobs pick a profile by name (GenerationRequest.profile). Profiles with the
+same model_key() run on the same pipelines, so switching between them costs
+nothing; a profile that needs other weights only loads the components that
+differ (see model_registry.py). fingerprint identifies the values, not the
+name, and is what cache keys should use.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.generation import generator_config as env
+
+GENERATION_PROFILES_PATH = os.getenv("GENERATION_PROFILES_PATH", "")
+GENERATION_PROFILES_DB = os.getenv("GENERATION_PROFILES_DB", "1") == "1"
+# How often the file / table are re-read (an unknown name forces a re-read)
+PROFILES_REFRESH_SECONDS = float(os.getenv("PROFILES_REFRESH_SECONDS", "30"))
+DEFAULT_PROFILE = "default"
+
+
+class ModelKey(NamedTuple):
+    """The weights a profile needs beyond the base SDXL components (None = not used)."""
+    refiner: bool
+    controlnet: Optional[str]
+    controlnet2: Optional[str]
+    ip_adapter: Optional[Tuple[str, str, str]]  # (repo, subfolder, weight_name)
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Tuning for one render; defaults are the environment's values."""
+    name: str = DEFAULT_PROFILE
+
+    guidance: float = env.GUIDANCE
+    total_steps: int = env.TOTAL_STEPS
+    use_refiner: bool = env.USE_REFINER
+    refiner_split: float = env.REFINER_SPLIT
+    # Base-stage step cache (step_cache.py); interval 0 or 1: off
+    step_cache_interval: int = env.STEP_CACHE_INTERVAL
+    step_cache_depth: int = env.STEP_CACHE_DEPTH
+    # Base steps shared by every swatch of a cut and seed (prefix_cache.py); 0: off
+    shared_prefix_steps: int = env.SHARED_PREFIX_STEPS
+
+    # Primary ControlNet (DEPTH)
+    controlnet_enabled: bool = env.CONTROLNET_ENABLED
+    controlnet_model: str = env.CONTROLNET_MODEL
+    controlnet_weight: float = env.CONTROLNET_WEIGHT
+    controlnet_guidance_start: float = env.CONTROLNET_GUIDANCE_START
+    controlnet_guidance_end: float = env.CONTROLNET_GUIDANCE_END
+    control_image_recto: str = env.CONTROL_IMAGE_RECTO
+    control_image_cruzado: str = env.CONTROL_IMAGE_CRUZADO
+
+    # Second ControlNet (CANNY), only used with the primary one
+    controlnet2_enabled: bool = env.CONTROLNET2_ENABLED
+    controlnet2_model: str = env.CONTROLNET2_MODEL
+    controlnet2_weight: float = env.CONTROLNET2_WEIGHT
+    controlnet2_guidance_start: float = env.CONTROLNET2_GUIDANCE_START
+    controlnet2_guidance_end: float = env.CONTROLNET2_GUIDANCE_END
+    control_image_recto_canny: str = env.CONTROL_IMAGE_RECTO_CANNY
+    control_image_cruzado_canny: str = env.CONTROL_IMAGE_CRUZADO_CANNY
+
+    # IP-Adapter (image prompt)
+    ip_adapter_enabled: bool = env.IP_ADAPTER_ENABLED
+    ip_adapter_repo: str = env.IP_ADAPTER_REPO
+    ip_adapter_subfolder: str = env.IP_ADAPTER_SUBFOLDER
+    ip_adapter_weight: str = env.IP_ADAPTER_WEIGHT
+    ip_adapter_scale: float = env.IP_ADAPTER_SCALE
+    ip_adapter_image: str = env.IP_ADAPTER_IMAGE
+
+    def __post_init__(self):
+        for f in fields(self):
+            value = getattr(self, f.name)
+            kind = type(f.default)
+            if kind is float and type(value) is int:
+                object.__setattr__(self, f.name, float(value))
+            elif type(value) is not kind:
+                raise ValueError(f"profile {self.name!r}: {f.name} must be {kind.__name__}, got {value!r}")
+
+        if not self.name:
+            raise ValueError("profile name must not be empty")
+        if self.total_steps < 1:
+            raise ValueError(f"profile {self.name!r}: total_steps must be >= 1")
+        if self.guidance < 0:
+            raise ValueError(f"profile {self.name!r}: guidance must be >= 0")
+        if not 0 < self.refiner_split < 1:
+            raise ValueError(f"profile {self.name!r}: refiner_split must be between 0 and 1")
+        if self.step_cache_interval < 0 or self.step_cache_depth < 0:
+            raise ValueError(f"profile {self.name!r}: step_cache_interval and step_cache_depth must be >= 0")
+        if self.shared_prefix_steps < 0:
+            raise ValueError(f"profile {self.name!r}: shared_prefix_steps must be >= 0")
+        if not 0 <= self.ip_adapter_scale <= 2:
+            raise ValueError(f"profile {self.name!r}: ip_adapter_scale must be between 0 and 2")
+        for cn in ("controlnet", "controlnet2"):
+            start, end = getattr(self, f"{cn}_guidance_start"), getattr(self, f"{cn}_guidance_end")
+            if not 0 <= start < end <= 1:
+                raise ValueError(f"profile {self.name!r}: {cn} guidance must satisfy 0 <= start < end <= 1")
+            if getattr(self, f"{cn}_weight") < 0:
+                raise ValueError(f"profile {self.name!r}: {cn}_weight must be >= 0")
+            if getattr(self, f"{cn}_enabled") and not getattr(self, f"{cn}_model"):
+                raise ValueError(f"profile {self.name!r}: {cn}_enabled needs {cn}_model")
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any], base: Optional["GenerationProfile"] = None) -> "GenerationProfile":
+        """base (the environment's default) with data's values; unknown fields are an error."""
+        known = {f.name for f in fields(cls)} - {"name"}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"profile {name!r}: unknown fields {sorted(unknown)}")
+        return replace(base or cls(), name=name, **data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of the values (not the name): equal settings, equal fingerprint."""
+        values = {k: v for k, v in asdict(self).items() if k != "name"}
+        return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def uses_controlnet2(self) -> bool:
+        return self.controlnet_enabled and self.controlnet2_enabled
+
+    def model_key(self) -> ModelKey:
+        """The weights this profile needs beyond the base SDXL components."""
+        return ModelKey(
+            refiner=self.use_refiner,
+            controlnet=self.controlnet_model if self.controlnet_enabled else None,
+            controlnet2=self.controlnet2_model if self.uses_controlnet2 else None,
+            ip_adapter=((self.ip_adapter_repo, self.ip_adapter_subfolder, self.ip_adapter_weight)
+                        if self.ip_adapter_enabled else None),
+        )
+
+
+def _profiles_from(source: str, raw: Dict[str, Any], base: GenerationProfile) -> Dict[str, GenerationProfile]:
+    """Parse {name: settings}; an invalid profile is skipped (and logged), not fatal."""
+    profiles = {}
+    for name, data in raw.items():
+        try:
+            profiles[name] = GenerationProfile.from_dict(name, data or {}, base)
+        except (TypeError, ValueError) as e:
+            print(f"[profiles] skipping {name!r} from {source}: {e}")
+    return profiles
+
+
+class ProfileCatalog:
+    """The profiles a process knows, re-read from file / DB every refresh_seconds."""
+
+    def __init__(self, path: str = GENERATION_PROFILES_PATH, use_db: bool = GENERATION_PROFILES_DB,
+                 refresh_seconds: float = PROFILES_REFRESH_SECONDS):
+        self.path = path
+        self.use_db = use_db
+        self.refresh_seconds = refresh_seconds
+        self._profiles: Dict[str, GenerationProfile] = {}
+        self._loaded_at: Optional[float] = None
+        self._db_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _load_file(self) -> Dict[str, Any]:
+        if not self.path:
+            return {}
+        try:
+            raw = json.loads(Path(self.path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[profiles] cannot read {self.path}: {e}")
+            return {}
+        if not isinstance(raw, dict):
+            print(f"[profiles] {self.path} must hold an object of profiles")
+            return {}
+        return raw
+
+    def _load_db(self) -> Dict[str, Any]:
+        if not self.use_db:
+            return {}
+        try:
+            from app.core.database import SessionLocal
+            from app.generation.models import StoredProfile
+            with SessionLocal() as db:
+                rows = db.query(StoredProfile.name, StoredProfile.settings).all()
+        except Exception as e:
+            # Logged once per distinct error (e.g. the table isn't migrated yet)
+            if str(e) != self._db_error:
+                print(f"[profiles] generation_profiles table unavailable: {e}")
+            self._db_error = str(e)
+            return {}
+        self._db_error = None
+        return {name: settings for name, settings in rows}
+
+    def refresh(self) -> None:
+        default = GenerationProfile()
+        profiles = {DEFAULT_PROFILE: default}
+        profiles.update(_profiles_from(self.path, self._load_file(), default))
+        profiles.update(_profiles_from("generation_profiles", self._load_db(), default))
+        with self._lock:
+            self._profiles = profiles
+            self._loaded_at = time.monotonic()
+
+    def _current(self, force: bool = False) -> Dict[str, GenerationProfile]:
+        if force or self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.refresh()
+        return self._profiles
+
+    def names(self) -> List[str]:
+        return sorted(self._current())
+
+    def get(self, name: Optional[str] = None) -> GenerationProfile:
+        """The profile called name (None: "default"); KeyError if no source has it."""
+        name = name or DEFAULT_PROFILE
+        profiles = self._current()
+        if name not in profiles:
+            profiles = self._current(force=True)  # added since the last refresh?
+        if name not in profiles:
+            raise KeyError(f"unknown generation profile {name!r}")
+        return profiles[name]
+
+
+profile_catalog = ProfileCatalog()
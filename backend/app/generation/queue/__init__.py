@@ -0,0 +1,57 @@
+"""
+Pluggable job queue between POST /generate and the worker.
+
+JOB_QUEUE_BACKEND selects the implementation:
+    "auto" (default)  Postgres or SQLite queue, from the database URL's dialect
+    "postgres"        SELECT ... FOR UPDATE SKIP LOCKED
+    "sqlite"          conditional UPDATE; single box, no network round trip
+    "memory"          in-process only (tests, benchmarks)
+"""
+from __future__ import annotations
+import os
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+from app.generation.queue.base import JobQueue, JobRecord, TERMINAL_STATUSES
+from app.generation.queue.memory import MemoryJobQueue
+from app.generation.queue.routing import JobRequirements, WorkerCapabilities
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "auto").lower()
+
+
+def create_queue(engine: Optional[Engine] = None, backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    """Build a JobQueue; SQL backends use engine (default: app.core.database.engine)."""
+    if backend == "memory":
+        return MemoryJobQueue()
+
+    # SQL backends import the ORM models (and so need a configured database)
+    from app.generation.queue.sql import PostgresJobQueue, SqliteJobQueue, SqlJobQueue
+    if engine is None:
+        from app.core.database import engine
+    if backend == "auto":
+        backend = engine.dialect.name
+    if backend in ("postgres", "postgresql"):
+        return PostgresJobQueue(engine)
+    if backend == "sqlite":
+        return SqliteJobQueue(engine)
+    if backend == "sql":
+        return SqlJobQueue(engine)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {backend}")
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """FastAPI dependency: the process-wide queue, created on first use."""
+    global _queue
+    if _queue is None:
+        _queue = create_queue()
+    return _queue
+
+
+__all__ = [
+    "JobQueue", "JobRecord", "JobRequirements", "MemoryJobQueue", "TERMINAL_STATUSES", "WorkerCapabilities",
+    "create_queue", "get_job_queue",
+]
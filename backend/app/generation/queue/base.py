@@ -0,0 +1,337 @@
+"""
+JobQueue interface shared by the API (enqueue, status) and the worker (claim → complete).
+
+Job state machine:
+
+    pending ──claim──▶ processing ──complete──▶ completed
+       ▲                  │  ├──fail──────────▶ failed
+       └──release/requeue─┘  └──lease expired─▶ pending (or failed at the attempt cap)
+    pending ──expires_at passed──▶ expired   (never-claimed jobs only: a claim clears expires_at)
+
+The transitions below work on anything with GenerationJob's attribute names
+(the SQLAlchemy row or a JobRecord), so every backend applies them the same way.
+"""
+from __future__ import annotations
+import secrets
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.generation.schemas import BatchColor, GenerationRequest, ImageResult
+from app.generation.queue.routing import JobRequirements, WorkerCapabilities
+
+TERMINAL_STATUSES = ("completed", "failed", "expired")
+RETRYABLE_STATUSES = ("failed", "expired")  # admin retry
+
+
+@dataclass
+class JobRecord:
+    """Backend-independent snapshot of a generation job."""
+    job_id: str
+    family_id: str
+    color_id: str
+    cuts: List[str]
+    status: str = "pending"
+    seed: Optional[int] = None
+    swatch_url: Optional[str] = None
+    colors: Optional[List[Dict[str, Any]]] = None  # batch job: BatchColor dicts, in request order
+    requirements: Optional[Dict[str, Any]] = None
+    result_urls: Optional[List[str]] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    error_message: Optional[str] = None
+    attempts: int = 0
+    passed_over: int = 0
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def image_count(self) -> int:
+        return len(self.cuts) * max(1, len(self.colors or []))
+
+    def _missing(self) -> List[tuple]:
+        """(color_id, cut) pairs without a result; color_id is None for a single-color job."""
+        done = {(r.get("color_id"), r["cut"]) for r in (self.results or [])}
+        colors = [c["color_id"] for c in self.colors] if self.colors else [None]
+        return [(color, cut) for color in colors for cut in self.cuts if (color, cut) not in done]
+
+    @property
+    def missing_cuts(self) -> List[str]:
+        """Cuts still missing (in at least one color of a batch job)."""
+        missing = {cut for _, cut in self._missing()}
+        return [cut for cut in self.cuts if cut in missing]
+
+    @property
+    def missing_colors(self) -> List[Dict[str, Any]]:
+        """Colors of a batch job with a cut still missing ([] for a single-color job)."""
+        missing = {color for color, _ in self._missing()}
+        return [c for c in (self.colors or []) if c["color_id"] in missing]
+
+    def to_request(
+        self, cuts: Optional[List[str]] = None, colors: Optional[List[Dict[str, Any]]] = None
+    ) -> GenerationRequest:
+        requirements = JobRequirements.from_dict(self.requirements)
+        colors = [BatchColor(**c) for c in (self.colors or [] if colors is None else colors)]
+        first = colors[0] if colors else BatchColor(color_id=self.color_id, swatch_url=self.swatch_url)
+        return GenerationRequest(
+            family_id=self.family_id,
+            color_id=first.color_id,
+            cuts=self.cuts if cuts is None else cuts,
+            seed=self.seed,
+            swatch_url=first.swatch_url,
+            mode=requirements.mode,
+            profile=requirements.profile,
+            lora_id=requirements.lora_id,
+            colors=colors,
+        )
+
+
+# --- transitions (shared by all backends; caller persists) -------------------
+
+def new_job_fields(job_id: str, req: GenerationRequest, ttl_seconds: Optional[int]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return dict(
+        job_id=job_id,
+        status="pending",
+        family_id=req.family_id,
+        color_id=req.color_id,
+        cuts=list(req.cuts),
+        seed=req.seed,
+        swatch_url=req.swatch_url,
+        colors=[c.model_dump() for c in req.colors] or None,
+        requirements=JobRequirements.from_request(req).to_dict() or None,
+        expires_at=now + timedelta(seconds=ttl_seconds) if ttl_seconds else None,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def held_by(job, worker_id: Optional[str]) -> bool:
+    """Whether worker_id still holds the job's lease (None: no check, for recovery and admin paths)."""
+    return worker_id is None or (job.status == "processing" and job.worker_id == worker_id)
+
+
+def claimable(job, now: datetime) -> bool:
+    return job.status == "pending" and (job.expires_at is None or job.expires_at >= now)
+
+
+def apply_claim(job, worker_id: str, lease_seconds: int, now: datetime) -> None:
+    job.status = "processing"
+    job.attempts = (job.attempts or 0) + 1
+    job.worker_id = worker_id
+    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+    job.started_at = job.started_at or now
+    job.updated_at = now
+    # The TTL drops jobs no worker ever picked up; once one has, retries,
+    # lease reclaims and shutdown checkpoints must stay claimable however long it took
+    job.expires_at = None
+    # Pin the base seed so a retry derives the same per-cut seeds
+    if job.seed is None:
+        job.seed = secrets.randbits(31)
+
+
+def apply_result(job, image: ImageResult) -> None:
+    """Add (or replace) one cut's result (per color in a batch job)."""
+    # Reassign (not append) so SQLAlchemy detects the JSON change
+    slot = (image.color_id, image.cut)
+    results = [r for r in (job.results or []) if (r.get("color_id"), r["cut"]) != slot] + [image.model_dump()]
+    job.results = results
+    job.result_urls = [r["url"] for r in results]
+    job.updated_at = datetime.utcnow()
+
+
+def apply_complete(job) -> None:
+    """Mark the job completed, results in the requested color and cut order."""
+    colors = [c["color_id"] for c in (job.colors or [])]
+
+    def order(r):
+        color = r.get("color_id")
+        return (colors.index(color) if color in colors else 0, job.cuts.index(r["cut"]))
+
+    results = sorted(job.results or [], key=order)
+    job.status = "completed"
+    job.lease_expires_at = None
+    job.error_message = None
+    job.results = results
+    job.result_urls = [r["url"] for r in results]
+    job.completed_at = datetime.utcnow()
+    job.updated_at = datetime.utcnow()
+
+
+def apply_requeue(job, refund_attempt: bool = False) -> None:
+    """Hand the job back to the queue; finished cuts are kept."""
+    job.status = "pending"
+    job.worker_id = None
+    job.lease_expires_at = None
+    job.updated_at = datetime.utcnow()
+    if refund_attempt:
+        job.attempts = max(0, (job.attempts or 0) - 1)
+
+
+def apply_fail(job, error: str, requeue: bool) -> None:
+    job.error_message = error
+    if requeue:
+        apply_requeue(job)
+        return
+    job.status = "failed"
+    job.lease_expires_at = None
+    job.completed_at = datetime.utcnow()
+    job.updated_at = datetime.utcnow()
+
+
+def apply_lease_expired(job, max_attempts: int, now: datetime) -> None:
+    """Return a job whose worker stopped heartbeating, or fail it at the attempt cap."""
+    previous_worker = job.worker_id
+    job.worker_id = None
+    job.lease_expires_at = None
+    job.updated_at = now
+    if job.attempts >= max_attempts:
+        job.status = "failed"
+        job.error_message = f"Lease expired {job.attempts} times (last worker: {previous_worker})"
+        job.completed_at = now
+    else:
+        job.status = "pending"
+
+
+def apply_retry(job, ttl_seconds: Optional[int], now: datetime) -> None:
+    """
+    Re-queue a failed or expired job by hand (admin retry): a fresh attempt
+    budget and TTL, no lease, back in created_at order. Finished cuts are
+    kept, so only the missing ones are rendered (with the same seeds).
+    """
+    job.status = "pending"
+    job.attempts = 0
+    job.passed_over = 0
+    job.error_message = None
+    job.completed_at = None
+    job.worker_id = None
+    job.lease_expires_at = None
+    job.expires_at = now + timedelta(seconds=ttl_seconds) if ttl_seconds else None
+    job.updated_at = now
+
+
+def apply_expire(job, now: datetime) -> None:
+    job.status = "expired"
+    job.error_message = "Expired before a worker picked it up"
+    job.completed_at = now
+    job.updated_at = now
+
+
+class JobQueue(ABC):
+    """
+    Where jobs live between POST /generate and the worker.
+
+    API side: enqueue, get, subscribe. Worker side: claim, heartbeat,
+    add_result, complete, fail, release and the reapers. The worker registry
+    (the admin /admin/workers view) lives next to the jobs it reports on.
+    """
+
+    # --- API side -----------------------------------------------------------
+    @abstractmethod
+    def enqueue(self, job_id: str, req: GenerationRequest, ttl_seconds: Optional[int] = None) -> JobRecord:
+        """Create a pending job (expires ttl_seconds from now, never if None)."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Current snapshot of a job, or None."""
+
+    @abstractmethod
+    def retry(self, job_id: str, ttl_seconds: Optional[int] = None) -> Optional[JobRecord]:
+        """Re-queue a failed or expired job (apply_retry); None if there is no such job in those states."""
+
+    def subscribe(
+        self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 1.0
+    ) -> Iterator[JobRecord]:
+        """
+        Yield the job every time it changes (starting with its current state)
+        until it reaches a terminal status or timeout elapses. This default
+        polls get(); backends with change notification override it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last_seen = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job.updated_at != last_seen:
+                last_seen = job.updated_at
+                yield job
+            if job.terminal or (deadline is not None and time.monotonic() >= deadline):
+                return
+            time.sleep(poll_interval)
+
+    # --- worker side --------------------------------------------------------
+    @abstractmethod
+    def claim(
+        self, worker_id: str, lease_seconds: int, capabilities: Optional[WorkerCapabilities] = None
+    ) -> Optional[JobRecord]:
+        """
+        Atomically lease a pending, unexpired job to worker_id: the oldest one,
+        or with capabilities the one routing.choose_job() picks for it.
+        """
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, lease_seconds: int) -> None:
+        """Renew the leases of every job worker_id holds and mark the worker alive."""
+
+    # With worker_id, the writes below only apply while that worker still
+    # holds the job's lease; a worker whose lease expired (and whose job may
+    # be running elsewhere now) gets None and must drop what it has.
+    @abstractmethod
+    def add_result(self, job_id: str, image: ImageResult, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        """Store one finished cut (visible to GET /jobs/{id} right away)."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        """Mark the job completed."""
+
+    @abstractmethod
+    def fail(
+        self, job_id: str, error: str, requeue: bool = False, worker_id: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        """Record the error; re-queue the job (retry) or mark it failed."""
+
+    @abstractmethod
+    def release(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        """Give a held job back to the queue without using up an attempt (shutdown)."""
+
+    @abstractmethod
+    def release_worker(self, worker_id: str) -> List[JobRecord]:
+        """release() every job still processing on worker_id."""
+
+    @abstractmethod
+    def reclaim_expired_leases(self, max_attempts: int, lease_seconds: int) -> List[JobRecord]:
+        """Re-queue (or fail at max_attempts) jobs whose lease has expired."""
+
+    @abstractmethod
+    def expire_stale(self) -> int:
+        """Mark pending jobs past expires_at as expired; returns how many."""
+
+    # --- worker registry ----------------------------------------------------
+    @abstractmethod
+    def register_worker(
+        self, worker_id: str, hostname: Optional[str] = None, capabilities: Optional[WorkerCapabilities] = None
+    ) -> None:
+        """Create (or reset) the worker's registry entry."""
+
+    @abstractmethod
+    def set_worker_capabilities(self, worker_id: str, capabilities: WorkerCapabilities) -> None:
+        """Advertise what the worker can run and which caches it has warm."""
+
+    @abstractmethod
+    def set_worker_state(self, worker_id: str, status: str, current_job_id: Optional[str] = None) -> None:
+        """warming / idle / busy / stopped, plus the job being worked on."""
+
+    @abstractmethod
+    def bump_worker(self, worker_id: str, **increments: float) -> None:
+        """Add to the worker's throughput counters."""
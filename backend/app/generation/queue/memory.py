@@ -0,0 +1,210 @@
+"""In-process JobQueue: no database, for tests, benchmarks and single-process runs."""
+from __future__ import annotations
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from app.generation.schemas import GenerationRequest, ImageResult
+from app.generation.queue.base import (
+    RETRYABLE_STATUSES, JobQueue, JobRecord,
+    apply_claim, apply_complete, apply_expire, apply_fail, apply_lease_expired,
+    apply_requeue, apply_result, apply_retry, claimable, held_by, new_job_fields,
+)
+from app.generation.queue.routing import (
+    CLAIM_WINDOW, INACTIVE_WORKER_STATUSES, WORKER_STALE_SECONDS, WorkerCapabilities, choose_job,
+)
+
+
+class MemoryJobQueue(JobQueue):
+    """Jobs and workers in dicts behind one lock; subscribe() is notified, not polled."""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobRecord] = {}
+        self._workers: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _snapshot(self, job: Optional[JobRecord]) -> Optional[JobRecord]:
+        # Callers get copies so they can't mutate queue state behind the lock
+        return copy.deepcopy(job) if job is not None else None
+
+    def _touch(self) -> None:
+        self._changed.notify_all()
+
+    # --- API side -----------------------------------------------------------
+    def enqueue(self, job_id: str, req: GenerationRequest, ttl_seconds: Optional[int] = None) -> JobRecord:
+        job = JobRecord(**new_job_fields(job_id, req, ttl_seconds))
+        with self._lock:
+            if job_id in self._jobs:
+                raise ValueError(f"Job {job_id} already exists")
+            self._jobs[job_id] = job
+            self._touch()
+            return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            return self._snapshot(self._jobs.get(job_id))
+
+    def retry(self, job_id: str, ttl_seconds: Optional[int] = None) -> Optional[JobRecord]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in RETRYABLE_STATUSES:
+                return None
+            apply_retry(job, ttl_seconds, datetime.utcnow())
+            self._touch()
+            return self._snapshot(job)
+
+    def subscribe(
+        self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 1.0
+    ) -> Iterator[JobRecord]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last_seen = None
+        while True:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                while job is not None and job.updated_at == last_seen and not job.terminal:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self._changed.wait(remaining)
+                    job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                snapshot = self._snapshot(job)
+            if snapshot.updated_at != last_seen:
+                last_seen = snapshot.updated_at
+                yield snapshot
+            if snapshot.terminal:
+                return
+
+    # --- worker side --------------------------------------------------------
+    def _peers(self, worker_id: str, now: datetime) -> List[WorkerCapabilities]:
+        """Capabilities of the other live workers (caller holds the lock)."""
+        stale_before = now - timedelta(seconds=WORKER_STALE_SECONDS)
+        return [
+            WorkerCapabilities.from_dict(w["capabilities"]) for w in self._workers.values()
+            if w["worker_id"] != worker_id and w.get("capabilities") is not None
+            and w["status"] not in INACTIVE_WORKER_STATUSES and w["last_heartbeat_at"] >= stale_before
+        ]
+
+    def claim(
+        self, worker_id: str, lease_seconds: int, capabilities: Optional[WorkerCapabilities] = None
+    ) -> Optional[JobRecord]:
+        now = datetime.utcnow()
+        with self._lock:
+            pending = sorted((j for j in self._jobs.values() if claimable(j, now)), key=lambda j: j.created_at)
+            peers = self._peers(worker_id, now) if capabilities is not None else []
+            job, passed = choose_job(pending[:CLAIM_WINDOW], capabilities, peers, now)
+            if job is None:
+                return None
+            for skipped in passed:
+                skipped.passed_over += 1
+            apply_claim(job, worker_id, lease_seconds, now)
+            self._touch()
+            return self._snapshot(job)
+
+    def heartbeat(self, worker_id: str, lease_seconds: int) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.worker_id == worker_id and job.status == "processing":
+                    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+            if worker_id in self._workers:
+                self._workers[worker_id]["last_heartbeat_at"] = now
+
+    def _update(self, job_id: str, worker_id: Optional[str], transition, *args) -> Optional[JobRecord]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not held_by(job, worker_id):
+                return None
+            transition(job, *args)
+            self._touch()
+            return self._snapshot(job)
+
+    def add_result(self, job_id: str, image: ImageResult, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_result, image)
+
+    def complete(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_complete)
+
+    def fail(
+        self, job_id: str, error: str, requeue: bool = False, worker_id: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_fail, error, requeue)
+
+    def release(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_requeue, True)
+
+    def release_worker(self, worker_id: str) -> List[JobRecord]:
+        with self._lock:
+            held = [j for j in self._jobs.values() if j.worker_id == worker_id and j.status == "processing"]
+            for job in held:
+                apply_requeue(job, refund_attempt=True)
+            if held:
+                self._touch()
+            return [self._snapshot(j) for j in held]
+
+    def reclaim_expired_leases(self, max_attempts: int, lease_seconds: int) -> List[JobRecord]:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [
+                j for j in self._jobs.values()
+                if j.status == "processing" and j.lease_expires_at is not None and j.lease_expires_at < now
+            ]
+            for job in expired:
+                apply_lease_expired(job, max_attempts, now)
+            if expired:
+                self._touch()
+            return [self._snapshot(j) for j in expired]
+
+    def expire_stale(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            stale = [
+                j for j in self._jobs.values()
+                if j.status == "pending" and j.expires_at is not None and j.expires_at < now
+            ]
+            for job in stale:
+                apply_expire(job, now)
+            if stale:
+                self._touch()
+            return len(stale)
+
+    # --- worker registry ----------------------------------------------------
+    def register_worker(
+        self, worker_id: str, hostname: Optional[str] = None, capabilities: Optional[WorkerCapabilities] = None
+    ) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            worker = self._workers.setdefault(worker_id, dict(
+                worker_id=worker_id, jobs_completed=0, jobs_failed=0, images_generated=0, busy_seconds=0.0,
+            ))
+            worker.update(hostname=hostname, status="idle", current_job_id=None, started_at=now,
+                          last_heartbeat_at=now, capabilities=capabilities.to_dict() if capabilities else None)
+
+    def set_worker_capabilities(self, worker_id: str, capabilities: WorkerCapabilities) -> None:
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker["capabilities"] = capabilities.to_dict()
+
+    def set_worker_state(self, worker_id: str, status: str, current_job_id: Optional[str] = None) -> None:
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker.update(status=status, current_job_id=current_job_id, last_heartbeat_at=datetime.utcnow())
+
+    def bump_worker(self, worker_id: str, **increments: float) -> None:
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return
+            for name, amount in increments.items():
+                worker[name] = (worker.get(name) or 0) + amount
+
+    def worker(self, worker_id: str) -> Optional[dict]:
+        """Registry entry (there is no workers table to query in memory)."""
+        with self._lock:
+            return dict(self._workers[worker_id]) if worker_id in self._workers else None
@@ -0,0 +1,165 @@
+"""
+Capability-aware job routing.
+
+Workers advertise WorkerCapabilities in the registry: the generator modes
+they run, the profiles they serve, their max resolution, the LoRA adapters
+they have loaded and the swatches in their prefetch cache. Jobs carry
+JobRequirements, derived from the request at enqueue time.
+
+claim() looks at a window of the oldest claimable jobs and takes the first
+one the worker can run. A job that is cold here (adapter not loaded, swatch
+not cached) but warm on another live worker is left to that worker for up to
+ROUTING_WARM_WAIT_SECONDS, after which anyone may take it. With
+CLAIM_POLICY=affinity a worker also reorders the jobs it may take by cache
+affinity to its own state, within a bounded lookahead and a bounded number
+of times any job can be passed over.
+"""
+from __future__ import annotations
+import hashlib
+import os
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# A worker that missed this many seconds of heartbeats is considered dead
+WORKER_STALE_SECONDS = int(os.getenv("WORKER_STALE_SECONDS", "90"))
+# Workers in these states are not routing peers (a warming worker takes no jobs yet)
+INACTIVE_WORKER_STATUSES = ("stopped", "warming")
+# How long a job waits for a warm worker before a cold one takes it
+ROUTING_WARM_WAIT_SECONDS = float(os.getenv("ROUTING_WARM_WAIT_SECONDS", "10"))
+# Oldest claimable jobs considered per claim()
+CLAIM_WINDOW = int(os.getenv("CLAIM_WINDOW", "50"))
+
+# "fifo" (default) or "affinity": reorder runnable jobs by cache affinity to
+# the worker, looking AFFINITY_LOOKAHEAD jobs ahead; a job passed over
+# AFFINITY_MAX_PASSES times is taken next regardless of affinity
+CLAIM_POLICY = os.getenv("CLAIM_POLICY", "fifo").lower()
+AFFINITY_LOOKAHEAD = int(os.getenv("AFFINITY_LOOKAHEAD", "8"))
+AFFINITY_MAX_PASSES = int(os.getenv("AFFINITY_MAX_PASSES", "3"))
+
+
+def swatch_key(url: Optional[str]) -> Optional[str]:
+    """Stable key for a swatch URL (also the worker's cache filename)."""
+    if not url:
+        return None
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def _from_dict(cls, data: Optional[Dict[str, Any]]):
+    known = {f.name for f in fields(cls)}
+    return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+
+@dataclass
+class JobRequirements:
+    """What a job needs from the worker that runs it."""
+    mode: Optional[str] = None      # "full" / "inpaint"; None = any
+    profile: Optional[str] = None   # generation profile; None = the worker's default
+    lora_id: Optional[str] = None   # soft: any worker can load it, a warm one is preferred
+
+    @classmethod
+    def from_request(cls, req) -> "JobRequirements":
+        return cls(mode=req.mode, profile=req.profile, lora_id=req.lora_id)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "JobRequirements":
+        return _from_dict(cls, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+@dataclass
+class WorkerCapabilities:
+    """What a worker can run and which caches it has warm."""
+    modes: List[str] = field(default_factory=lambda: ["full"])
+    profiles: Optional[List[str]] = None  # None: any profile
+    max_resolution: Optional[int] = None
+    loras: List[str] = field(default_factory=list)          # adapters currently loaded
+    warm_swatches: List[str] = field(default_factory=list)  # swatch_key() of cached swatches, most recent first
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "WorkerCapabilities":
+        return _from_dict(cls, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def can_run(self, req: JobRequirements) -> bool:
+        if req.mode and req.mode not in self.modes:
+            return False
+        if req.profile and self.profiles is not None and req.profile not in self.profiles:
+            return False
+        return True
+
+    def warmth(self, req: JobRequirements, swatch_url: Optional[str]) -> int:
+        """How many of the job's caches (LoRA adapter, swatch) are already warm here."""
+        key = swatch_key(swatch_url)
+        return int(bool(req.lora_id) and req.lora_id in self.loras) + int(key is not None and key in self.warm_swatches)
+
+    def affinity(self, req: JobRequirements, swatch_url: Optional[str]) -> int:
+        """
+        Cache affinity of a job to the worker's current state: the LoRA is
+        loaded (no adapter swap) and the swatch is the last one used (its
+        IP-Adapter embedding is reused) or at least cached (no download).
+        """
+        key = swatch_key(swatch_url)
+        score = 2 if req.lora_id and req.lora_id in self.loras else 0
+        if key is not None and self.warm_swatches and key == self.warm_swatches[0]:
+            score += 2
+        elif key is not None and key in self.warm_swatches:
+            score += 1
+        return score
+
+
+def _routable(candidates: Sequence, me: WorkerCapabilities, peers: Sequence[WorkerCapabilities],
+              now: datetime, warm_wait_seconds: float) -> Iterator:
+    """Candidates worker `me` may take, in queue order."""
+    for job in candidates:
+        req = JobRequirements.from_dict(job.requirements)
+        if not me.can_run(req):
+            continue
+        waited = (now - job.created_at).total_seconds()
+        if waited < warm_wait_seconds and not me.warmth(req, job.swatch_url) and any(
+            peer.can_run(req) and peer.warmth(req, job.swatch_url) for peer in peers
+        ):
+            continue  # a live worker has this job's caches warm; leave it to them for now
+        yield job
+
+
+def choose_job(
+    candidates: Sequence,
+    me: Optional[WorkerCapabilities],
+    peers: Sequence[WorkerCapabilities],
+    now: datetime,
+    warm_wait_seconds: float = ROUTING_WARM_WAIT_SECONDS,
+    policy: Optional[str] = None,
+) -> Tuple[Optional[Any], List[Any]]:
+    """
+    Pick the job worker `me` should claim from candidates (claimable jobs,
+    oldest first; anything with requirements, swatch_url, created_at and
+    passed_over). Returns (job or None, jobs it was chosen ahead of); the
+    caller bumps passed_over on the latter.
+
+    Without capabilities (me is None) this is plain FIFO. With the "fifo"
+    policy the worker takes the oldest job it may run; with "affinity" it
+    takes the best cache affinity among the first AFFINITY_LOOKAHEAD of
+    those, unless one has already been passed over AFFINITY_MAX_PASSES times.
+    """
+    if me is None:
+        return (candidates[0] if candidates else None), []
+    routable = _routable(candidates, me, peers, now, warm_wait_seconds)
+    if (policy or CLAIM_POLICY) != "affinity":
+        return next(routable, None), []
+
+    window = list(islice(routable, AFFINITY_LOOKAHEAD))
+    if not window:
+        return None, []
+    starved = [job for job in window if (job.passed_over or 0) >= AFFINITY_MAX_PASSES]
+    if starved:
+        best = starved[0]
+    else:
+        # max() keeps the first (oldest) job among equal scores
+        best = max(window, key=lambda job: me.affinity(JobRequirements.from_dict(job.requirements), job.swatch_url))
+    return best, window[:window.index(best)]
@@ -0,0 +1,308 @@
+"""
+SQLAlchemy JobQueue backed by the generation_jobs and workers tables.
+
+SqlJobQueue claims with a conditional UPDATE (... WHERE id = :id AND
+status = 'pending'), which is atomic on any database; a worker that loses
+the race simply tries the next candidate. PostgresJobQueue uses
+SELECT ... FOR UPDATE SKIP LOCKED instead, so concurrent workers never even
+contend for the same row. SqliteJobQueue adds WAL and a busy timeout so the
+API and worker processes can share one local file. With capabilities, both
+route within a window of the oldest claimable rows (see routing.py).
+"""
+from __future__ import annotations
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, event, or_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.generation.models import GenerationJob, Worker
+from app.generation.schemas import GenerationRequest, ImageResult
+from app.generation.queue.base import (
+    RETRYABLE_STATUSES, JobQueue, JobRecord,
+    apply_claim, apply_complete, apply_expire, apply_fail, apply_lease_expired,
+    apply_requeue, apply_result, apply_retry, new_job_fields,
+)
+from app.generation.queue.routing import (
+    CLAIM_WINDOW, INACTIVE_WORKER_STATUSES, WORKER_STALE_SECONDS, WorkerCapabilities, choose_job,
+)
+
+CLAIM_CANDIDATES = 5  # rows tried per claim() before giving up on a contended queue
+
+_RECORD_FIELDS = [name for name in JobRecord.__dataclass_fields__]
+
+
+def to_record(job: GenerationJob) -> JobRecord:
+    return JobRecord(**{name: getattr(job, name) for name in _RECORD_FIELDS})
+
+
+class SqlJobQueue(JobQueue):
+    """Portable SQL queue (any SQLAlchemy dialect)."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+
+    @staticmethod
+    def _load(db: Session, job_id: str) -> Optional[GenerationJob]:
+        return db.query(GenerationJob).filter(GenerationJob.job_id == job_id).first()
+
+    def _update(self, job_id: str, worker_id: Optional[str], transition: Callable, *args) -> Optional[JobRecord]:
+        with self.Session() as db:
+            # Row lock (FOR UPDATE where supported): the read-modify-write of
+            # results can't interleave with another write, and the lease
+            # check holds until the commit
+            query = db.query(GenerationJob).filter(GenerationJob.job_id == job_id)
+            if worker_id is not None:
+                query = query.filter(GenerationJob.worker_id == worker_id, GenerationJob.status == "processing")
+            job = query.with_for_update().first()
+            if job is None:
+                return None
+            transition(job, *args)
+            db.commit()
+            return to_record(job)
+
+    @staticmethod
+    def _claimable_query(db: Session, now: datetime):
+        return db.query(GenerationJob)\
+            .filter(GenerationJob.status == "pending")\
+            .filter(or_(GenerationJob.expires_at.is_(None), GenerationJob.expires_at >= now))\
+            .order_by(GenerationJob.created_at)
+
+    @staticmethod
+    def _peers(db: Session, worker_id: str, now: datetime) -> List[WorkerCapabilities]:
+        """Capabilities advertised by the other live workers."""
+        rows = db.query(Worker.capabilities)\
+            .filter(Worker.worker_id != worker_id, Worker.status.notin_(INACTIVE_WORKER_STATUSES))\
+            .filter(Worker.last_heartbeat_at >= now - timedelta(seconds=WORKER_STALE_SECONDS))\
+            .filter(Worker.capabilities.isnot(None))\
+            .all()
+        return [WorkerCapabilities.from_dict(row.capabilities) for row in rows]
+
+    @staticmethod
+    def _bump_passed_over(db: Session, row_ids: List[int]) -> None:
+        """Count one more pass for jobs a claim was chosen ahead of (affinity fairness bound)."""
+        if row_ids:
+            db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id.in_(row_ids))
+                .values(passed_over=GenerationJob.passed_over + 1)
+            )
+
+    # --- API side -----------------------------------------------------------
+    def enqueue(self, job_id: str, req: GenerationRequest, ttl_seconds: Optional[int] = None) -> JobRecord:
+        with self.Session() as db:
+            job = GenerationJob(**new_job_fields(job_id, req, ttl_seconds))
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return to_record(job)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self.Session() as db:
+            job = self._load(db, job_id)
+            return to_record(job) if job is not None else None
+
+    def retry(self, job_id: str, ttl_seconds: Optional[int] = None) -> Optional[JobRecord]:
+        with self.Session() as db:
+            job = db.query(GenerationJob)\
+                .filter(GenerationJob.job_id == job_id, GenerationJob.status.in_(RETRYABLE_STATUSES))\
+                .with_for_update()\
+                .first()
+            if job is None:
+                return None
+            apply_retry(job, ttl_seconds, datetime.utcnow())
+            db.commit()
+            return to_record(job)
+
+    # --- worker side --------------------------------------------------------
+    def claim(
+        self, worker_id: str, lease_seconds: int, capabilities: Optional[WorkerCapabilities] = None
+    ) -> Optional[JobRecord]:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            candidates = self._claimable_query(db, now)\
+                .with_entities(GenerationJob.id, GenerationJob.requirements, GenerationJob.swatch_url,
+                               GenerationJob.created_at, GenerationJob.passed_over)\
+                .limit(CLAIM_WINDOW if capabilities is not None else CLAIM_CANDIDATES)\
+                .all()
+            peers = self._peers(db, worker_id, now) if capabilities is not None else []
+            for _ in range(CLAIM_CANDIDATES):
+                pick, passed = choose_job(candidates, capabilities, peers, now)
+                if pick is None:
+                    return None
+                candidates.remove(pick)
+                won = db.execute(
+                    update(GenerationJob)
+                    .where(GenerationJob.id == pick.id, GenerationJob.status == "pending")
+                    .values(status="processing", worker_id=worker_id)
+                ).rowcount
+                if not won:
+                    db.rollback()
+                    continue  # another worker got it first
+                self._bump_passed_over(db, [row.id for row in passed])
+                job = db.get(GenerationJob, pick.id)
+                apply_claim(job, worker_id, lease_seconds, now)
+                db.commit()
+                return to_record(job)
+        return None
+
+    def heartbeat(self, worker_id: str, lease_seconds: int) -> None:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            db.query(GenerationJob)\
+                .filter(GenerationJob.worker_id == worker_id, GenerationJob.status == "processing")\
+                .update({GenerationJob.lease_expires_at: now + timedelta(seconds=lease_seconds)},
+                        synchronize_session=False)
+            db.query(Worker)\
+                .filter(Worker.worker_id == worker_id)\
+                .update({Worker.last_heartbeat_at: now}, synchronize_session=False)
+            db.commit()
+
+    def add_result(self, job_id: str, image: ImageResult, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_result, image)
+
+    def complete(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_complete)
+
+    def fail(
+        self, job_id: str, error: str, requeue: bool = False, worker_id: Optional[str] = None
+    ) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_fail, error, requeue)
+
+    def release(self, job_id: str, worker_id: Optional[str] = None) -> Optional[JobRecord]:
+        return self._update(job_id, worker_id, apply_requeue, True)
+
+    def release_worker(self, worker_id: str) -> List[JobRecord]:
+        with self.Session() as db:
+            held = db.query(GenerationJob)\
+                .filter(GenerationJob.worker_id == worker_id, GenerationJob.status == "processing")\
+                .all()
+            for job in held:
+                apply_requeue(job, refund_attempt=True)
+            db.commit()
+            return [to_record(job) for job in held]
+
+    def reclaim_expired_leases(self, max_attempts: int, lease_seconds: int) -> List[JobRecord]:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            expired = db.query(GenerationJob)\
+                .filter(GenerationJob.status == "processing")\
+                .filter(or_(
+                    GenerationJob.lease_expires_at < now,
+                    # Jobs claimed before leases existed
+                    and_(GenerationJob.lease_expires_at.is_(None),
+                         GenerationJob.updated_at < now - timedelta(seconds=lease_seconds)),
+                ))\
+                .all()
+            for job in expired:
+                apply_lease_expired(job, max_attempts, now)
+            if expired:
+                db.commit()
+            return [to_record(job) for job in expired]
+
+    def expire_stale(self) -> int:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            stale = db.query(GenerationJob)\
+                .filter(GenerationJob.status == "pending", GenerationJob.expires_at < now)\
+                .all()
+            for job in stale:
+                apply_expire(job, now)
+            if stale:
+                db.commit()
+            return len(stale)
+
+    # --- worker registry ----------------------------------------------------
+    @staticmethod
+    def _worker(db: Session, worker_id: str) -> Optional[Worker]:
+        return db.query(Worker).filter(Worker.worker_id == worker_id).first()
+
+    def register_worker(
+        self, worker_id: str, hostname: Optional[str] = None, capabilities: Optional[WorkerCapabilities] = None
+    ) -> None:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            worker = self._worker(db, worker_id)
+            if worker is None:
+                worker = Worker(worker_id=worker_id)
+                db.add(worker)
+            worker.hostname = hostname or socket.gethostname()
+            worker.status = "idle"
+            worker.current_job_id = None
+            worker.capabilities = capabilities.to_dict() if capabilities else None
+            worker.started_at = now
+            worker.last_heartbeat_at = now
+            db.commit()
+
+    def set_worker_state(self, worker_id: str, status: str, current_job_id: Optional[str] = None) -> None:
+        with self.Session() as db:
+            worker = self._worker(db, worker_id)
+            if worker is None:
+                return
+            worker.status = status
+            worker.current_job_id = current_job_id
+            worker.last_heartbeat_at = datetime.utcnow()
+            db.commit()
+
+    def set_worker_capabilities(self, worker_id: str, capabilities: WorkerCapabilities) -> None:
+        with self.Session() as db:
+            db.query(Worker)\
+                .filter(Worker.worker_id == worker_id)\
+                .update({Worker.capabilities: capabilities.to_dict()}, synchronize_session=False)
+            db.commit()
+
+    def bump_worker(self, worker_id: str, **increments: float) -> None:
+        with self.Session() as db:
+            worker = self._worker(db, worker_id)
+            if worker is None:
+                return
+            for name, amount in increments.items():
+                setattr(worker, name, (getattr(worker, name) or 0) + amount)
+            db.commit()
+
+
+class PostgresJobQueue(SqlJobQueue):
+    """Claims with FOR UPDATE SKIP LOCKED: concurrent workers skip rows being claimed."""
+
+    def claim(
+        self, worker_id: str, lease_seconds: int, capabilities: Optional[WorkerCapabilities] = None
+    ) -> Optional[JobRecord]:
+        now = datetime.utcnow()
+        with self.Session() as db:
+            # Routing looks at a window of rows; they stay locked only until the commit below
+            candidates = self._claimable_query(db, now)\
+                .limit(CLAIM_WINDOW if capabilities is not None else 1)\
+                .with_for_update(skip_locked=True)\
+                .all()
+            peers = self._peers(db, worker_id, now) if capabilities is not None else []
+            job, passed = choose_job(candidates, capabilities, peers, now)
+            if job is None:
+                db.rollback()
+                return None
+            self._bump_passed_over(db, [row.id for row in passed])
+            apply_claim(job, worker_id, lease_seconds, now)
+            db.commit()
+            return to_record(job)
+
+
+class SqliteJobQueue(SqlJobQueue):
+    """Single-box queue in a local SQLite file shared by the API and worker processes."""
+
+    BUSY_TIMEOUT_MS = 30_000
+
+    def __init__(self, engine: Engine):
+        super().__init__(engine)
+
+        @event.listens_for(engine, "connect")
+        def _sqlite_busy_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+            cursor.close()
+
+        # WAL (persistent in the file): readers (GET /jobs) don't block the
+        # worker's writes. Set once here; switching modes needs an exclusive lock.
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
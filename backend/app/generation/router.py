@@ -1,14 +1,16 @@
 # app/generation/router.py
 import uuid
-from datetime import datetime
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
 
-from app.generation.schemas import GenerationRequest, GenerationResponse, ImageResult, SwatchUploadResponse
-from app.generation.models import GenerationJob
+from app.generation.schemas import (
+    BatchColor, BatchGenerationRequest, GenerationRequest, GenerationResponse, ImageResult, SwatchUploadResponse,
+)
+from app.generation.queue import JobQueue, get_job_queue
 from app.generation.storage import R2Storage, LocalStorage
-from app.admin.dependencies import get_db
-from app.core.config import settings
+from app.generation.profiles import profile_catalog
+from app.catalog.service import family_colors, family_lora_id
+from app.core.config import settings, JOB_TTL_SECONDS
 
 router = APIRouter()
 
@@ -18,44 +20,97 @@ MAX_FILE_SIZE_MB = 5
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
 
+def _check_profile(name: Optional[str]) -> None:
+    # A job naming a profile no worker knows would never be claimed
+    if name:
+        try:
+            profile_catalog.get(name)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown generation profile: {name}")
+
+
 @router.post("/generate", response_model=GenerationResponse, status_code=201)
-def generate(req: GenerationRequest, db: Session = Depends(get_db)) -> GenerationResponse:
+def generate(req: GenerationRequest, queue: JobQueue = Depends(get_job_queue)) -> GenerationResponse:
     """Create a background job for image generation and return immediately."""
 
+    _check_profile(req.profile)
+
     # Generate a unique job ID
     job_id = str(uuid.uuid4())
 
+    # The family's LoRA is part of the job's requirements (workers with it loaded are preferred)
+    if req.lora_id is None:
+        req = req.model_copy(update={"lora_id": family_lora_id(req.family_id)})
+
     # Create the job record with status="pending"
-    job = GenerationJob(
-        job_id=job_id,
+    queue.enqueue(job_id, req, ttl_seconds=JOB_TTL_SECONDS)
+
+    # Return immediately with pending status
+    return GenerationResponse(
+        request_id=job_id,
         status="pending",
+        images=[],
+        meta={"message": "Job created. Poll /jobs/{job_id} for status."}
+    )
+
+
+@router.post("/generate/batch", response_model=GenerationResponse, status_code=201)
+def generate_batch(req: BatchGenerationRequest, queue: JobQueue = Depends(get_job_queue)) -> GenerationResponse:
+    """
+    Create one job rendering a family in several colors (by default every
+    color it has in the catalog). The worker renders the colors of each cut
+    together, sharing prompt, pose and seed; GET /jobs/{job_id} returns one
+    image per color and cut, tagged with its color_id.
+    """
+    _check_profile(req.profile)
+
+    catalog_colors = family_colors(req.family_id)
+    if req.colors is None and catalog_colors is None:
+        raise HTTPException(status_code=404, detail=f"Unknown family: {req.family_id}")
+    colors = req.colors if req.colors is not None else [
+        BatchColor(color_id=c.color_id, swatch_url=c.swatch_url) for c in catalog_colors
+    ]
+    if not colors:
+        raise HTTPException(status_code=400, detail="A batch job needs at least one color")
+    color_ids = [c.color_id for c in colors]
+    if len(set(color_ids)) != len(color_ids):
+        raise HTTPException(status_code=400, detail="Each color can only appear once in a batch job")
+
+    # Colors named without a swatch get the catalog's, as the frontend would pass it
+    swatches = {c.color_id: c.swatch_url for c in catalog_colors or []}
+    colors = [c if c.swatch_url else c.model_copy(update={"swatch_url": swatches.get(c.color_id)}) for c in colors]
+
+    job_id = str(uuid.uuid4())
+    request = GenerationRequest(
         family_id=req.family_id,
-        color_id=req.color_id,
+        color_id=colors[0].color_id,
+        swatch_url=colors[0].swatch_url,
+        colors=colors,
         cuts=req.cuts,
         seed=req.seed,
-        swatch_url=req.swatch_url,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
+        quality=req.quality,
+        mode=req.mode,
+        profile=req.profile,
+        lora_id=req.lora_id if req.lora_id is not None else family_lora_id(req.family_id),
     )
+    queue.enqueue(job_id, request, ttl_seconds=JOB_TTL_SECONDS)
 
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-
-    # Return immediately with pending status
     return GenerationResponse(
         request_id=job_id,
         status="pending",
         images=[],
-        meta={"message": "Job created. Poll /jobs/{job_id} for status."}
+        meta={
+            "message": "Job created. Poll /jobs/{job_id} for status.",
+            "colors": ",".join(color_ids),
+        },
     )
 
 
 @router.get("/jobs/{job_id}", response_model=GenerationResponse)
-def get_job_status(job_id: str, db: Session = Depends(get_db)) -> GenerationResponse:
+def get_job_status(job_id: str, queue: JobQueue = Depends(get_job_queue)) -> GenerationResponse:
     """Get the status and results of a generation job."""
 
-    job = db.query(GenerationJob).filter(GenerationJob.job_id == job_id).first()
+    job = queue.get(job_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -63,13 +118,21 @@ def get_job_status(job_id: str, db: Session = Depends(get_db)) -> GenerationResp
     # Build response based on job status
     response = GenerationResponse(
         request_id=job.job_id,
-        status=job.status,  # "pending", "processing", "completed", "failed"
+        status=job.status,  # "pending", "processing", "completed", "failed", "expired"
         images=[],
         meta={}
     )
 
-    if job.status == "completed" and job.result_urls:
-        # Convert result_urls to ImageResult objects
+    if job.colors:
+        # Batch job: every image carries its color_id
+        response.meta["colors"] = ",".join(c["color_id"] for c in job.colors)
+
+    if job.status in ("processing", "completed") and job.results:
+        # Per-cut results are written as each cut finishes, so a processing
+        # job already returns the cuts that are done
+        response.images = [ImageResult(**r) for r in job.results]
+    elif job.status == "completed" and job.result_urls:
+        # Legacy jobs (before per-cut results): convert result_urls to ImageResult objects
         for i, url in enumerate(job.result_urls):
             cut = job.cuts[i] if i < len(job.cuts) else "recto"
             response.images.append(
@@ -81,7 +144,7 @@ def get_job_status(job_id: str, db: Session = Depends(get_db)) -> GenerationResp
                     watermark=True
                 )
             )
-    elif job.status == "failed" and job.error_message:
+    elif job.status in ("failed", "expired") and job.error_message:
         response.meta["error"] = job.error_message
 
     # Add timing info
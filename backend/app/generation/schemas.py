@@ -3,6 +3,13 @@ from typing import List, Literal, Optional, Dict
 
 Cut = Literal["recto", "cruzado"]
 
+
+class BatchColor(BaseModel):
+    """One color of a batch job (POST /generate/batch)."""
+    color_id: str
+    swatch_url: Optional[str] = None  # filled in from the catalog when omitted
+
+
 class GenerationRequest(BaseModel):
     family_id: str
     color_id: str
@@ -10,10 +17,31 @@ class GenerationRequest(BaseModel):
     seed: Optional[int] = None
     quality: Literal["preview", "final"] = "final"
     swatch_url: Optional[str] = None  # URL to fabric swatch image for IP-Adapter
+    mode: Optional[Literal["full", "inpaint"]] = None  # generator the job needs; None = any worker
+    profile: Optional[str] = None  # generation profile; None = the worker's default
+    lora_id: Optional[str] = None  # family LoRA adapter; filled in from the catalog when omitted
+    colors: List[BatchColor] = Field(default_factory=list)  # batch job: every color (color_id / swatch_url: the first's)
+
+    @property
+    def image_count(self) -> int:
+        return len(self.cuts) * max(1, len(self.colors))
+
+
+class BatchGenerationRequest(BaseModel):
+    """One family in several colors, rendered as one job (lookbooks, catalog pre-rendering)."""
+    family_id: str
+    colors: Optional[List[BatchColor]] = None  # None = every color of the family in the catalog
+    cuts: List[Cut] = Field(default_factory=lambda: ["recto", "cruzado"])
+    seed: Optional[int] = None
+    quality: Literal["preview", "final"] = "final"
+    mode: Optional[Literal["full", "inpaint"]] = None
+    profile: Optional[str] = None
+    lora_id: Optional[str] = None
 
 
 class ImageResult(BaseModel):
     cut: Cut
+    color_id: Optional[str] = None  # batch jobs: the color this image is in
     url: str
     width: int
     height: int
@@ -23,7 +51,7 @@ class ImageResult(BaseModel):
 
 class GenerationResponse(BaseModel):
     request_id: str
-    status: Literal["pending", "processing", "completed", "failed"]
+    status: Literal["pending", "processing", "completed", "failed", "expired"]
     images: List[ImageResult] = Field(default_factory=list)
     duration_ms: Optional[int] = None
     meta: Dict[str, str] = Field(default_factory=dict)
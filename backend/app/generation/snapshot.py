@@ -0,0 +1,125 @@
+"""
+Local pre-baked model snapshot.
+
+tools/bake_models.py writes every component the configured profiles need
+into one directory, each under its model registry key ("unet:org/repo" ->
+unet/org/repo/), in safetensors at the target dtype, plus scheduler configs
+and IP-Adapter weights. manifest.json lists every file with its size and
+sha256, and the load times measured while baking.
+
+With MODEL_SNAPSHOT_DIR set, the model registry loads each component the
+snapshot has from there, offline (local_files_only) and memory-mapped
+(safetensors); anything missing from it still resolves through the hub.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR", "")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+
+
+def component_path(key: str) -> str:
+    """Directory of a registry key inside the snapshot: "unet:org/repo" -> "unet/org/repo"."""
+    kind, _, source = key.partition(":")
+    return f"{kind}/{source.strip('/')}"  # a local path as "repo" stays inside the snapshot
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelSnapshot:
+    """A baked snapshot directory and its manifest."""
+
+    def __init__(self, root: Path, manifest: Dict[str, Any]):
+        self.root = root
+        self.manifest = manifest
+        self.components: Dict[str, Dict[str, Any]] = manifest.setdefault("components", {})
+
+    @classmethod
+    def create(cls, root: str, dtype: str) -> "ModelSnapshot":
+        """Open root for baking, keeping the components of an existing snapshot with the same dtype."""
+        path = Path(root)
+        existing = cls.open(root, quiet=True)
+        if existing is not None and existing.dtype == dtype:
+            return existing
+        return cls(path, {"format": MANIFEST_FORMAT, "dtype": dtype, "components": {}})
+
+    @classmethod
+    def open(cls, root: str, quiet: bool = False) -> Optional["ModelSnapshot"]:
+        """
+        The snapshot at root, or None if there is none. Components whose files
+        are missing or have the wrong size are left out (loaded from the hub).
+        """
+        manifest_path = Path(root) / MANIFEST_NAME
+        if not root or not manifest_path.exists():
+            if root and not quiet:
+                print(f"[snapshot] no {MANIFEST_NAME} in {root}; loading models from the hub")
+            return None
+        snapshot = cls(Path(root), json.loads(manifest_path.read_text(encoding="utf-8")))
+        for key in list(snapshot.components):
+            problems = snapshot.check(key, checksums=False)
+            if problems:
+                print(f"[snapshot] ignoring {key}: {problems[0]}")
+                del snapshot.components[key]
+        if not quiet:
+            print(f"[snapshot] {root}: {len(snapshot.components)} components ({snapshot.dtype})")
+        return snapshot
+
+    @property
+    def dtype(self) -> str:
+        return self.manifest.get("dtype", "")
+
+    def path(self, key: str) -> Optional[str]:
+        """Local directory of key, if the snapshot has it."""
+        entry = self.components.get(key)
+        return str(self.root / entry["path"]) if entry else None
+
+    def entry(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.components.get(key)
+
+    def check(self, key: str, checksums: bool = True) -> List[str]:
+        """Problems with key's files (missing, size, and with checksums also sha256)."""
+        entry = self.components[key]
+        problems = []
+        for name, info in entry["files"].items():
+            file = self.root / entry["path"] / name
+            if not file.is_file():
+                problems.append(f"{name} is missing")
+            elif file.stat().st_size != info["bytes"]:
+                problems.append(f"{name} has {file.stat().st_size} bytes, manifest says {info['bytes']}")
+            elif checksums and sha256_file(file) != info["sha256"]:
+                problems.append(f"{name} checksum mismatch")
+        return problems
+
+    def record(self, key: str, **extra: Any) -> Dict[str, Any]:
+        """Add (or refresh) key's entry from the files now in its directory."""
+        rel = component_path(key)
+        directory = self.root / rel
+        files = {
+            str(file.relative_to(directory)): {"bytes": file.stat().st_size, "sha256": sha256_file(file)}
+            for file in sorted(directory.rglob("*")) if file.is_file()
+        }
+        self.components[key] = {"path": rel, "files": files, **extra}
+        return self.components[key]
+
+    def size_bytes(self, key: str) -> int:
+        return sum(info["bytes"] for info in self.components[key]["files"].values())
+
+    def save(self) -> None:
+        self.manifest["created_at"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / MANIFEST_NAME).write_text(json.dumps(self.manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+model_snapshot = ModelSnapshot.open(MODEL_SNAPSHOT_DIR) if MODEL_SNAPSHOT_DIR else None
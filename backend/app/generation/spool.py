@@ -0,0 +1,133 @@
+"""
+Durable on-disk spool for finished images waiting to be uploaded.
+
+Every encoded image is written here before upload, so a storage outage after
+a long render never throws the GPU work away. Entries are removed only after
+the upload succeeds; whatever is left when the worker stops is uploaded and
+finalized on the next start.
+
+Layout:
+    {SPOOL_DIR}/{job_id}/{cut}.jpg    watermarked image bytes
+    {SPOOL_DIR}/{job_id}/{cut}.json   upload record (written last = entry complete)
+
+A batch job's images are {color_id}.{cut}.jpg / .json.
+"""
+from __future__ import annotations
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.generation.storage import Storage
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_RETRY_BASE_S = float(os.getenv("UPLOAD_RETRY_BASE_S", "2.0"))
+UPLOAD_RETRY_MAX_S = float(os.getenv("UPLOAD_RETRY_MAX_S", "60.0"))
+# Pause between rounds of retries once a spooled upload has used up UPLOAD_MAX_RETRIES
+UPLOAD_SPOOL_RETRY_S = float(os.getenv("UPLOAD_SPOOL_RETRY_S", "60.0"))
+
+
+@dataclass
+class SpoolEntry:
+    """One spooled image and everything needed to upload and record it."""
+    job_id: str
+    cut: str
+    key: str
+    content_type: str = "image/jpeg"
+    rewrite_public_url: bool = True
+    result: Dict[str, Any] = field(default_factory=dict)  # ImageResult fields except url
+    color_id: Optional[str] = None  # batch jobs: the color of the image
+
+    @property
+    def result_fields(self) -> Dict[str, Any]:
+        return {"cut": self.cut, "color_id": self.color_id, **self.result}
+
+    @property
+    def name(self) -> str:
+        return f"{self.color_id}.{self.cut}" if self.color_id else self.cut
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff: base, 2*base, 4*base, ... capped at UPLOAD_RETRY_MAX_S."""
+    return min(UPLOAD_RETRY_MAX_S, UPLOAD_RETRY_BASE_S * (2 ** (attempt - 1)))
+
+
+def upload_with_retry(
+    storage: Storage,
+    data: bytes,
+    key: str,
+    content_type: str = "image/jpeg",
+    retries: int = UPLOAD_MAX_RETRIES,
+) -> str:
+    """storage.save_bytes with exponential backoff; re-raises the last error."""
+    for attempt in range(1, retries + 1):
+        try:
+            return storage.save_bytes(data, key, content_type)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⚠️  [spool] upload {key} failed ({attempt}/{retries}): {e}; retrying in {delay:.0f}s")
+            time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+class UploadSpool:
+    """Directory-backed spool; writes are atomic (tmp file + rename)."""
+
+    def __init__(self, root: str = SPOOL_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, entry: SpoolEntry) -> tuple[Path, Path]:
+        job_dir = self.root / entry.job_id
+        return job_dir / f"{entry.name}.jpg", job_dir / f"{entry.name}.json"
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def put(self, entry: SpoolEntry, data: bytes) -> SpoolEntry:
+        data_path, record_path = self._paths(entry)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(data_path, data)
+        self._atomic_write(record_path, json.dumps(asdict(entry)).encode("utf-8"))
+        return entry
+
+    def read(self, entry: SpoolEntry) -> bytes:
+        return self._paths(entry)[0].read_bytes()
+
+    def remove(self, entry: SpoolEntry) -> None:
+        data_path, record_path = self._paths(entry)
+        # Record first: an image without a record is ignored (and overwritten on retry)
+        record_path.unlink(missing_ok=True)
+        data_path.unlink(missing_ok=True)
+        try:
+            data_path.parent.rmdir()
+        except OSError:
+            pass  # other cuts of the job are still spooled
+
+    def entries(self, job_id: Optional[str] = None) -> List[SpoolEntry]:
+        """Complete entries left on disk (oldest first), optionally for one job."""
+        found = []
+        pattern = f"{job_id}/*.json" if job_id else "*/*.json"
+        for record_path in sorted(self.root.glob(pattern), key=lambda p: p.stat().st_mtime):
+            if not record_path.with_suffix(".jpg").exists():
+                continue
+            try:
+                found.append(SpoolEntry(**json.loads(record_path.read_text(encoding="utf-8"))))
+            except Exception as e:
+                print(f"⚠️  [spool] skipping unreadable record {record_path}: {e}")
+        return found
+
+    def upload(self, entry: SpoolEntry, storage: Storage, retries: int = UPLOAD_MAX_RETRIES) -> str:
+        """Upload a spooled entry (with retries) and return the storage URL."""
+        return upload_with_retry(storage, self.read(entry), entry.key, entry.content_type, retries)
@@ -0,0 +1,103 @@
+"""
+Feature caching across denoising steps (DeepCache-style).
+
+Consecutive denoising steps change the UNet's deep, low-resolution features
+very little; most of the detail a step adds comes through the shallow
+high-resolution blocks. With a step cache, every `interval`-th UNet call is
+a full step that stores the output of each deep block; the calls in between
+run only the shallow blocks and take the deep ones' outputs from the cache,
+so K = interval - 1 of every interval steps skip most of the UNet's compute.
+
+`depth` picks the split by resolution level: levels 0..depth (down block i
+and the up block that mirrors it) run every step, deeper down blocks, the
+mid block and the up blocks that mirror them are cached. SDXL's UNet has
+three levels, so depth 0 recomputes only the full-resolution blocks (the
+largest saving, the most drift) and depth 1 keeps the two upper levels.
+
+- enable_step_cache(unet) wraps the UNet's blocks once at load time; they
+  behave as before unless a cache is active.
+- `with step_caching(interval, depth): pipe(...)` activates one for the
+  calls made inside the block. The cache lives in a ContextVar, so
+  concurrent renders on one shared UNet (pipeline_pool) each keep their own.
+
+The ControlNets still run on every step; their residuals reach the blocks
+that are recomputed, those for cached levels only matter on full steps.
+tools/step_cache_benchmark.py measures the speedup against the drift from
+the uncached render.
+"""
+from __future__ import annotations
+import types
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+_active: ContextVar[Optional["StepCache"]] = ContextVar("step_cache", default=None)
+
+
+class StepCache:
+    """Deep-block outputs of the last full step, for one pipeline call."""
+
+    def __init__(self, interval: int, depth: int = 0):
+        if interval < 1 or depth < 0:
+            raise ValueError(f"step cache needs interval >= 1 and depth >= 0, got {interval}, {depth}")
+        self.interval = interval
+        self.depth = depth
+        self.step = -1  # advanced by each UNet call
+        self.outputs: Dict[str, Any] = {}
+        self.cached_steps = 0
+
+    @property
+    def full_step(self) -> bool:
+        return self.step % self.interval == 0
+
+
+@contextmanager
+def step_caching(interval: int, depth: int = 0) -> Iterator[Optional[StepCache]]:
+    """Step cache for the UNet calls made inside the block (this thread only); interval <= 1: off."""
+    if interval <= 1:
+        yield None
+        return
+    cache = StepCache(interval, depth)
+    token = _active.set(cache)
+    try:
+        yield cache
+    finally:
+        _active.reset(token)
+
+
+def _cached_forward(block, *args, **kwargs):
+    # Bound to each block (types.MethodType), so a deep-copied UNet's blocks run their own weights
+    name, level = block._step_cache_slot
+    forward = type(block).forward
+    cache = _active.get()
+    if cache is None or level <= cache.depth:
+        return forward(block, *args, **kwargs)
+    if cache.full_step or name not in cache.outputs:
+        cache.outputs[name] = out = forward(block, *args, **kwargs)
+        return out
+    return cache.outputs[name]
+
+
+def _advance(unet, args) -> None:
+    cache = _active.get()
+    if cache is not None:
+        cache.step += 1
+        if not cache.full_step:
+            cache.cached_steps += 1
+
+
+def enable_step_cache(unet) -> int:
+    """Wrap unet's down / mid / up blocks for step caching (idempotent); returns the levels."""
+    levels = len(unet.down_blocks)
+    if getattr(unet, "_step_cache_enabled", False):
+        return levels
+    blocks = [(f"down.{i}", i, block) for i, block in enumerate(unet.down_blocks)]
+    if unet.mid_block is not None:
+        blocks.append(("mid", levels, unet.mid_block))
+    blocks += [(f"up.{i}", levels - 1 - i, block) for i, block in enumerate(unet.up_blocks)]
+    for name, level, block in blocks:
+        block._step_cache_slot = (name, level)
+        block.forward = types.MethodType(_cached_forward, block)
+    unet.register_forward_pre_hook(_advance)
+    unet._step_cache_enabled = True
+    return levels
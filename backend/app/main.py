@@ -8,6 +8,7 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from app.admin.fabrics import fabrics_router, colors_router  # Updated imports
 from app.admin.generations import router as admin_generations_router  # Updated import
+from app.admin.workers import router as admin_workers_router
 
 
 
@@ -44,6 +45,7 @@ app.add_middleware(
 app.include_router(fabrics_router)  # Updated
 app.include_router(colors_router)  # Updated
 app.include_router(admin_generations_router)
+app.include_router(admin_workers_router)
 
 @app.get("/healthz")
 def healthz():
@@ -67,20 +67,69 @@ fi
 # =============================================================================
 # GENERATOR MODE
 # =============================================================================
-# Options: "full" (SDXL + ControlNet + IP-Adapter), "inpaint" (SDXL Inpaint + IP-Adapter Plus), "mock"
+# Options: "full" (SDXL + ControlNet + IP-Adapter), "inpaint" (SDXL Inpaint + IP-Adapter Plus),
+#          "multi" (both on one GPU, shared VAE/text encoders; each job picks its mode), "mock"
 export GENERATOR_MODE="${GENERATOR_MODE:-inpaint}"
 echo "[config] GENERATOR_MODE=${GENERATOR_MODE}"
 
+# Warm-up before the first claim (short render of every cut per WARMUP_PROFILES);
+# TORCH_COMPILE=1 also compiles the UNets, cached on the volume across restarts
+# (not with a step cache, IP-Adapter or LoRAs in use: those UNets stay eager).
+# WORKER_READY_FILE appears once the worker is ready (health checks).
+export WORKER_WARMUP="${WORKER_WARMUP:-1}"
+export WARMUP_PROFILES="${WARMUP_PROFILES:-default}"
+export TORCH_COMPILE="${TORCH_COMPILE:-0}"
+export TORCH_COMPILE_CACHE_DIR="${TORCH_COMPILE_CACHE_DIR:-/workspace/torch_compile_cache}"
+export WORKER_READY_FILE="${WORKER_READY_FILE:-/tmp/worker-ready}"
+
+# Local model snapshot baked with tools/bake_models.py --out <dir> (offline,
+# memory-mapped loads; empty = load everything from the Hub)
+export MODEL_SNAPSHOT_DIR="${MODEL_SNAPSHOT_DIR:-}"
+
+# Pipeline replicas per device ("2" or "cuda=2,cpu=4"): the async runtime renders
+# this many jobs at once. shared = same weights, own scheduler; copy = own weights
+export PIPELINE_REPLICAS="${PIPELINE_REPLICAS:-1}"
+export PIPELINE_REPLICA_MODE="${PIPELINE_REPLICA_MODE:-shared}"
+
+# CPU backend (only used when the pod has no GPU): dtype auto = bf16 on CPUs with
+# native bf16 (AVX512-BF16 / AMX); CPU_FAST_MODEL = distilled SDXL UNet run for
+# CPU_FAST_STEPS steps; full renders are scaled to CPU_MAX_SIDE. Compare settings
+# with tools/cpu_benchmark.py
+export CPU_DTYPE="${CPU_DTYPE:-auto}"
+export CPU_THREADS="${CPU_THREADS:-0}"
+export CPU_INTEROP_THREADS="${CPU_INTEROP_THREADS:-0}"
+export CPU_CHANNELS_LAST="${CPU_CHANNELS_LAST:-1}"
+export CPU_COMPILE_BACKEND="${CPU_COMPILE_BACKEND:-}"
+export CPU_FAST_MODEL="${CPU_FAST_MODEL:-}"
+export CPU_FAST_STEPS="${CPU_FAST_STEPS:-4}"
+export CPU_MAX_SIDE="${CPU_MAX_SIDE:-1024}"
+
 # =============================================================================
 # SDXL Generation Settings (for GENERATOR_MODE=full)
 # =============================================================================
 export PYTORCH_CUDA_ALLOC_CONF=expandable_segments:True
 
-# Quality settings
+# Quality settings (the "default" generation profile; named profiles for
+# GenerationRequest.profile come from GENERATION_PROFILES_PATH and the
+# generation_profiles table and override these per job)
+export GENERATION_PROFILES_PATH="${GENERATION_PROFILES_PATH:-}"
 export GUIDANCE="${GUIDANCE:-4.3}"
 export TOTAL_STEPS="${TOTAL_STEPS:-80}"
 export USE_REFINER="${USE_REFINER:-1}"
 export REFINER_SPLIT="${REFINER_SPLIT:-0.70}"
+# Step cache (default profile): deep UNet blocks recomputed every STEP_CACHE_INTERVAL
+# base steps (0 = off), levels 0..STEP_CACHE_DEPTH every step. Measure the drift
+# with tools/step_cache_benchmark.py before turning it on
+export STEP_CACHE_INTERVAL="${STEP_CACHE_INTERVAL:-0}"
+export STEP_CACHE_DEPTH="${STEP_CACHE_DEPTH:-0}"
+# Shared prefix (default profile): with a fixed seed, the first SHARED_PREFIX_STEPS
+# base steps of a cut are rendered once without the swatch and every colour resumes
+# from them (0 = off); SHARED_PREFIX_CACHE_SIZE snapshots are kept
+export SHARED_PREFIX_STEPS="${SHARED_PREFIX_STEPS:-0}"
+export SHARED_PREFIX_CACHE_SIZE="${SHARED_PREFIX_CACHE_SIZE:-64}"
+# Batch jobs (POST /generate/batch): colors rendered together, at most
+# BATCH_MAX_COLORS images per pipeline call (lower it if a batch runs out of VRAM)
+export BATCH_MAX_COLORS="${BATCH_MAX_COLORS:-4}"
 
 # ControlNet #1 (Depth)
 export CONTROLNET_ENABLED="${CONTROLNET_ENABLED:-1}"
@@ -118,6 +167,13 @@ export INPAINT_STRENGTH="${INPAINT_STRENGTH:-0.65}"
 export INPAINT_GUIDANCE="${INPAINT_GUIDANCE:-4.0}"
 export INPAINT_STEPS="${INPAINT_STEPS:-100}"
 
+# Crop-to-mask: only the suit's padded bounding box goes through diffusion and is
+# blended back into the untouched reference (0 = inpaint the whole image)
+export INPAINT_CROP_TO_MASK="${INPAINT_CROP_TO_MASK:-1}"
+export INPAINT_CROP_PADDING="${INPAINT_CROP_PADDING:-48}"
+export INPAINT_CROP_MIN_SIDE="${INPAINT_CROP_MIN_SIDE:-768}"
+export INPAINT_CROP_FEATHER="${INPAINT_CROP_FEATHER:-8}"
+
 # IP-Adapter Plus (higher quality texture/color transfer for inpainting)
 # Plus version requires ViT-H encoder (loaded automatically by generator_inpaint.py)
 export INPAINT_IP_ADAPTER_WEIGHT="${INPAINT_IP_ADAPTER_WEIGHT:-ip-adapter-plus_sdxl_vit-h.safetensors}"
@@ -146,7 +202,7 @@ if torch.cuda.is_available():
     print(f"  GPU: {torch.cuda.get_device_name(0)}")
 from diffusers import StableDiffusionXLPipeline
 print("  SDXL pipeline import: OK")
-if os.environ.get("GENERATOR_MODE", "full") == "inpaint":
+if os.environ.get("GENERATOR_MODE", "full") in ("inpaint", "multi"):
     from diffusers import StableDiffusionXLInpaintPipeline
     print("  SDXL Inpaint pipeline import: OK")
 PY
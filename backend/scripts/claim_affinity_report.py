@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Claim policy report - cache hit rates with CLAIM_POLICY=fifo vs affinity
+
+Replays the same synthetic job stream through an in-memory queue once per
+policy, with one worker whose state is simulated (no GPU, no torch):
+loaded LoRA adapters (LRU, --lora-slots) and the swatch cache, the most
+recent swatch being the one whose IP-Adapter embedding is still loaded.
+
+Usage:
+    python scripts/claim_affinity_report.py
+    python scripts/claim_affinity_report.py --jobs 2000 --loras 6 --swatches 30 --lookahead 16 --max-passes 5
+
+Output (one row per policy):
+    lora hit %      claims that needed no adapter swap
+    embed hit %     claims whose swatch was the previous job's (embedding reused)
+    swatch hit %    claims whose swatch was already downloaded
+    max passed      most times any job was passed over (<= --max-passes)
+    wait p50/max    claims between a job's arrival and its own claim
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.generation.queue import MemoryJobQueue, WorkerCapabilities  # noqa: E402
+from app.generation.queue import routing  # noqa: E402
+from app.generation.queue.routing import swatch_key  # noqa: E402
+from app.generation.schemas import GenerationRequest  # noqa: E402
+
+
+def make_stream(args) -> list:
+    """[(arrival claim index, lora_id, swatch_url)], skewed like a real catalog (a few popular fabrics)."""
+    rng = random.Random(args.seed)
+    loras = [f"lora_{i}" for i in range(args.loras)]
+    swatches = [f"https://cdn.example/swatch_{i}.jpg" for i in range(args.swatches)]
+    weights = [1 / (i + 1) for i in range(args.swatches)]
+    stream = []
+    for i in range(args.jobs):
+        swatch = rng.choices(swatches, weights)[0]
+        lora = loras[swatches.index(swatch) % len(loras)]  # a swatch belongs to one family
+        # Backlog first, then about one arrival per claim
+        arrival = 0 if i < args.backlog else i - args.backlog + 1
+        stream.append((arrival, lora, swatch))
+    return stream
+
+
+def simulate(policy: str, stream: list, args) -> dict:
+    routing.CLAIM_POLICY = policy
+    routing.AFFINITY_LOOKAHEAD = args.lookahead
+    routing.AFFINITY_MAX_PASSES = args.max_passes
+
+    queue = MemoryJobQueue()
+    queue.register_worker("sim")
+    loaded: OrderedDict = OrderedDict()   # LoRA adapters, LRU
+    cached: OrderedDict = OrderedDict()   # swatch keys, most recent last
+    arrived, hits = {}, {"lora": 0, "embed": 0, "swatch": 0}
+    waits, next_job, claims = [], 0, 0
+
+    while claims < len(stream):
+        while next_job < len(stream) and stream[next_job][0] <= claims:
+            _, lora, swatch = stream[next_job]
+            queue.enqueue(f"j{next_job}", GenerationRequest(family_id="f", color_id="c", lora_id=lora, swatch_url=swatch))
+            arrived[f"j{next_job}"] = claims
+            next_job += 1
+
+        caps = WorkerCapabilities(loras=list(loaded), warm_swatches=list(reversed(cached)))
+        job = queue.claim("sim", lease_seconds=60, capabilities=caps)
+        lora, key = job.requirements["lora_id"], swatch_key(job.swatch_url)
+
+        hits["lora"] += lora in loaded
+        hits["embed"] += bool(cached) and next(reversed(cached)) == key
+        hits["swatch"] += key in cached
+        loaded[lora] = True
+        loaded.move_to_end(lora)
+        while len(loaded) > args.lora_slots:
+            loaded.popitem(last=False)
+        cached[key] = True
+        cached.move_to_end(key)
+        while len(cached) > args.swatch_cache:
+            cached.popitem(last=False)
+
+        queue.complete(job.job_id)
+        waits.append(claims - arrived[job.job_id])
+        claims += 1
+
+    passed = [queue.get(f"j{i}").passed_over for i in range(len(stream))]
+    return {
+        "lora": 100 * hits["lora"] / claims,
+        "embed": 100 * hits["embed"] / claims,
+        "swatch": 100 * hits["swatch"] / claims,
+        "max_passed": max(passed),
+        "wait_p50": statistics.median(waits),
+        "wait_max": max(waits),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cache hit rates of the fifo and affinity claim policies")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--backlog", type=int, default=20, help="Jobs already pending when the worker starts")
+    parser.add_argument("--loras", type=int, default=4, help="Distinct LoRA adapters (families)")
+    parser.add_argument("--swatches", type=int, default=24, help="Distinct swatches")
+    parser.add_argument("--lora-slots", type=int, default=1, help="Adapters the worker keeps loaded")
+    parser.add_argument("--swatch-cache", type=int, default=8, help="Swatches the worker keeps downloaded")
+    parser.add_argument("--lookahead", type=int, default=routing.AFFINITY_LOOKAHEAD)
+    parser.add_argument("--max-passes", type=int, default=routing.AFFINITY_MAX_PASSES)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    stream = make_stream(args)
+    print(f"{args.jobs} jobs, {args.loras} LoRAs ({args.lora_slots} loaded), {args.swatches} swatches "
+          f"({args.swatch_cache} cached), backlog {args.backlog}, lookahead {args.lookahead}, "
+          f"max passes {args.max_passes}\n")
+    print(f"{'policy':<10}{'lora hit %':>12}{'embed hit %':>13}{'swatch hit %':>14}{'max passed':>12}{'wait p50/max':>14}")
+    for policy in ("fifo", "affinity"):
+        r = simulate(policy, stream, args)
+        print(f"{policy:<10}{r['lora']:>12.1f}{r['embed']:>13.1f}{r['swatch']:>14.1f}{r['max_passed']:>12}"
+              f"{r['wait_p50']:>9.0f}/{r['wait_max']:<4}")
+
+
+if __name__ == "__main__":
+    main()
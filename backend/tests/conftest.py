@@ -0,0 +1,113 @@
+import os
+
+# app.generation's package __init__ reaches app.core.database, which needs a URL at import time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+# Tiny diffusion models: the fixtures import torch / diffusers themselves and
+# skip the test without them, so the rest of the suite runs on a bare install
+CROSS_DIM, IMAGE_DIM, TOKENS = 32, 16, 4
+
+
+@pytest.fixture
+def tiny_ip_pipeline():
+    """
+    A tiny UNet with a standard IP-Adapter loaded, driven by a denoising loop
+    over a stateful multistep scheduler like the SDXL pipelines:
+    pipe(latents, text, image_embeds, steps=4) (see ip_inputs).
+    """
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("diffusers")
+    from diffusers import DiffusionPipeline, DPMSolverMultistepScheduler, UNet2DConditionModel
+
+    class TinyPipeline(DiffusionPipeline):
+        def __init__(self, unet, scheduler):
+            super().__init__()
+            self.register_modules(unet=unet, scheduler=scheduler)
+
+        @torch.no_grad()
+        def __call__(self, latents, text, image_embeds, steps=4):
+            self._num_timesteps = steps
+            self.scheduler.set_timesteps(steps)
+            for t in self.scheduler.timesteps:
+                noise = self.unet(latents, t, encoder_hidden_states=text, added_cond_kwargs={"image_embeds": image_embeds})
+                latents = self.scheduler.step(noise.sample, t, latents).prev_sample
+            return latents
+
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(
+        sample_size=8, block_out_channels=(32, 64), layers_per_block=1, norm_num_groups=32,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=CROSS_DIM, attention_head_dim=4,
+    )
+    # A standard IP-Adapter in the checkpoint layout load_ip_adapter reads
+    ip_layers, key_id = {}, 1
+    for name in unet.attn_processors:
+        if name.endswith("attn2.processor"):
+            block = unet.get_submodule(name[: -len(".processor")])
+            for proj in ("to_k_ip", "to_v_ip"):
+                ip_layers[f"{key_id}.{proj}.weight"] = torch.randn(block.inner_dim, CROSS_DIM) * 0.5
+            key_id += 2
+    image_proj = {
+        "proj.weight": torch.randn(CROSS_DIM * TOKENS, IMAGE_DIM) * 0.5, "proj.bias": torch.zeros(CROSS_DIM * TOKENS),
+        "norm.weight": torch.ones(CROSS_DIM), "norm.bias": torch.zeros(CROSS_DIM),
+    }
+    unet._load_ip_adapter_weights([{"image_proj": image_proj, "ip_adapter": ip_layers}])
+    return TinyPipeline(unet.eval(), DPMSolverMultistepScheduler())
+
+
+@pytest.fixture
+def ip_inputs():
+    """ip_inputs(seed) -> (latents, text, image_embeds) for tiny_ip_pipeline; the same seed, the same tensors."""
+    torch = pytest.importorskip("torch")
+
+    def make(seed: int = 1):
+        g = torch.Generator().manual_seed(seed)
+        latents, text = torch.randn(1, 4, 8, 8, generator=g), torch.randn(1, 6, CROSS_DIM, generator=g)
+        return latents, text, [torch.randn(1, 1, IMAGE_DIM, generator=g)]
+
+    return make
+
+
+@pytest.fixture
+def tiny_sdxl():
+    """A StableDiffusionXLPipeline small enough for a test, driven by prompt embeddings (no text encoders)."""
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("diffusers")
+    from diffusers import AutoencoderKL, DPMSolverMultistepScheduler, StableDiffusionXLPipeline, UNet2DConditionModel
+
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(
+        sample_size=8, block_out_channels=(32, 64), layers_per_block=1, norm_num_groups=32,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32, attention_head_dim=4,
+        addition_embed_type="text_time", addition_time_embed_dim=8, projection_class_embeddings_input_dim=64,
+    )
+    vae = AutoencoderKL(block_out_channels=[32], down_block_types=["DownEncoderBlock2D"],
+                        up_block_types=["UpDecoderBlock2D"], latent_channels=4, norm_num_groups=32)
+    pipe = StableDiffusionXLPipeline(
+        vae=vae, text_encoder=None, text_encoder_2=None, tokenizer=None, tokenizer_2=None, unet=unet.eval(),
+        scheduler=DPMSolverMultistepScheduler(use_karras_sigmas=True),
+    )
+    pipe.set_progress_bar_config(disable=True)
+    return pipe
+
+
+@pytest.fixture
+def call_kwargs():
+    """call_kwargs(condition) -> tiny_sdxl call arguments; the condition seeds the prompt embeddings."""
+    torch = pytest.importorskip("torch")
+
+    def make(condition: int):
+        g = torch.Generator().manual_seed(condition)
+        return dict(
+            prompt_embeds=torch.randn(1, 6, 32, generator=g), pooled_prompt_embeds=torch.randn(1, 16, generator=g),
+            negative_prompt_embeds=torch.zeros(1, 6, 32), negative_pooled_prompt_embeds=torch.zeros(1, 16),
+            num_inference_steps=10, height=8, width=8, guidance_scale=4.0, output_type="latent",
+            generator=torch.Generator().manual_seed(3),
+        )
+
+    return make
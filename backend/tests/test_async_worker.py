@@ -0,0 +1,164 @@
+import asyncio, os, threading, time
+
+os.environ["USE_MOCK_GENERATOR"] = "true"
+os.environ["JOB_QUEUE_BACKEND"] = "memory"
+
+import pytest
+
+import worker
+from app.generation.generator_mock import MockGenerator
+from app.generation.queue import MemoryJobQueue
+from app.generation.schemas import BatchColor, GenerationRequest, ImageResult
+from app.generation import spool as spool_module
+from app.generation.spool import UploadSpool
+from app.generation.storage import LocalStorage
+
+
+class SlowMock(MockGenerator):
+    """MockGenerator that takes a while per cut and records what it saw."""
+
+    def __init__(self, storage, queue):
+        super().__init__(storage)
+        self.queue = queue
+        self.renders = 0
+        self.threads = set()
+        self.max_claimed = 0
+        self.rendering = self.max_rendering = 0
+        self.lock = threading.Lock()
+
+    def render(self, req, should_stop=None):
+        with self.lock:
+            self.renders += 1
+            self.rendering += 1
+            self.max_rendering = max(self.max_rendering, self.rendering)
+        try:
+            for rendered in super().render(req, should_stop):
+                self.threads.add(threading.current_thread().name)
+                time.sleep(0.1)
+                claimed = sum(1 for i in range(4) if (job := self.queue.get(f"j{i}")) and job.status == "processing")
+                self.max_claimed = max(self.max_claimed, claimed)
+                yield rendered
+        finally:
+            with self.lock:
+                self.rendering -= 1
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    queue = MemoryJobQueue()
+    storage = LocalStorage(base_dir=str(tmp_path / "storage"))
+    generator = SlowMock(storage, queue)
+    monkeypatch.setattr(worker, "queue", queue)
+    monkeypatch.setattr(worker, "storage", storage)
+    monkeypatch.setattr(worker, "generator", generator)
+    monkeypatch.setattr(worker, "shutdown", worker.Shutdown())
+    monkeypatch.setattr(worker.pipeline, "storage", storage)
+    queue.register_worker(worker.WORKER_ID)
+    return queue, generator
+
+
+def test_async_runtime_prefetches_while_rendering(runtime):
+    queue, generator = runtime
+    for i in range(4):
+        queue.enqueue(f"j{i}", GenerationRequest(family_id="f", color_id="c"))
+
+    loop_thread = threading.Thread(target=asyncio.run, args=(worker.async_worker_loop(0.05, prefetch=2),))
+    loop_thread.start()
+    for i in range(4):
+        assert list(queue.subscribe(f"j{i}", timeout=30))[-1].status == "completed"
+    worker.shutdown.request("test")
+    loop_thread.join(timeout=10)
+
+    assert not loop_thread.is_alive()
+    assert all(name.startswith("inference") for name in generator.threads)
+    assert generator.max_claimed >= 2  # other jobs claimed or uploading during inference
+    assert queue.worker(worker.WORKER_ID)["jobs_completed"] == 4
+    assert generator.max_rendering == 1  # one pipeline replica: one render at a time
+
+
+def test_async_runtime_renders_one_job_per_pipeline_replica(runtime):
+    queue, generator = runtime
+    for i in range(4):
+        queue.enqueue(f"j{i}", GenerationRequest(family_id="f", color_id="c"))
+
+    loop_thread = threading.Thread(
+        target=asyncio.run, args=(worker.async_worker_loop(0.05, prefetch=1, concurrency=2),)
+    )
+    loop_thread.start()
+    for i in range(4):
+        assert list(queue.subscribe(f"j{i}", timeout=30))[-1].status == "completed"
+    worker.shutdown.request("test")
+    loop_thread.join(timeout=10)
+
+    assert not loop_thread.is_alive()
+    assert generator.max_rendering == 2
+    assert len(generator.threads) == 2
+    assert queue.worker(worker.WORKER_ID)["jobs_completed"] == 4
+
+
+def test_batch_job_renders_every_color_into_one_job(runtime):
+    queue, generator = runtime
+    colors = [BatchColor(color_id="navy"), BatchColor(color_id="camel")]
+    queue.enqueue("j0", GenerationRequest(family_id="f", color_id="navy", colors=colors))
+
+    loop_thread = threading.Thread(target=asyncio.run, args=(worker.async_worker_loop(0.05),))
+    loop_thread.start()
+    job = list(queue.subscribe("j0", timeout=30))[-1]
+    worker.shutdown.request("test")
+    loop_thread.join(timeout=10)
+
+    assert job.status == "completed"
+    assert [(r["color_id"], r["cut"]) for r in job.results] == [
+        ("navy", "recto"), ("navy", "cruzado"), ("camel", "recto"), ("camel", "cruzado"),
+    ]
+    assert len({r["url"] for r in job.results}) == 4
+    assert all(f"/{r['color_id']}/" in r["url"] for r in job.results)
+
+
+def test_batch_job_retry_renders_only_the_missing_colors(runtime):
+    queue, _ = runtime
+    colors = [BatchColor(color_id="navy"), BatchColor(color_id="camel")]
+    queue.enqueue("j0", GenerationRequest(family_id="f", color_id="navy", colors=colors))
+    job = queue.claim(worker.WORKER_ID, lease_seconds=30)
+    for color, cut in [("navy", "recto"), ("navy", "cruzado"), ("camel", "recto")]:
+        job = queue.add_result("j0", ImageResult(cut=cut, color_id=color, url="http://x", width=8, height=8))
+
+    request = worker.prepare_job(job)
+    assert request.cuts == ["cruzado"]
+    assert (request.color_id, [c.color_id for c in request.colors]) == ("camel", ["camel"])
+
+
+class OutageStorage(LocalStorage):
+    """LocalStorage whose first `failures` uploads raise, like an object store that is down."""
+
+    def __init__(self, base_dir, failures):
+        super().__init__(base_dir=base_dir)
+        self.failures = failures
+
+    def save_bytes(self, data, key, content_type="image/jpeg"):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("storage unavailable")
+        return super().save_bytes(data, key, content_type)
+
+
+def test_a_storage_outage_longer_than_the_retries_completes_without_rendering_again(runtime, tmp_path, monkeypatch):
+    queue, generator = runtime
+    storage = OutageStorage(str(tmp_path / "storage"), failures=12)  # both cuts: three rounds of two attempts
+    monkeypatch.setattr(worker.pipeline, "storage", storage)
+    monkeypatch.setattr(worker.pipeline, "spool", UploadSpool(str(tmp_path / "spool")))
+    monkeypatch.setattr(worker.pipeline, "upload_retries", 2)
+    monkeypatch.setattr(worker.pipeline, "spool_retry_seconds", 0.05)
+    monkeypatch.setattr(spool_module, "UPLOAD_RETRY_BASE_S", 0.01)
+    queue.enqueue("j0", GenerationRequest(family_id="f", color_id="c"))
+
+    loop_thread = threading.Thread(target=asyncio.run, args=(worker.async_worker_loop(0.05),))
+    loop_thread.start()
+    job = list(queue.subscribe("j0", timeout=30))[-1]
+    worker.shutdown.request("test")
+    loop_thread.join(timeout=10)
+
+    assert job.status == "completed" and len(job.results) == 2
+    assert storage.failures == 0 and job.attempts == 1
+    assert generator.renders == 1  # the cuts waited in the spool instead of being rendered again
+    assert worker.pipeline.spool.entries("j0") == []
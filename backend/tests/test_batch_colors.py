@@ -0,0 +1,57 @@
+import pytest
+
+from app.generation.spool import SpoolEntry, UploadSpool
+
+
+def test_spool_keeps_each_color_of_a_cut(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    for color in ("navy", "camel"):
+        spool.put(SpoolEntry(job_id="b1", cut="recto", key=f"{color}.jpg", color_id=color), color.encode())
+    entries = spool.entries("b1")
+    assert sorted((e.color_id, spool.read(e)) for e in entries) == [("camel", b"camel"), ("navy", b"navy")]
+    assert entries[0].result_fields["color_id"] == entries[0].color_id
+
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app.generation.generator import SdxlTurboGenerator, color_batches  # noqa: E402
+
+
+def test_color_batches_split_by_ip_adapter_scale_and_size():
+    colors = [("a", "img", 0.7), ("b", "blank", 0.0), ("c", "img", 0.7), ("d", "img", 0.7)]
+    batches = color_batches(colors, 2)
+    assert [[color for color, _, _ in batch] for batch in batches] == [["a", "c"], ["d"], ["b"]]
+    assert color_batches(colors[:1], 0) == [colors[:1]]
+
+
+def test_a_batched_call_renders_each_image_as_its_own_call(tiny_sdxl, call_kwargs):
+    pipe = tiny_sdxl
+    single = call_kwargs(1)
+    expected = pipe(**single).images
+
+    batch = dict(single, generator=[torch.Generator().manual_seed(3) for _ in range(3)])
+    for name in ("prompt_embeds", "pooled_prompt_embeds", "negative_prompt_embeds", "negative_pooled_prompt_embeds"):
+        batch[name] = single[name].repeat(3, *[1] * (single[name].dim() - 1))
+    images = pipe(**batch).images
+    assert images.shape[0] == 3
+    for image in images:  # same prompt, pose and seed: the same image as a call of its own
+        assert torch.allclose(image, expected[0], rtol=1e-4, atol=1e-3)
+
+
+class EmbedsPipe:
+    """prepare_ip_adapter_image_embeds as the SDXL pipelines return it: [negative; positive] per adapter."""
+    _execution_device = "cpu"
+
+    def prepare_ip_adapter_image_embeds(self, images, embeds, device, num_images, do_cfg):
+        value = float(images[0])
+        positive = torch.full((1, 1, 4), value)
+        return [torch.cat([-positive, positive]) if do_cfg else positive]
+
+
+def test_ip_embeds_give_each_image_its_own_swatch():
+    embeds = SdxlTurboGenerator._ip_embeds(EmbedsPipe(), [1, 2, 3], guidance=5.0)["ip_adapter_image_embeds"]
+    negative, positive = embeds[0].chunk(2)  # as the pipeline splits them
+    assert positive[:, 0, 0].tolist() == [1, 2, 3] and negative[:, 0, 0].tolist() == [-1, -2, -3]
+    embeds = SdxlTurboGenerator._ip_embeds(EmbedsPipe(), [1, 2], guidance=1.0)["ip_adapter_image_embeds"]
+    assert embeds[0][:, 0, 0].tolist() == [1, 2]
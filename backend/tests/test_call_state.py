@@ -0,0 +1,45 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app.generation.call_state import enable_call_scale, ip_adapter_scale, pipeline_for_call  # noqa: E402
+
+
+def test_concurrent_renders_each_use_their_own_ip_adapter_scale(tiny_ip_pipeline, ip_inputs):
+    pipe = tiny_ip_pipeline
+    cross_attention = [n for n in pipe.unet.attn_processors if n.endswith("attn2.processor")]
+    assert enable_call_scale(pipe.unet) == len(cross_attention)
+    latents, text, image_embeds = ip_inputs()
+
+    def render(scale):
+        with ip_adapter_scale(scale):
+            return pipeline_for_call(pipe)(latents, text, image_embeds)
+
+    expected = {scale: render(scale) for scale in (0.0, 1.0)}
+    assert not torch.allclose(expected[0.0], expected[1.0])
+    assert torch.equal(pipe(latents, text, image_embeds), expected[1.0])  # no call scale: the loaded one
+
+    results, errors = {0.0: [], 1.0: []}, []
+    start = threading.Barrier(2)
+
+    def worker(scale):
+        try:
+            start.wait()
+            for _ in range(5):
+                results[scale].append(render(scale))
+        except Exception as exc:  # surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(scale,)) for scale in (0.0, 1.0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    for scale, outputs in results.items():
+        assert len(outputs) == 5 and all(torch.equal(out, expected[scale]) for out in outputs)
+    assert all(pipe.unet.attn_processors[n].scale == [1.0] for n in cross_attention)  # never mutated
@@ -0,0 +1,20 @@
+import json
+
+from app.catalog import service
+
+
+def test_fabrics_json_is_parsed_once_for_every_lookup(monkeypatch):
+    loads = []
+    monkeypatch.setattr(service.json, "load", lambda f: loads.append(f.name) or json.loads(f.read()))
+    service._load_raw.cache_clear()
+    service._families_by_id.cache_clear()
+    try:
+        family = service.load_catalog().families[0]
+        for _ in range(3):
+            assert [c.color_id for c in service.family_colors(family.family_id)] == [c.color_id for c in family.colors]
+            service.family_lora_id(family.family_id)
+        assert service.family_colors("no-such-family") is None and service.family_lora_id("no-such-family") is None
+        assert len(loads) == 1
+    finally:
+        service._load_raw.cache_clear()  # the next caller re-reads the real file
+        service._families_by_id.cache_clear()
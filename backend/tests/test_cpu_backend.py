@@ -0,0 +1,60 @@
+import pytest
+
+from app.generation import cpu_backend
+from app.generation.profiles import GenerationProfile
+
+
+def test_render_size_fits_the_long_side_and_keeps_multiples_of_8(monkeypatch):
+    monkeypatch.setattr(cpu_backend, "CPU_MAX_SIDE", 1024)
+    assert cpu_backend.render_size(1344, 2016) == (680, 1024)
+    assert cpu_backend.render_size(512, 768) == (512, 768)  # never scaled up
+    monkeypatch.setattr(cpu_backend, "CPU_MAX_SIDE", 0)
+    assert cpu_backend.render_size(1344, 2016) == (1344, 2016)
+
+
+def test_native_bf16_reads_the_cpu_flags(tmp_path):
+    cpuinfo = tmp_path / "cpuinfo"
+    cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu sse2 avx2 avx512f\n")
+    assert not cpu_backend.native_bf16(str(cpuinfo))
+    cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu avx512f avx512_bf16 amx_tile amx_bf16\n")
+    assert cpu_backend.native_bf16(str(cpuinfo))
+    cpuinfo.write_text("processor\t: 0\nFeatures\t: fp asimd sve bf16 i8mm\n")  # Arm
+    assert cpu_backend.native_bf16(str(cpuinfo))
+    assert not cpu_backend.native_bf16(str(tmp_path / "missing"))
+
+
+def test_fast_profile_drops_guidance_and_refiner(monkeypatch):
+    monkeypatch.setattr(cpu_backend, "CPU_FAST_STEPS", 2)
+    profile = GenerationProfile(name="studio", total_steps=80, guidance=4.3, use_refiner=True)
+    fast = cpu_backend.fast_profile(profile)
+    assert (fast.name, fast.total_steps, fast.guidance, fast.use_refiner) == ("studio", 2, 0.0, False)
+    assert fast.fingerprint != profile.fingerprint
+
+
+torch = pytest.importorskip("torch")
+
+
+def test_cpu_dtype_follows_cpu_dtype_setting(monkeypatch):
+    monkeypatch.setattr(cpu_backend, "CPU_DTYPE", "float32")
+    assert cpu_backend.cpu_dtype() is torch.float32
+    monkeypatch.setattr(cpu_backend, "CPU_DTYPE", "bfloat16")
+    assert cpu_backend.cpu_dtype() is torch.bfloat16
+    monkeypatch.setattr(cpu_backend, "CPU_DTYPE", "auto")
+    monkeypatch.setattr(cpu_backend, "native_bf16", lambda: False)
+    assert cpu_backend.cpu_dtype() is torch.float32
+    monkeypatch.setattr(cpu_backend, "CPU_DTYPE", "float16")
+    with pytest.raises(ValueError):
+        cpu_backend.cpu_dtype()
+
+
+def test_optimize_uses_channels_last_and_skips_a_missing_compile_backend(monkeypatch):
+    monkeypatch.setattr(cpu_backend, "CPU_CHANNELS_LAST", True)
+    monkeypatch.setattr(cpu_backend, "CPU_COMPILE_BACKEND", "no-such-backend")
+    conv = torch.nn.Sequential(torch.nn.Conv2d(4, 8, 3))
+    x = torch.randn(1, 4, 16, 16)
+    expected = conv(x)
+
+    assert cpu_backend.compile_backend() is None
+    assert cpu_backend.optimize(conv) is conv
+    assert conv[0].weight.is_contiguous(memory_format=torch.channels_last)
+    assert torch.allclose(conv(x), expected, atol=1e-6)
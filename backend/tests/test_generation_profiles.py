@@ -0,0 +1,38 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from app.generation.profiles import GenerationProfile, ProfileCatalog
+
+
+def test_profiles_from_file_are_validated_fingerprinted_and_share_models(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({
+        "fast": {"total_steps": 30, "guidance": 5},
+        "fast-copy": {"total_steps": 30, "guidance": 5.0},
+        "depth": {"controlnet_enabled": True, "controlnet_model": "diffusers/controlnet-depth-sdxl-1.0"},
+        "broken": {"refiner_split": 1.5},
+        "typo": {"guidnace": 5.0},
+    }))
+    catalog = ProfileCatalog(str(path), use_db=False)
+
+    assert catalog.names() == ["default", "depth", "fast", "fast-copy"]  # invalid ones are skipped
+    fast = catalog.get("fast")
+    assert fast.guidance == 5.0 and fast.use_refiner == catalog.get().use_refiner  # unset fields keep the default
+    assert fast.fingerprint == catalog.get("fast-copy").fingerprint != catalog.get().fingerprint
+    assert fast.model_key() == catalog.get().model_key()         # same pipelines, nothing to load
+    assert catalog.get("depth").model_key() != fast.model_key()  # needs the ControlNet
+    depth_key = catalog.get("depth").model_key()
+    assert depth_key.controlnet == "diffusers/controlnet-depth-sdxl-1.0" and depth_key.controlnet2 is None
+    assert replace(fast, ip_adapter_enabled=False).model_key().ip_adapter is None
+    assert replace(fast, ip_adapter_enabled=True).model_key().ip_adapter == (
+        fast.ip_adapter_repo, fast.ip_adapter_subfolder, fast.ip_adapter_weight)
+
+    with pytest.raises(KeyError):
+        catalog.get("missing")
+    path.write_text(json.dumps({"missing": {"total_steps": 12}}))
+    assert catalog.get("missing").total_steps == 12  # an unknown name re-reads the sources
+
+    with pytest.raises(ValueError):
+        GenerationProfile(name="bad", total_steps="40")
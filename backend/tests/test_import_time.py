@@ -0,0 +1,49 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("torch", "diffusers", "transformers")
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "10"))
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - t0, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+@pytest.mark.parametrize("module", ["worker", "app.main"])
+def test_mock_worker_and_api_start_without_torch(module):
+    env = {
+        **os.environ,
+        "DATABASE_URL": os.getenv("DATABASE_URL", "sqlite://"),
+        "USE_MOCK_GENERATOR": "true",
+        "JOB_QUEUE_BACKEND": "memory",
+    }
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["heavy"] == []  # a fresh interpreter: nothing imported them
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_api_starts_without_the_tests_directory(tmp_path):
+    # The API image ships without tests/ (.railwayignore), where the default watermark lives
+    shutil.copytree(BACKEND_DIR / "app", tmp_path / "app", ignore=shutil.ignore_patterns("__pycache__"))
+    env = {key: value for key, value in os.environ.items() if key != "WATERMARK_PATH"}
+    env.update(DATABASE_URL=os.getenv("DATABASE_URL", "sqlite://"), JOB_QUEUE_BACKEND="memory")
+    out = subprocess.run(
+        [sys.executable, "-c", "import app.main"], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert out.returncode == 0, out.stderr
@@ -0,0 +1,211 @@
+import threading, time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.generation.queue import MemoryJobQueue, WorkerCapabilities, create_queue
+from app.generation.queue.routing import swatch_key
+from app.generation.schemas import BatchColor, GenerationRequest, ImageResult
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobQueue()
+    from app.core.database import Base
+    import app.generation.models  # noqa: F401  (registers the tables on Base)
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", future=True)
+    Base.metadata.create_all(engine)
+    return create_queue(engine, backend="sqlite")
+
+
+def _req(**kw):
+    return GenerationRequest(family_id="f", color_id="c", **kw)
+
+
+def _image(cut, color_id=None):
+    return ImageResult(cut=cut, color_id=color_id, url=f"http://x/{color_id}/{cut}.jpg", width=8, height=8)
+
+
+def test_enqueue_claim_complete(queue):
+    queue.enqueue("j1", _req(), ttl_seconds=60)
+    job = queue.claim("w1", lease_seconds=30)
+    assert (job.job_id, job.status, job.attempts, job.worker_id) == ("j1", "processing", 1, "w1")
+    assert job.seed is not None  # pinned at claim
+    assert queue.claim("w2", lease_seconds=30) is None
+
+    queue.add_result("j1", _image("cruzado"))
+    assert queue.get("j1").missing_cuts == ["recto"]
+    queue.add_result("j1", _image("recto"))
+    done = queue.complete("j1")
+    assert done.status == "completed"
+    assert [r["cut"] for r in done.results] == ["recto", "cruzado"]  # requested order
+
+
+def test_batch_job_keeps_a_result_per_color_and_cut(queue):
+    colors = [BatchColor(color_id="navy", swatch_url="https://cdn.example/navy.jpg"), BatchColor(color_id="camel")]
+    queue.enqueue("b1", GenerationRequest(family_id="f", color_id="navy", colors=colors))
+    queue.claim("w1", lease_seconds=30)
+    queue.add_result("b1", _image("cruzado", "camel"))
+    queue.add_result("b1", _image("recto", "navy"))
+
+    job = queue.get("b1")
+    assert job.image_count == 4
+    assert job.missing_cuts == ["recto", "cruzado"]
+    assert [c["color_id"] for c in job.missing_colors] == ["navy", "camel"]
+    retry = job.to_request(["cruzado"], job.missing_colors[:1])
+    assert (retry.color_id, retry.swatch_url, retry.cuts) == ("navy", "https://cdn.example/navy.jpg", ["cruzado"])
+
+    for color, cut in [("camel", "recto"), ("navy", "cruzado"), ("camel", "recto")]:  # a retry replaces
+        queue.add_result("b1", _image(cut, color))
+    assert queue.get("b1").missing_cuts == []
+    done = queue.complete("b1")
+    assert [(r["color_id"], r["cut"]) for r in done.results] == [
+        ("navy", "recto"), ("navy", "cruzado"), ("camel", "recto"), ("camel", "cruzado"),
+    ]
+
+
+def test_expired_jobs_are_skipped_and_swept(queue):
+    queue.enqueue("old", _req(), ttl_seconds=1)
+    queue.enqueue("new", _req(), ttl_seconds=None)
+    time.sleep(1.1)
+    assert queue.claim("w1", lease_seconds=30).job_id == "new"
+    assert queue.expire_stale() == 1
+    assert queue.get("old").status == "expired"
+
+
+def test_requeued_jobs_outlive_the_ttl(queue):
+    queue.enqueue("j1", _req(), ttl_seconds=1)
+    queue.claim("w1", lease_seconds=30)
+    time.sleep(1.1)
+    queue.fail("j1", "timeout", requeue=True, worker_id="w1")
+    assert queue.expire_stale() == 0
+    assert queue.claim("w1", lease_seconds=30).job_id == "j1"
+
+
+def test_fail_requeue_and_release(queue):
+    queue.enqueue("j1", _req())
+    queue.claim("w1", lease_seconds=30)
+    assert queue.fail("j1", "timeout", requeue=True).status == "pending"
+    assert queue.claim("w1", lease_seconds=30).attempts == 2
+    released = queue.release_worker("w1")
+    assert [j.job_id for j in released] == ["j1"]
+    assert queue.get("j1").attempts == 1  # shutdown doesn't use up an attempt
+    queue.claim("w1", lease_seconds=30)
+    assert queue.fail("j1", "bad config").status == "failed"
+
+
+def test_retry_requeues_a_failed_job_with_a_clean_slate(queue):
+    queue.enqueue("j1", _req())
+    queue.claim("w1", lease_seconds=30)
+    queue.add_result("j1", _image("recto"), worker_id="w1")
+    assert queue.retry("j1") is None  # still processing
+    queue.fail("j1", "bad config", worker_id="w1")
+
+    job = queue.retry("j1", ttl_seconds=60)
+    assert (job.status, job.attempts, job.passed_over, job.error_message) == ("pending", 0, 0, None)
+    assert (job.worker_id, job.lease_expires_at, job.completed_at) == (None, None, None)
+    assert job.expires_at > datetime.utcnow() and job.missing_cuts == ["cruzado"]
+    assert queue.claim("w2", lease_seconds=30).attempts == 1
+    assert queue.retry("missing") is None
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue("j1", _req())
+    queue.claim("w1", lease_seconds=0)
+    time.sleep(0.01)
+    reclaimed = queue.reclaim_expired_leases(max_attempts=3, lease_seconds=0)
+    assert [(j.job_id, j.status) for j in reclaimed] == [("j1", "pending")]
+    assert queue.claim("w2", lease_seconds=0).worker_id == "w2"
+    time.sleep(0.01)
+    assert queue.reclaim_expired_leases(max_attempts=2, lease_seconds=0)[0].status == "failed"
+
+
+def test_writes_from_a_worker_that_lost_its_lease_are_no_ops(queue):
+    queue.enqueue("j1", _req())
+    queue.claim("w1", lease_seconds=0)
+    time.sleep(0.01)
+    queue.reclaim_expired_leases(max_attempts=3, lease_seconds=0)
+    queue.claim("w2", lease_seconds=30)
+    queue.add_result("j1", _image("recto"), worker_id="w2")
+
+    assert queue.add_result("j1", _image("cruzado"), worker_id="w1") is None
+    assert queue.complete("j1", worker_id="w1") is None
+    assert queue.fail("j1", "stale", requeue=False, worker_id="w1") is None
+    assert queue.release("j1", worker_id="w1") is None
+    job = queue.get("j1")
+    assert (job.status, job.worker_id, job.error_message) == ("processing", "w2", None)
+    assert [r["cut"] for r in job.results] == ["recto"]
+    assert queue.complete("j1", worker_id="w2").status == "completed"  # the lease holder still writes
+
+
+def test_concurrent_claims_never_share_a_job(queue):
+    for i in range(20):
+        queue.enqueue(f"j{i}", _req())
+    claimed, lock = [], threading.Lock()
+
+    def drain(worker_id):
+        while (job := queue.claim(worker_id, lease_seconds=30)) is not None:
+            with lock:
+                claimed.append(job.job_id)
+
+    threads = [threading.Thread(target=drain, args=(f"w{n}",)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(f"j{i}" for i in range(20))
+
+
+def test_subscribe_follows_job_to_terminal_state(queue):
+    queue.enqueue("j1", _req(cuts=["recto"]))
+
+    def work():
+        queue.claim("w1", lease_seconds=30)
+        queue.add_result("j1", _image("recto"))
+        queue.complete("j1")
+
+    threading.Timer(0.05, work).start()
+    states = [job.status for job in queue.subscribe("j1", timeout=10, poll_interval=0.01)]
+    assert states[0] == "pending" and states[-1] == "completed"
+
+
+def test_claim_routes_by_capability_and_warm_cache(queue):
+    swatch = "https://cdn.example/swatch.jpg"
+    queue.enqueue("inpaint", _req(mode="inpaint"))
+    queue.enqueue("warm", _req(swatch_url=swatch, lora_id="lora_a"))
+    queue.enqueue("plain", _req())
+    full_only = WorkerCapabilities(modes=["full"])
+    warm = WorkerCapabilities(modes=["full", "inpaint"], loras=["lora_a"], warm_swatches=[swatch_key(swatch)])
+    queue.register_worker("cold", capabilities=full_only)
+    queue.register_worker("hot", capabilities=warm)
+
+    # "inpaint" can't run on a full-only worker; "warm" is left to the worker with its caches
+    assert queue.claim("cold", lease_seconds=30, capabilities=full_only).job_id == "plain"
+    assert queue.claim("cold", lease_seconds=30, capabilities=full_only) is None
+    assert queue.get("warm").requirements == {"lora_id": "lora_a"}
+    assert queue.claim("hot", lease_seconds=30, capabilities=warm).job_id == "inpaint"
+    assert queue.claim("hot", lease_seconds=30, capabilities=warm).job_id == "warm"
+
+
+def test_warming_worker_does_not_hold_jobs_for_its_caches(queue):
+    swatch = "https://cdn.example/swatch.jpg"
+    queue.enqueue("warm", _req(swatch_url=swatch))
+    queue.register_worker("starting", capabilities=WorkerCapabilities(warm_swatches=[swatch_key(swatch)]))
+    queue.set_worker_state("starting", "warming")  # cached swatches on disk, but not claiming yet
+    assert queue.claim("cold", lease_seconds=30, capabilities=WorkerCapabilities()).job_id == "warm"
+
+
+def test_affinity_policy_prefers_warm_jobs_within_fairness_bound(queue, monkeypatch):
+    from app.generation.queue import routing
+    monkeypatch.setattr(routing, "CLAIM_POLICY", "affinity")
+    monkeypatch.setattr(routing, "AFFINITY_MAX_PASSES", 2)
+    queue.enqueue("cold", _req(lora_id="lora_x"))
+    for i in range(3):
+        queue.enqueue(f"warm{i}", _req(lora_id="lora_y"))
+    caps = WorkerCapabilities(loras=["lora_y"])
+
+    claimed = [queue.claim("w1", lease_seconds=30, capabilities=caps).job_id for _ in range(4)]
+    assert claimed == ["warm0", "warm1", "cold", "warm2"]  # "cold" is passed over at most twice
+    assert queue.get("cold").passed_over == 2
@@ -0,0 +1,54 @@
+from app.generation.lora import LoraAdapters
+
+
+class FakeUnet:
+    """Records the PEFT adapter calls LoraAdapters makes."""
+
+    def __init__(self):
+        self.adapters, self.calls = set(), []
+
+    def set_adapters(self, names, weights=None):
+        assert set(names) <= self.adapters
+        self.calls.append(("set", names[0]))
+
+    def enable_lora(self):
+        self.calls.append(("enable",))
+
+    def disable_lora(self):
+        self.calls.append(("disable",))
+
+    def delete_adapters(self, names):
+        names = [names] if isinstance(names, str) else names
+        self.adapters -= set(names)
+        self.calls.append(("delete", *names))
+
+
+def test_adapters_switch_without_reloading_and_evict_least_recently_used():
+    unet, loads, lookups = FakeUnet(), [], []
+
+    def loader(lora_id):
+        lookups.append(lora_id)
+        if lora_id == "gone":
+            return False
+        loads.append(lora_id)
+        unet.adapters.add(lora_id)
+        return True
+
+    loras = LoraAdapters(unet, loader, max_loaded=2, scale=0.8)
+    assert loras.activate("a") == "a"
+    assert loras.activate("b") == "b"
+    assert loras.activate(None) is None
+    assert loras.activate("a") == "a"
+    assert loads == ["a", "b"]  # switching back is a set_adapters call, not a reload
+    assert loras.loaded() == ["a", "b"]
+
+    assert loras.activate("gone") is None
+    assert loras.loaded() == ["a", "b"]  # a missing adapter doesn't evict a loaded one
+    assert loras.activate("c") == "c"
+    assert loras.loaded() == ["c", "a"]
+    assert ("delete", "b") in unet.calls
+    assert loras.activate("gone") is None
+    assert lookups.count("gone") == 1  # remembered as missing, not looked up again
+
+    loras.clear()
+    assert loras.loaded() == [] and unet.adapters == set()
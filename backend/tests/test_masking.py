@@ -0,0 +1,28 @@
+import numpy as np
+from PIL import Image
+
+from app.generation.masking import crop_for_inpaint, mask_crop_region, paste_inpainted
+
+
+def test_crop_to_mask_renders_the_box_and_leaves_unmasked_pixels_exact():
+    rng = np.random.default_rng(0)
+    reference = Image.fromarray(rng.integers(0, 256, (1536, 1024, 3), dtype=np.uint8))
+    mask_arr = np.zeros((1536, 1024), dtype=np.uint8)
+    mask_arr[500:1300, 250:800] = 255  # the "suit"
+    mask = Image.fromarray(mask_arr)
+
+    region = mask_crop_region(mask, padding=48, min_side=768)
+    assert region.box == (202, 452, 848, 1348)
+    assert all(side % 8 == 0 for side in region.render_size)
+    assert region.render_size[0] >= 768  # small crops are upscaled for SDXL
+
+    image_in, mask_in = crop_for_inpaint(reference, mask, region)
+    assert image_in.size == mask_in.size == region.render_size
+    out = paste_inpainted(reference, Image.new("RGB", region.render_size, (255, 0, 0)), mask, region, feather=8)
+
+    out_arr, ref_arr = np.asarray(out), np.asarray(reference)
+    assert np.array_equal(out_arr[mask_arr == 0], ref_arr[mask_arr == 0])  # untouched outside the mask
+    assert (out_arr[600:1200, 350:700] == (255, 0, 0)).all()              # inpainted inside
+    assert not (out_arr[900, 252] == (255, 0, 0)).all()                    # feathered at the edge
+
+    assert mask_crop_region(Image.new("L", (64, 64))) is None  # empty mask: render the full image
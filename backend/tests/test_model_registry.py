@@ -0,0 +1,24 @@
+from app.generation.model_registry import ComponentSet, ModelRegistry
+
+
+def test_components_are_loaded_once_and_freed_with_the_last_reference():
+    registry = ModelRegistry()
+    loads = []
+
+    def loader(name):
+        return lambda: loads.append(name) or object()
+
+    full, inpaint = ComponentSet(registry), ComponentSet(registry)
+    vae = full.acquire("vae:base", loader("vae"))
+    full.acquire("unet:base", loader("unet"))
+    assert inpaint.acquire("vae:base", loader("vae")) is vae
+    inpaint.acquire("unet:inpaint", loader("unet-inpaint"))
+    assert loads == ["vae", "unet", "unet-inpaint"]
+    assert registry.refcounts()["vae:base"] == 2
+
+    full.release_all()
+    assert registry.refcounts() == {"vae:base": 1, "unet:inpaint": 1}
+    inpaint.release_all()
+    assert registry.refcounts() == {}
+    full.acquire("vae:base", loader("vae"))
+    assert loads[-1] == "vae"  # loaded again after it was freed
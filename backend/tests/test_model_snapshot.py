@@ -0,0 +1,24 @@
+from app.generation.snapshot import ModelSnapshot, component_path
+
+
+def test_snapshot_manifest_round_trip_and_damaged_components_fall_back(tmp_path):
+    snap = ModelSnapshot.create(str(tmp_path), "float16")
+    for key in ("unet:org/base", "vae:/models/local-sdxl"):
+        directory = tmp_path / component_path(key)
+        directory.mkdir(parents=True)
+        (directory / "model.safetensors").write_bytes(b"weights" * 10)
+        snap.record(key, hub_load_seconds=1.0)
+    snap.save()
+    assert component_path("vae:/models/local-sdxl") == "vae/models/local-sdxl"  # stays inside the snapshot
+
+    reopened = ModelSnapshot.open(str(tmp_path))
+    assert reopened.dtype == "float16" and set(reopened.components) == {"unet:org/base", "vae:/models/local-sdxl"}
+    assert reopened.path("unet:org/base") == str(tmp_path / "unet/org/base")
+    assert reopened.check("unet:org/base") == []
+
+    (tmp_path / "unet/org/base/model.safetensors").write_bytes(b"WEIGHTS" * 10)  # same size, other bytes
+    assert reopened.check("unet:org/base") == ["model.safetensors checksum mismatch"]
+    (tmp_path / "unet/org/base/model.safetensors").write_bytes(b"short")
+    assert "unet:org/base" not in ModelSnapshot.open(str(tmp_path)).components  # loads from the hub instead
+    assert ModelSnapshot.open(str(tmp_path / "missing")) is None
+    assert ModelSnapshot.create(str(tmp_path), "bfloat16").components == {}  # other dtype: bake afresh
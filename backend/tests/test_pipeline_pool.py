@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from app.generation.pipeline_pool import ConfigGate, PipelinePool, replicas_for
+
+
+def test_replicas_for_parses_global_and_per_device_counts():
+    assert replicas_for("cuda", "") == 1
+    assert replicas_for("cuda:0", "3") == 3
+    assert replicas_for("cuda:0", "cuda=2,cpu=4") == 2
+    assert replicas_for("cpu", "cuda=2, cpu=4") == 4
+    assert replicas_for("mps", "cuda=2,cpu=4") == 1
+    assert replicas_for("cpu", "0") == 1
+
+
+def test_pool_builds_replicas_lazily_and_blocks_when_all_are_out():
+    built = []
+    pool = PipelinePool(lambda: built.append(object()) or built[-1], size=2)
+
+    with pool.checkout() as first:
+        assert pool.created == 1 and pool.in_use == 1
+        with pool.checkout() as second:
+            assert second is not first and pool.in_use == 2
+            with pytest.raises(TimeoutError):
+                with pool.checkout(timeout=0.05):
+                    pass
+    with pool.checkout() as again:
+        assert again in built and pool.created == 2  # reused, not rebuilt
+    assert pool.in_use == 0
+
+
+def test_pool_hands_a_freed_replica_to_a_waiting_render():
+    pool = PipelinePool(object, size=1)
+    got = []
+    with pool.checkout() as replica:
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout().__enter__()))
+        waiter.start()
+        time.sleep(0.05)
+        assert got == []
+    waiter.join(timeout=5)
+    assert got == [replica]
+
+
+def test_pool_forgets_a_replica_whose_factory_failed():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("out of memory")
+        return "replica"
+
+    pool = PipelinePool(factory, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.checkout():
+            pass
+    with pool.checkout(timeout=1) as replica:
+        assert replica == "replica"
+
+
+def test_gate_runs_same_key_together_and_switches_when_idle():
+    gate, log = ConfigGate(), []
+    entered = threading.Event()
+    release = threading.Event()
+
+    def render(key):
+        with gate.use(key, lambda: log.append(f"setup {key}")):
+            log.append(f"run {key}")
+            entered.set()
+            release.wait(5)
+
+    first = threading.Thread(target=render, args=("a",))
+    first.start()
+    entered.wait(5)
+    # Same key joins the running render without waiting
+    with gate.use("a", lambda: "lora-a") as lora:
+        assert lora == "lora-a"
+    # Another key waits until "a" is done
+    other = threading.Thread(target=render, args=("b",))
+    other.start()
+    time.sleep(0.05)
+    assert "run b" not in log
+    # A later "a" queues behind the switch rather than starving it
+    late = threading.Thread(target=render, args=("a",))
+    late.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in (first, other, late):
+        thread.join(timeout=5)
+
+    runs = [entry for entry in log if entry.startswith("run")]
+    assert runs == ["run a", "run b", "run a"]
+
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app.generation.call_state import pipeline_replica  # noqa: E402
+
+
+@pytest.mark.parametrize("mode", ["shared", "copy"])
+def test_concurrent_renders_on_replicas_match_serial_ones(mode, tiny_ip_pipeline, ip_inputs):
+    pipe = tiny_ip_pipeline
+    pool = PipelinePool(lambda: pipeline_replica(pipe, mode), size=2)
+    image_embeds = ip_inputs(1)[2]
+    inputs = [ip_inputs(seed)[:2] for seed in (1, 2)]
+    expected = [pipe(latents, text, image_embeds, steps=steps) for (latents, text), steps in zip(inputs, (4, 6))]
+
+    results, errors = {0: [], 1: []}, []
+    start = threading.Barrier(2)
+
+    def worker(i):
+        latents, text = inputs[i]
+        try:
+            start.wait()
+            for _ in range(4):
+                with pool.checkout() as replica:
+                    results[i].append(replica(latents, text, image_embeds, steps=(4, 6)[i]))
+        except Exception as exc:  # surfaced below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert pool.created <= 2
+    for i, outputs in results.items():
+        assert len(outputs) == 4 and all(torch.equal(out, expected[i]) for out in outputs)
@@ -0,0 +1,67 @@
+import pytest
+
+from app.generation.prefix_cache import PrefixCache, remap_control_guidance
+
+
+def keep(i, steps, start, end):
+    """Whether the ControlNet pipelines apply a ControlNet on step i of steps."""
+    return not (i / steps < start or (i + 1) / steps > end)
+
+
+@pytest.mark.parametrize("start,end", [(0.0, 0.5), (0.05, 0.88), (0.3, 1.0), (0.0, 0.2)])
+def test_remapped_control_guidance_covers_the_same_absolute_steps(start, end):
+    total, done = 80, 20
+    s, e, w = remap_control_guidance(start, end, 0.9, done, total)
+    assert 0 <= s < e <= 1
+    for i in range(total - done):
+        assert (w > 0 and keep(i, total - done, s, e)) == keep(i + done, total, start, end)
+
+
+def test_remap_handles_one_entry_per_controlnet():
+    starts, ends, scales = remap_control_guidance([0.0, 0.05], [0.2, 0.88], [0.9, 0.65], 20, 80)
+    assert scales == [0.0, 0.65]  # the depth ControlNet ended within the prefix
+    assert starts[1] == 0.0 and ends[1] == pytest.approx((0.88 * 80 - 20) / 60)
+
+
+def test_prefix_cache_evicts_the_least_recently_used():
+    cache = PrefixCache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    PrefixCache(size=0).put("a", 1)  # disabled: keeps nothing
+    cache.clear()
+    assert len(cache) == 0
+
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app.generation.prefix_cache import PrefixCapture, resume  # noqa: E402
+
+
+def test_resuming_a_prefix_matches_the_uncached_render(tiny_sdxl, call_kwargs):
+    pipe = tiny_sdxl
+    expected = pipe(**call_kwargs(1)).images
+
+    calls = []
+    capture = PrefixCapture(4, then=lambda pipe, step, t, kwargs: calls.append(step) or kwargs)
+    pipe(**call_kwargs(1), callback_on_step_end=capture)
+    assert capture.state.steps == 4 and calls == [0, 1, 2, 3]  # stopped after the prefix
+
+    for _ in range(2):  # the snapshot is not consumed by a resume
+        view, resumed = resume(pipe, capture.state)
+        assert torch.equal(view(**call_kwargs(1), **resumed).images, expected)
+
+
+def test_a_resumed_render_follows_its_own_conditioning(tiny_sdxl, call_kwargs):
+    pipe = tiny_sdxl
+    capture = PrefixCapture(3)
+    pipe(**call_kwargs(1), callback_on_step_end=capture)
+
+    view, resumed = resume(pipe, capture.state)
+    other = view(**call_kwargs(2), **resumed).images
+    assert not torch.equal(other, pipe(**call_kwargs(1)).images)
+    assert not torch.equal(other, pipe(**call_kwargs(2)).images)  # shares the first 3 steps only
+    assert torch.isfinite(other).all()
@@ -0,0 +1,33 @@
+import os
+
+from PIL import Image
+
+from app.generation.pipeline import StagedPipeline
+from app.generation.postprocess import RenderedCut
+from app.generation.schemas import GenerationRequest
+from app.generation.storage import LocalStorage
+
+WATERMARK = os.path.join(os.path.dirname(__file__), "assets", "watermark-logo.png")
+
+
+def cut(name: str, image=None) -> RenderedCut:
+    return RenderedCut(cut=name, image=image or Image.new("RGB", (64, 96), (90, 90, 90)), width=64, height=96)
+
+
+def test_an_encode_error_waits_for_the_rest_of_the_inference(tmp_path):
+    events = []
+    pipeline = StagedPipeline(
+        LocalStorage(base_dir=str(tmp_path / "storage")), WATERMARK,
+        on_image=lambda ticket, image: events.append(("image", image.cut)),
+        on_error=lambda ticket, error: events.append(("error", ticket.job_id)),
+    )
+    ticket = pipeline.start_job("j1", GenerationRequest(family_id="f", color_id="c"))
+
+    pipeline.submit(ticket, RenderedCut(cut="recto", image=None, width=64, height=96))  # can't be encoded
+    assert pipeline.drain(timeout=10)
+    pipeline.submit(ticket, cut("cruzado"))  # inference was still running
+    pipeline.finish_job(ticket)
+    assert pipeline.close(timeout=10)
+
+    assert events == [("image", "cruzado"), ("error", "j1")]  # handed back once the last cut landed
+    assert ticket.error is not None
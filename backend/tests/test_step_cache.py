@@ -0,0 +1,88 @@
+import copy
+
+import pytest
+
+from app.generation.profiles import GenerationProfile
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app.generation import cpu_backend  # noqa: E402
+from app.generation.call_state import call_scaled, enable_call_scale  # noqa: E402
+from app.generation.model_registry import compile_unet  # noqa: E402
+from app.generation.step_cache import enable_step_cache, step_caching  # noqa: E402
+
+
+def test_profile_rejects_a_negative_step_cache():
+    assert GenerationProfile(step_cache_interval=3, step_cache_depth=1).step_cache_interval == 3
+    with pytest.raises(ValueError):
+        GenerationProfile(step_cache_interval=-1)
+
+
+def count_calls(module):
+    calls = []
+    module.register_forward_hook(lambda *_: calls.append(1))
+    return calls
+
+
+def test_interval_one_and_no_cache_render_the_same(tiny_ip_pipeline, ip_inputs):
+    pipe = tiny_ip_pipeline
+    expected = pipe(*ip_inputs(), steps=6)
+    assert enable_step_cache(pipe.unet) == len(pipe.unet.down_blocks)
+    assert enable_step_cache(pipe.unet) == len(pipe.unet.down_blocks)  # idempotent
+    assert torch.equal(pipe(*ip_inputs(), steps=6), expected)
+    with step_caching(1, 0) as cache:
+        assert cache is None
+        assert torch.equal(pipe(*ip_inputs(), steps=6), expected)
+
+
+def test_deep_blocks_run_only_on_full_steps(tiny_ip_pipeline, ip_inputs):
+    pipe = tiny_ip_pipeline
+    enable_step_cache(pipe.unet)
+    uncached = pipe(*ip_inputs(), steps=6)
+    mid, shallow = count_calls(pipe.unet.mid_block.resnets[0]), count_calls(pipe.unet.down_blocks[0].resnets[0])
+
+    with step_caching(3, 0) as cache:
+        cached = pipe(*ip_inputs(), steps=6)
+
+    assert (len(mid), len(shallow)) == (2, 6)  # steps 0 and 3 are full
+    assert cache.cached_steps == 4
+    assert cached.shape == uncached.shape and torch.isfinite(cached).all()
+    assert not torch.equal(cached, uncached)
+
+
+def test_a_deep_copied_unet_caches_with_its_own_weights(tiny_ip_pipeline, ip_inputs):
+    pipe = tiny_ip_pipeline
+    enable_step_cache(pipe.unet)
+    replica = copy.deepcopy(pipe)
+    with step_caching(2, 0):
+        expected = pipe(*ip_inputs(), steps=4)
+    with torch.no_grad():
+        for p in pipe.unet.parameters():
+            p.zero_()
+    with step_caching(2, 0):
+        assert torch.equal(replica(*ip_inputs(), steps=4), expected)
+
+
+def test_a_unet_compiled_after_its_wrappers_does_not_recompile(monkeypatch, tiny_ip_pipeline, ip_inputs):
+    from torch._dynamo.utils import counters
+    monkeypatch.setattr(cpu_backend, "CPU_COMPILE_BACKEND", "eager")  # dynamo tracing without codegen
+    pipe = tiny_ip_pipeline
+    enable_step_cache(pipe.unet)
+    assert enable_call_scale(pipe.unet) and call_scaled(pipe.unet)
+    expected = pipe(*ip_inputs(), steps=3)
+    torch._dynamo.reset()
+    counters.clear()
+
+    compile_unet(pipe.unet)
+    assert torch.allclose(pipe(*ip_inputs(), steps=3), expected, atol=1e-5)
+    graphs = counters["stats"]["unique_graphs"]
+    assert graphs >= 1
+    assert torch.allclose(pipe(*ip_inputs(), steps=3), expected, atol=1e-5)
+    assert counters["stats"]["unique_graphs"] == graphs  # the second call reuses the graphs
+
+    compile_unet(pipe.unet, ["step cache"])  # a blocker reverts it to eager
+    assert pipe.unet._compiled_call_impl is None
+    with step_caching(3, 0):
+        pipe(*ip_inputs(), steps=3)
+    assert counters["stats"]["unique_graphs"] == graphs
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Bake a local model snapshot for fast, offline worker cold starts
+
+Loads every component the configured generation profiles and modes need
+(SDXL VAE / text encoders / tokenizers, UNets, refiner, ControlNets, image
+encoders), exactly as the model registry would, and writes each one into
+--out in safetensors at --dtype. Scheduler configs and IP-Adapter weights
+(.bin converted to safetensors) are copied too, and manifest.json records
+every file's size and sha256. Components already baked at the same dtype
+are kept, so re-running after adding a profile only bakes what is new.
+
+Afterwards every component is loaded back from the snapshot (as the worker
+would with MODEL_SNAPSHOT_DIR=--out) and the load times are printed next to
+the hub load times, and stored in the manifest.
+
+Usage:
+    python tools/bake_models.py --out /workspace/model_snapshot
+    python tools/bake_models.py --out /workspace/model_snapshot --profiles default,fast --modes full,inpaint
+    python tools/bake_models.py --out /workspace/model_snapshot --verify
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # profiles from the DB need the real URL
+
+import torch  # noqa: E402
+from huggingface_hub import hf_hub_download  # noqa: E402
+from safetensors.torch import save_file  # noqa: E402
+
+from app.generation import cpu_backend, model_registry, snapshot  # noqa: E402
+from app.generation.model_registry import (  # noqa: E402
+    SDXL_BASE_MODEL, SDXL_REFINER_MODEL, ComponentSet, ModelRegistry, image_encoder_subfolder,
+)
+from app.generation.profiles import profile_catalog  # noqa: E402
+from app.generation.snapshot import ModelSnapshot, component_path  # noqa: E402
+
+DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16, "float32": torch.float32}
+
+
+class BakingRegistry(ModelRegistry):
+    """acquire() loads a component from the hub, writes it into the snapshot and drops it."""
+
+    def __init__(self, snap: ModelSnapshot, force: bool = False):
+        super().__init__()
+        self.snap = snap
+        self.force = force
+        self.seen = set()
+
+    def acquire(self, key, loader):
+        if key in self.seen or (key in self.snap.components and not self.force):
+            self.seen.add(key)
+            return None
+        self.seen.add(key)
+        t0 = time.time()
+        module = loader()
+        hub_seconds = time.time() - t0
+        out = self.snap.root / component_path(key)
+        shutil.rmtree(out, ignore_errors=True)
+        if isinstance(module, torch.nn.Module):
+            module.save_pretrained(out, safe_serialization=True)
+        else:
+            module.save_pretrained(out)  # tokenizers
+        self.snap.record(key, hub_load_seconds=round(hub_seconds, 2))
+        self.snap.save()  # an interrupted bake keeps what is done
+        print(f"  baked {key} ({self.snap.size_bytes(key) / 2**20:.0f} MB, hub load {hub_seconds:.1f}s)")
+        del module
+        gc.collect()
+        return None
+
+    def release(self, key):
+        pass
+
+
+class TimingRegistry(ModelRegistry):
+    """acquire() loads a component (from the snapshot) and records how long it took."""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = {}
+
+    def acquire(self, key, loader):
+        if key not in self.seconds:
+            t0 = time.time()
+            module = loader()
+            self.seconds[key] = time.time() - t0
+            del module
+            gc.collect()
+        return None
+
+    def release(self, key):
+        pass
+
+
+def acquire_components(components: ComponentSet, profiles, modes) -> None:
+    """Acquire every component the generators would load for these profiles and modes."""
+    components.sdxl_shared()
+    if "full" in modes:
+        components.unet(SDXL_BASE_MODEL)
+        if cpu_backend.CPU_FAST_MODEL:
+            components.unet(cpu_backend.CPU_FAST_MODEL)
+        for p in profiles:
+            if p.use_refiner:
+                components.unet(SDXL_REFINER_MODEL)
+            if p.controlnet_enabled:
+                components.controlnet(p.controlnet_model)
+            if p.uses_controlnet2:
+                components.controlnet(p.controlnet2_model)
+            if p.ip_adapter_enabled:
+                components.image_encoder(
+                    p.ip_adapter_repo, image_encoder_subfolder(p.ip_adapter_weight, p.ip_adapter_subfolder)
+                )
+    if "inpaint" in modes:
+        from app.generation import generator_inpaint as inpaint
+        components.unet(inpaint.INPAINT_MODEL)
+        if inpaint.IP_ADAPTER_ENABLED:
+            components.image_encoder(
+                inpaint.IP_ADAPTER_REPO, image_encoder_subfolder(inpaint.IP_ADAPTER_WEIGHT, inpaint.IP_ADAPTER_SUBFOLDER)
+            )
+
+
+def file_components(profiles, modes):
+    """(scheduler repos, IP-Adapter (repo, subfolder, weight_name)) for these profiles and modes."""
+    schedulers, adapters = [], []
+    if "full" in modes:
+        schedulers.append(SDXL_BASE_MODEL)
+        if cpu_backend.CPU_FAST_MODEL:
+            schedulers.append(cpu_backend.CPU_FAST_MODEL)
+        for p in profiles:
+            if p.use_refiner:
+                schedulers.append(SDXL_REFINER_MODEL)
+            if p.ip_adapter_enabled:
+                adapters.append((p.ip_adapter_repo, p.ip_adapter_subfolder, p.ip_adapter_weight))
+    if "inpaint" in modes:
+        from app.generation import generator_inpaint as inpaint
+        schedulers.append(inpaint.INPAINT_MODEL)
+        if inpaint.IP_ADAPTER_ENABLED:
+            adapters.append((inpaint.IP_ADAPTER_REPO, inpaint.IP_ADAPTER_SUBFOLDER, inpaint.IP_ADAPTER_WEIGHT))
+    return list(dict.fromkeys(schedulers)), list(dict.fromkeys(adapters))
+
+
+def fetch(repo: str, filename: str, subfolder: str) -> str:
+    """A repo file: repo may be a Hub id or a local directory (like from_pretrained)."""
+    local = Path(repo) / subfolder / filename
+    return str(local) if local.is_file() else hf_hub_download(repo, filename, subfolder=subfolder)
+
+
+def bake_scheduler(snap: ModelSnapshot, repo: str, force: bool) -> None:
+    key = f"scheduler:{repo}"
+    if key in snap.components and not force:
+        return
+    out = snap.root / component_path(key)
+    out.mkdir(parents=True, exist_ok=True)
+    shutil.copy(fetch(repo, "scheduler_config.json", "scheduler"), out / "scheduler_config.json")
+    snap.record(key)
+    print(f"  baked {key}")
+
+
+def bake_ip_adapter(snap: ModelSnapshot, repo: str, subfolder: str, weight_name: str, dtype, force: bool) -> None:
+    """IP-Adapter weights as safetensors (flat image_proj.* / ip_adapter.* keys, which load_ip_adapter reads)."""
+    key = f"ip_adapter:{repo}/{subfolder}/{weight_name}"
+    if key in snap.components and not force:
+        return
+    out = snap.root / component_path(key)
+    shutil.rmtree(out, ignore_errors=True)
+    out.mkdir(parents=True)
+    source = fetch(repo, weight_name, subfolder)
+    baked_name = Path(weight_name).stem + ".safetensors"
+    if weight_name.endswith(".safetensors"):
+        shutil.copy(source, out / baked_name)
+    else:
+        state = torch.load(source, map_location="cpu", weights_only=True)
+        flat = {
+            f"{group}.{name}": (t.to(dtype) if t.is_floating_point() else t).contiguous()
+            for group, tensors in state.items() for name, t in tensors.items()
+        }
+        save_file(flat, str(out / baked_name))
+    snap.record(key, weight_name=baked_name)
+    print(f"  baked {key} -> {baked_name}")
+
+
+def verify(root: str) -> int:
+    snap = ModelSnapshot.open(root)
+    if snap is None:
+        return 1
+    bad = 0
+    for key in sorted(snap.components):
+        problems = snap.check(key)
+        print(f"  {'ok ' if not problems else 'BAD'} {key}" + (f": {', '.join(problems)}" if problems else ""))
+        bad += bool(problems)
+    print(f"\n{len(snap.components) - bad}/{len(snap.components)} components verified")
+    return 1 if bad else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake the models the worker needs into a local snapshot")
+    parser.add_argument("--out", required=True, help="Snapshot directory (the worker's MODEL_SNAPSHOT_DIR)")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="float16")
+    parser.add_argument("--profiles", default=None, help="Comma-separated profile names (default: all known)")
+    parser.add_argument("--modes", default="full,inpaint", help="Generator modes to bake for")
+    parser.add_argument("--force", action="store_true", help="Re-bake components already in the snapshot")
+    parser.add_argument("--verify", action="store_true", help="Only check every file against its sha256")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(verify(args.out))
+
+    names = args.profiles.split(",") if args.profiles else profile_catalog.names()
+    profiles = [profile_catalog.get(name) for name in names]
+    modes = set(args.modes.split(","))
+    dtype = DTYPES[args.dtype]
+    print(f"Baking {args.dtype} snapshot into {args.out} (profiles {', '.join(names)}; modes {', '.join(sorted(modes))})")
+
+    # Load from the hub (not from a snapshot already configured), uncompiled, on CPU
+    # (and in the default memory layout: safetensors only stores contiguous tensors)
+    snapshot.model_snapshot = None
+    model_registry.TORCH_COMPILE = False
+    cpu_backend.CPU_CHANNELS_LAST = False
+    cpu_backend.CPU_COMPILE_BACKEND = ""
+    snap = ModelSnapshot.create(args.out, args.dtype)
+    t0 = time.time()
+    acquire_components(ComponentSet(BakingRegistry(snap, args.force), device_dtype=("cpu", dtype)), profiles, modes)
+    schedulers, adapters = file_components(profiles, modes)
+    for repo in schedulers:
+        bake_scheduler(snap, repo, args.force)
+    for repo, subfolder, weight_name in adapters:
+        bake_ip_adapter(snap, repo, subfolder, weight_name, dtype, args.force)
+    snap.save()
+    print(f"Baked in {time.time() - t0:.1f}s\n")
+
+    # Load everything back the way the worker will
+    snapshot.model_snapshot = ModelSnapshot.open(args.out)
+    timing = TimingRegistry()
+    acquire_components(ComponentSet(timing), profiles, modes)
+    print(f"\n{'component':<72}{'MB':>8}{'hub s':>9}{'snapshot s':>12}")
+    for key, seconds in timing.seconds.items():
+        entry = snap.components[key]
+        entry["snapshot_load_seconds"] = round(seconds, 2)
+        hub = entry.get("hub_load_seconds")
+        print(f"{key:<72}{snap.size_bytes(key) / 2**20:>8.0f}{hub if hub is not None else '-':>9}{seconds:>12.2f}")
+    snap.save()
+    print(f"\nSet MODEL_SNAPSHOT_DIR={args.out} on the worker.")
+
+
+if __name__ == "__main__":
+    main()
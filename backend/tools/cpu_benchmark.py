@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+CPU backend benchmark - full-mode render time per CPU setting
+
+Renders one cut with SdxlTurboGenerator on the CPU (CUDA hidden) once per
+variant, each in a fresh process so the CPU_* settings (read at import)
+apply: pipeline load, first render (includes any compilation) and the
+median of --runs further renders (s/step is that divided by the steps, so
+it includes prompt encoding and VAE decode). The first variant is the
+baseline for the speedup column; "compile" shows the backend actually used
+(eager when the requested one is not installed).
+
+Variants:
+    fp32        float32, default memory layout (the CPU path before cpu_backend)
+    fp32-cl     float32, channels-last
+    bf16-cl     bfloat16, channels-last (fast only with native bf16: AVX512-BF16 / AMX)
+    openvino    CPU_COMPILE_BACKEND=openvino (needs the openvino package)
+    fast        --fast-model (e.g. stabilityai/sdxl-turbo) for CPU_FAST_STEPS steps, bfloat16 if native
+
+Usage:
+    python tools/cpu_benchmark.py
+    python tools/cpu_benchmark.py --variants fp32,bf16-cl,fast --fast-model stabilityai/sdxl-turbo --steps 8 --runs 3
+    python tools/cpu_benchmark.py --threads 16 --max-side 768 --profile default
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+VARIANTS = {
+    "fp32": {"CPU_DTYPE": "float32", "CPU_CHANNELS_LAST": "0"},
+    "fp32-cl": {"CPU_DTYPE": "float32", "CPU_CHANNELS_LAST": "1"},
+    "bf16-cl": {"CPU_DTYPE": "bfloat16", "CPU_CHANNELS_LAST": "1"},
+    "openvino": {"CPU_COMPILE_BACKEND": "openvino"},
+    "fast": {},  # CPU_FAST_MODEL from --fast-model
+}
+
+
+def run_variant(name: str, args) -> dict:
+    env = {
+        **os.environ,
+        **VARIANTS[name],
+        "CUDA_VISIBLE_DEVICES": "",
+        "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite://"),
+        "CPU_MAX_SIDE": str(args.max_side),
+        "CPU_FAST_MODEL": args.fast_model if name == "fast" else "",
+    }
+    if args.threads:
+        env["CPU_THREADS"] = str(args.threads)
+    cmd = [sys.executable, __file__, "--child", "--profile", args.profile, "--steps", str(args.steps),
+           "--runs", str(args.runs)]
+    proc = subprocess.run(cmd, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["no output"]
+    return {"error": tail[0]}
+
+
+def child(args) -> None:
+    """One variant: load, first render, --runs timed renders; prints a RESULT line."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import torch
+    from app.generation import cpu_backend, model_registry
+    from app.generation.generator import SdxlTurboGenerator
+    from app.generation.model_registry import device_and_dtype
+    from app.generation.schemas import GenerationRequest
+
+    generator = SdxlTurboGenerator(storage=None)
+    profile = generator._profile(args.profile)
+    if not cpu_backend.fast_model_enabled():
+        profile = replace(profile, total_steps=args.steps)
+    request = GenerationRequest(family_id="bench", color_id="bench", seed=0, cuts=["recto"])
+
+    t0 = time.time()
+    generator._get_pipes(profile)
+    load = time.time() - t0
+
+    def render() -> float:
+        t = time.time()
+        for _ in generator._render(request, profile):
+            pass
+        return time.time() - t
+
+    first = render()
+    times = [render() for _ in range(args.runs)]
+    _, dtype = device_and_dtype()
+    median = statistics.median(times)
+    print("RESULT " + json.dumps({
+        "dtype": str(dtype).replace("torch.", ""),
+        "size": "x".join(map(str, cpu_backend.render_size(*generator.render_size))),
+        "steps": profile.total_steps,
+        "threads": torch.get_num_threads(),
+        "compile": cpu_backend.compile_backend() or ("inductor" if model_registry.TORCH_COMPILE else "eager"),
+        "load": load, "first": first, "median": median, "per_step": median / profile.total_steps,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", default="fp32,fp32-cl,bf16-cl,openvino,fast")
+    parser.add_argument("--fast-model", default=os.getenv("CPU_FAST_MODEL", ""),
+                        help="Distilled SDXL repo for the fast variant (skipped if empty)")
+    parser.add_argument("--profile", default="default")
+    parser.add_argument("--steps", type=int, default=8, help="Denoising steps (the fast variant uses CPU_FAST_STEPS)")
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=0, help="CPU_THREADS (0: torch default)")
+    parser.add_argument("--max-side", type=int, default=int(os.getenv("CPU_MAX_SIDE", "1024")))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    names = [n for n in args.variants.split(",") if n != "fast" or args.fast_model]
+    unknown = [n for n in names if n not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(unknown)}")
+
+    print(f"{'variant':<10}{'dtype':<10}{'compile':<10}{'size':<11}{'steps':>6}{'threads':>8}"
+          f"{'load s':>9}{'first s':>9}{'render s':>10}{'s/step':>8}{'speedup':>9}")
+    baseline = None
+    for name in names:
+        r = run_variant(name, args)
+        if "error" in r:
+            print(f"{name:<10}failed: {r['error']}")
+            continue
+        baseline = baseline or r["median"]
+        print(f"{name:<10}{r['dtype']:<10}{r['compile']:<10}{r['size']:<11}{r['steps']:>6}{r['threads']:>8}"
+              f"{r['load']:>9.1f}{r['first']:>9.1f}{r['median']:>10.2f}{r['per_step']:>8.2f}"
+              f"{baseline / r['median']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
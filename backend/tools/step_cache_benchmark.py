@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Step cache benchmark - render time against drift from the uncached render
+
+Renders the same cut with the same seed with SdxlTurboGenerator once
+without the step cache and once per --configs entry (interval:depth), and
+reports each one's median render time (--runs renders after a first one),
+speedup and how far the image drifted from the uncached one:
+
+    ssim    structural similarity of the luminance (Gaussian window, 1 = identical)
+    gmsd    gradient magnitude similarity deviation, a cheap perceptual
+            proxy that tracks LPIPS on blur / lost texture (0 = identical;
+            LPIPS itself needs network weights this tool does not download)
+
+The cached images are written next to the baseline in --out for a look.
+
+Usage:
+    python tools/step_cache_benchmark.py
+    python tools/step_cache_benchmark.py --profile studio --configs 2:0,3:0,3:1,5:1 --runs 2 --out /tmp/step_cache
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def luminance(image) -> np.ndarray:
+    return np.asarray(image.convert("L"), dtype=np.float64)
+
+
+def _blur(x: np.ndarray, sigma: float = 1.5, radius: int = 5) -> np.ndarray:
+    """Separable Gaussian filter, 'valid' region only."""
+    t = np.arange(-radius, radius + 1)
+    k = np.exp(-(t ** 2) / (2 * sigma ** 2))
+    k /= k.sum()
+    x = np.apply_along_axis(lambda r: np.convolve(r, k, mode="valid"), 1, x)
+    return np.apply_along_axis(lambda c: np.convolve(c, k, mode="valid"), 0, x)
+
+
+def ssim(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean SSIM of two 0..255 grayscale images (Wang et al. 2004 constants)."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = _blur(a), _blur(b)
+    var_a = _blur(a * a) - mu_a ** 2
+    var_b = _blur(b * b) - mu_b ** 2
+    cov = _blur(a * b) - mu_a * mu_b
+    s = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(s.mean())
+
+
+def _gradient_magnitude(x: np.ndarray) -> np.ndarray:
+    gx = (x[1:-1, 2:] - x[1:-1, :-2] + x[:-2, 2:] - x[:-2, :-2] + x[2:, 2:] - x[2:, :-2]) / 3
+    gy = (x[2:, 1:-1] - x[:-2, 1:-1] + x[2:, 2:] - x[:-2, 2:] + x[2:, :-2] - x[:-2, :-2]) / 3
+    return np.sqrt(gx ** 2 + gy ** 2)
+
+
+def gmsd(a: np.ndarray, b: np.ndarray, c: float = 170.0) -> float:
+    """GMSD (Xue et al. 2014): Prewitt gradients at half resolution, std of their similarity map."""
+    def half(x):
+        h, w = x.shape[0] // 2 * 2, x.shape[1] // 2 * 2
+        return x[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+    ga, gb = _gradient_magnitude(half(a)), _gradient_magnitude(half(b))
+    return float(((2 * ga * gb + c) / (ga ** 2 + gb ** 2 + c)).std())
+
+
+def parse_configs(spec: str):
+    configs = []
+    for part in spec.split(","):
+        interval, _, depth = part.strip().partition(":")
+        configs.append((int(interval), int(depth or 0)))
+    return configs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="default")
+    parser.add_argument("--configs", default="2:0,3:0,3:1,5:1", help="interval:depth entries")
+    parser.add_argument("--steps", type=int, default=0, help="Override the profile's total_steps (0: keep)")
+    parser.add_argument("--cut", default="recto")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--out", default="", help="Directory for the rendered images (empty: not written)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.generation.generator import SdxlTurboGenerator
+    from app.generation.schemas import GenerationRequest
+
+    generator = SdxlTurboGenerator(storage=None)
+    profile = generator._profile(args.profile)
+    if args.steps:
+        profile = replace(profile, total_steps=args.steps)
+    request = GenerationRequest(family_id="bench", color_id="bench", seed=args.seed, cuts=[args.cut])
+    generator._get_pipes(profile)
+    out = Path(args.out) if args.out else None
+    if out:
+        out.mkdir(parents=True, exist_ok=True)
+
+    def render(interval: int, depth: int):
+        p = replace(profile, step_cache_interval=interval, step_cache_depth=depth)
+        image, times = None, []
+        for i in range(args.runs + 1):
+            t = time.time()
+            image = [cut.image for cut in generator._render(request, p)][0]
+            if i:  # the first render warms caches / allocators
+                times.append(time.time() - t)
+        if out:
+            image.save(out / f"{args.cut}_{interval}-{depth}.png")
+        return luminance(image), statistics.median(times)
+
+    reference, baseline = render(0, 0)
+    print(f"profile {profile.name}: {profile.total_steps} steps, refiner {'on' if profile.use_refiner else 'off'}")
+    print(f"{'interval':>8}{'depth':>6}{'render s':>10}{'speedup':>9}{'ssim':>8}{'gmsd':>8}")
+    print(f"{'off':>8}{'-':>6}{baseline:>10.2f}{1.0:>8.2f}x{1.0:>8.3f}{0.0:>8.4f}")
+    for interval, depth in parse_configs(args.configs):
+        image, median = render(interval, depth)
+        print(f"{interval:>8}{depth:>6}{median:>10.2f}{baseline / median:>8.2f}x"
+              f"{ssim(reference, image):>8.3f}{gmsd(reference, image):>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
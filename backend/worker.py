@@ -1,40 +1,52 @@
 """
 Background worker for processing generation jobs.
 
-This script polls the database for pending jobs, runs SDXL generation,
+This script claims pending jobs from the job queue, runs SDXL generation,
 and updates job status. Designed to run on RunPod GPU instances.
 
 Usage:
     python worker.py
 """
+import asyncio
 import time
 import sys
-from datetime import datetime
+import signal
+import socket
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
 import os
 
-from app.generation.models import GenerationJob
-from app.generation.schemas import GenerationRequest
-from app.generation.generator import SdxlTurboGenerator
-from app.generation.generator_inpaint import InpaintGenerator
-from app.generation.generator_mock import MockGenerator
+from app.generation.schemas import GenerationRequest, ImageResult
+from app.generation.generator_mock import GenerationInterrupted
+from app.generation.generator_registry import GENERATORS, create_generator, resolve_mode
 from app.generation.storage import LocalStorage, R2Storage, Storage
+from app.generation.pipeline import JobTicket, StagedPipeline
+from app.generation.postprocess import public_url
+from app.generation.spool import SpoolEntry, UploadSpool
+from app.generation.queue import JOB_QUEUE_BACKEND, JobRecord, WorkerCapabilities, create_queue
+from app.generation.queue.routing import swatch_key
 from app.core.config import settings
 
 # Load environment variables
 load_dotenv()
 
-# Initialize database with connection resilience for long-running jobs
+# Initialize the job queue; SQL backends get a connection pool that survives long-running jobs
 SQLALCHEMY_DATABASE_URL = settings.database_url
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    future=True,
-    pool_pre_ping=True,  # Test connections before use (handles Neon timeouts)
-    pool_recycle=300,    # Recycle connections after 5 minutes
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+engine = None
+if JOB_QUEUE_BACKEND != "memory":
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        future=True,
+        pool_pre_ping=True,  # Test connections before use (handles Neon timeouts)
+        pool_recycle=300,    # Recycle connections after 5 minutes
+    )
+queue = create_queue(engine)
+print(f"✅ [Worker] Using {type(queue).__name__}.")
 
 # Initialize storage backend
 storage: Storage
@@ -46,69 +58,436 @@ else:
     print("✅ [Worker] Using LocalStorage backend.")
 
 # Initialize generator based on GENERATOR_MODE
-# Options: "mock", "full" (default), "inpaint"
+# Options: "mock", "full" (default), "inpaint", "multi" (both, per job, shared components)
+# Only the selected backend is imported: a mock worker never loads torch/diffusers.
 USE_MOCK = os.getenv("USE_MOCK_GENERATOR", "false").lower() == "true"
 GENERATOR_MODE = os.getenv("GENERATOR_MODE", "full").lower()
 
-if USE_MOCK:
-    generator = MockGenerator(storage)
-    generator_name = "Mock"
-elif GENERATOR_MODE == "inpaint":
-    generator = InpaintGenerator(storage)
-    generator_name = "SDXL Inpaint"
-else:
-    generator = SdxlTurboGenerator(storage)
-    generator_name = "SDXL Full Generation"
+_backend = "mock" if USE_MOCK else resolve_mode(GENERATOR_MODE)
+generator = create_generator(_backend, storage)
+generator_name = GENERATORS[_backend].label
 
 print(f"✅ [Worker] Using {generator_name} generator (mode={GENERATOR_MODE}).")
 
+# Automatic retries: a job is claimed at most JOB_MAX_ATTEMPTS times when it
+# keeps failing with transient errors (storage/network hiccups, CUDA OOM).
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+TRANSIENT_ERROR_MARKERS = ("out of memory", "timed out", "timeout", "connection", "throttl", "slowdown", "503")
+
+# Leases: a claimed job belongs to this worker until lease_expires_at. The
+# heartbeat thread keeps renewing it; if the worker dies, any worker's reaper
+# returns the job to the queue once the lease has expired.
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("HEARTBEAT_INTERVAL_SECONDS", "20"))
+
+# Graceful shutdown (SIGTERM/SIGINT): stop claiming, let the current cut finish
+# for up to WORKER_DRAIN_GRACE_SECONDS, then give uploads WORKER_FLUSH_TIMEOUT_SECONDS.
+# Keep the sum below the platform's kill timeout.
+WORKER_DRAIN_GRACE_SECONDS = float(os.getenv("WORKER_DRAIN_GRACE_SECONDS", "20"))
+WORKER_FLUSH_TIMEOUT_SECONDS = float(os.getenv("WORKER_FLUSH_TIMEOUT_SECONDS", "20"))
+
+# Runtime: "sync" renders one claimed job at a time; "async" runs an event loop
+# that claims and prepares up to WORKER_PREFETCH jobs (queue calls, spooled
+# uploads, swatch downloads) while the inference threads render, as many jobs
+# at once as the generator has pipeline replicas (PIPELINE_REPLICAS).
+WORKER_RUNTIME = os.getenv("WORKER_RUNTIME", "sync").lower()
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", "2"))
+SWATCH_CACHE_DIR = os.getenv("SWATCH_CACHE_DIR", "swatch_cache")
+SWATCH_CACHE_MAX_FILES = int(os.getenv("SWATCH_CACHE_MAX_FILES", "256"))
+# Most recently used cached swatches advertised as warm to the job router
+WORKER_WARM_SWATCHES = int(os.getenv("WORKER_WARM_SWATCHES", "32"))
+
+# Warm-up: before the first claim the generator loads its pipelines and runs
+# a short render of every cut (WARMUP_PROFILES / WARMUP_STEPS), with
+# TORCH_COMPILE=1 compiling the UNets. Meanwhile the worker is "warming" in
+# the registry; WORKER_READY_FILE, if set, is written once it is ready (for
+# platform health checks) and removed on shutdown.
+WORKER_WARMUP = os.getenv("WORKER_WARMUP", "1") == "1"
+WORKER_READY_FILE = os.getenv("WORKER_READY_FILE", "")
+
+
+def _lease_lost(job_id: str, dropped: str) -> None:
+    """A write found the job no longer held by this worker (lease expired and reclaimed)."""
+    print(f"⚠️  [Job {job_id}] Lease lost (job reclaimed); dropping {dropped}")
+
+
+def record_image(ticket: JobTicket, image: ImageResult) -> None:
+    """Persist a finished cut right away so GET /jobs/{id} can show it."""
+    label = f"{image.color_id}/{image.cut}" if image.color_id else image.cut
+    job = queue.add_result(ticket.job_id, image, worker_id=WORKER_ID)
+    if job is None:
+        _lease_lost(ticket.job_id, f"the {label} result")
+        return
+    print(f"📸 [Job {job.job_id}] {label} ready ({len(job.results)}/{job.image_count})")
+
+
+def complete_job(ticket: JobTicket) -> None:
+    """All cuts rendered and uploaded."""
+    job = queue.complete(ticket.job_id, worker_id=WORKER_ID)
+    if job is None:
+        _lease_lost(ticket.job_id, "the completion")
+        return
+    queue.bump_worker(WORKER_ID, jobs_completed=1, images_generated=len(ticket.images),
+                      busy_seconds=time.time() - ticket.started)
+    duration = (job.completed_at - job.started_at).total_seconds()
+    print(f"✅ [Job {job.job_id}] Completed in {duration:.2f}s. Generated {len(job.results)} images.")
+
+
+def _is_transient(error: Exception) -> bool:
+    """Errors worth an automatic retry: storage/network hiccups and GPU OOM."""
+    if isinstance(error, FileNotFoundError):
+        return False  # missing assets/config won't fix themselves
+    if isinstance(error, (ConnectionError, TimeoutError, OSError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
 
-def process_job(db: Session, job: GenerationJob) -> None:
-    """Process a single generation job."""
 
-    print(f"🔄 [Job {job.job_id}] Starting processing...")
+def fail_job(ticket: JobTicket, error: Exception) -> None:
+    """
+    Inference, encode or upload failed for this job.
 
-    # Update status to processing
-    job.status = "processing"
-    job.started_at = datetime.utcnow()
-    job.updated_at = datetime.utcnow()
-    db.commit()
+    Finished cuts are already stored on the job, so a transient failure just
+    re-queues it (up to JOB_MAX_ATTEMPTS claims) and the retry renders only
+    the missing cuts.
+    """
+    busy_seconds = time.time() - ticket.started
+    if isinstance(error, GenerationInterrupted):
+        # Shutdown checkpoint, not a failure: doesn't use up an attempt
+        job = queue.release(ticket.job_id, worker_id=WORKER_ID)
+        if job is None:
+            _lease_lost(ticket.job_id, "the checkpoint")
+            return
+        queue.bump_worker(WORKER_ID, busy_seconds=busy_seconds)
+        print(f"⏸️  [Job {ticket.job_id}] Checkpointed {len(job.results or [])}/{job.image_count} images and re-queued: {error}")
+        return
 
+    job = queue.get(ticket.job_id)
+    if job is None:
+        return
+    requeue = _is_transient(error) and job.attempts < JOB_MAX_ATTEMPTS
+    if queue.fail(ticket.job_id, str(error), requeue=requeue, worker_id=WORKER_ID) is None:
+        _lease_lost(ticket.job_id, f"the failure ({error})")
+        return
+    queue.bump_worker(WORKER_ID, jobs_failed=1, busy_seconds=busy_seconds)
+    if requeue:
+        print(f"🔁 [Job {ticket.job_id}] Transient failure (attempt {job.attempts}/{JOB_MAX_ATTEMPTS}), re-queued: {error}")
+        return
+
+    print(f"❌ [Job {ticket.job_id}] Failed: {error}")
+
+
+def _upload_spooled(entry: SpoolEntry, worker_id: str | None = None) -> JobRecord | None:
+    """
+    Upload one spooled cut, store its result and drop it from the spool.
+    With worker_id, the result is only stored while that worker holds the job.
+    """
     try:
-        # Create generation request
-        request = GenerationRequest(
-            family_id=job.family_id,
-            color_id=job.color_id,
-            cuts=job.cuts,
-            seed=job.seed,
-            swatch_url=job.swatch_url,
-        )
-
-        # Run SDXL generation
-        response = generator.generate(request)
-
-        # Extract URLs from response
-        result_urls = [img.url for img in response.images]
-
-        # Update job with results
-        job.status = "completed"
-        job.result_urls = result_urls
-        job.completed_at = datetime.utcnow()
-        job.updated_at = datetime.utcnow()
-        db.commit()
-
-        duration = (job.completed_at - job.started_at).total_seconds()
-        print(f"✅ [Job {job.job_id}] Completed in {duration:.2f}s. Generated {len(result_urls)} images.")
+        saved_url = spool.upload(entry, storage)
+    except Exception as e:
+        print(f"❌ [Worker] Spooled {entry.key} still not uploadable: {e}")
+        return None
+    url = public_url(saved_url) if entry.rewrite_public_url else saved_url
+    job = queue.add_result(entry.job_id, ImageResult(url=url, **entry.result_fields), worker_id=worker_id)
+    if job is None and worker_id is not None:
+        _lease_lost(entry.job_id, f"spooled {entry.name}")
+    spool.remove(entry)
+    return job
+
+
+def finalize_spool() -> None:
+    """Upload images left in the spool by a previous run and finalize their jobs."""
+    entries = spool.entries()
+    if not entries:
+        return
+
+    print(f"📦 [Worker] Finalizing {len(entries)} spooled image(s) from a previous run...")
+    for entry in entries:
+        if queue.get(entry.job_id) is None:
+            print(f"⚠️  [Worker] Job {entry.job_id} no longer exists; dropping spooled {entry.name}")
+            spool.remove(entry)
+            continue
+        job = _upload_spooled(entry)
+        # All requested cuts present → the job is done, whatever its status was
+        if job is not None and not job.missing_cuts and job.status != "completed":
+            queue.complete(job.job_id)
+            print(f"✅ [Job {job.job_id}] Completed from spool.")
+
+
+# Finished images are spooled to local disk before upload, so a storage
+# outage never forces re-running inference.
+spool = UploadSpool()
+
+# Encode/watermark and upload run in background stages so the GPU can start
+# the next cut (or job) while the previous image is being finished.
+pipeline = StagedPipeline(
+    storage,
+    generator.watermark_path,
+    on_image=record_image,
+    on_complete=complete_job,
+    on_error=fail_job,
+    rewrite_public_url=generator.rewrite_public_url,
+    spool=spool,
+)
+
+
+# --- Leases, heartbeats and worker registry --------------------------------
+
+def _set_worker_state(status: str, current_job_id: str | None = None) -> None:
+    queue.set_worker_state(WORKER_ID, status, current_job_id)
+
+
+def capabilities() -> WorkerCapabilities:
+    """What this worker can run and which caches it has warm (see queue/routing.py)."""
+    cache = Path(SWATCH_CACHE_DIR)
+    cached = [p for p in cache.iterdir() if not p.suffix] if cache.is_dir() else []
+    recent = sorted(cached, key=lambda p: p.stat().st_mtime, reverse=True)[:WORKER_WARM_SWATCHES]
+    return WorkerCapabilities(
+        modes=list(generator.modes),
+        profiles=generator.profile_names(),
+        max_resolution=generator.max_resolution,
+        loras=generator.loaded_loras(),
+        warm_swatches=[p.name for p in recent],
+    )
+
+
+def register_worker() -> None:
+    """Create (or reset) this worker's registry entry."""
+    caps = capabilities()
+    queue.register_worker(WORKER_ID, socket.gethostname(), caps)
+    print(f"🪪 [Worker] Registered as {WORKER_ID} (lease {JOB_LEASE_SECONDS}s, heartbeat {HEARTBEAT_INTERVAL_SECONDS}s, "
+          f"modes {caps.modes}, {len(caps.warm_swatches)} warm swatches)")
+
+
+def advertise_capabilities() -> None:
+    """Refresh the advertised warm caches after a job loaded new ones."""
+    queue.set_worker_capabilities(WORKER_ID, capabilities())
+
+
+def warm_up() -> None:
+    """Get the generator ready before the first claim, so no job lands on a cold worker."""
+    if WORKER_READY_FILE:
+        Path(WORKER_READY_FILE).unlink(missing_ok=True)  # left over from a previous run
+    if WORKER_WARMUP:
+        _set_worker_state("warming")
+        print("🔥 [Worker] Warming up...")
+        t0 = time.time()
+        generator.warm_up()
+        advertise_capabilities()
+        print(f"🔥 [Worker] Warm in {time.time() - t0:.1f}s")
+    _set_worker_state("idle")
+    if WORKER_READY_FILE:
+        Path(WORKER_READY_FILE).write_text(f"{WORKER_ID}\n")
+    print("✅ [Worker] Ready")
+
+
+def claim_job() -> JobRecord | None:
+    """Lease the next job this worker can run, preferring ones it has warm caches for."""
+    return queue.claim(WORKER_ID, JOB_LEASE_SECONDS, capabilities())
+
+
+def heartbeat() -> None:
+    """Renew the leases of every job this worker holds and mark it alive."""
+    queue.heartbeat(WORKER_ID, JOB_LEASE_SECONDS)
+
+
+class HeartbeatThread(threading.Thread):
+    """Calls heartbeat() every HEARTBEAT_INTERVAL_SECONDS, also during long inference."""
+
+    def __init__(self, interval: int = HEARTBEAT_INTERVAL_SECONDS):
+        super().__init__(name="heartbeat", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                heartbeat()
+            except Exception as e:
+                print(f"⚠️  [Worker] Heartbeat failed: {e}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def release_held_jobs() -> int:
+    """Re-queue every job still leased to this worker (shutdown path); returns how many."""
+    released = queue.release_worker(WORKER_ID)
+    for job in released:
+        print(f"⏸️  [Job {job.job_id}] Released on shutdown ({len(job.results or [])}/{job.image_count} images kept)")
+    return len(released)
+
+
+class Shutdown:
+    """
+    Set by the first SIGTERM/SIGINT: the loop stops claiming and the current
+    job drains. A second signal raises KeyboardInterrupt for a hard stop.
+    """
+
+    def __init__(self, grace_seconds: float = WORKER_DRAIN_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self.event = threading.Event()
+        self.deadline: float | None = None
+
+    @property
+    def requested(self) -> bool:
+        return self.event.is_set()
+
+    def request(self, reason: str = "shutdown") -> None:
+        if self.requested:
+            return
+        self.deadline = time.monotonic() + self.grace_seconds
+        self.event.set()
+        print(f"\n⚠️  [Worker] {reason}: no new jobs; draining (grace {self.grace_seconds:.0f}s)...")
+
+    def grace_expired(self) -> bool:
+        """StopCheck for render(): abort mid-cut only once the grace period is over."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def handle_signal(self, signum, frame) -> None:
+        if self.requested:
+            raise KeyboardInterrupt
+        self.request(f"Received {signal.Signals(signum).name}")
 
+    def install(self) -> None:
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+
+shutdown = Shutdown()
+
+
+def reclaim_expired_leases() -> None:
+    """
+    Return jobs whose worker stopped heartbeating to the queue, or fail them
+    once they have used up JOB_MAX_ATTEMPTS claims.
+    """
+    for job in queue.reclaim_expired_leases(JOB_MAX_ATTEMPTS, JOB_LEASE_SECONDS):
+        if job.status == "failed":
+            print(f"❌ [Job {job.job_id}] {job.error_message}; attempt cap reached, failed.")
+        else:
+            print(f"♻️  [Job {job.job_id}] Lease expired; returned to the queue.")
+
+
+def expire_stale_jobs() -> None:
+    """Mark pending jobs past their expires_at as "expired" (nobody is polling them anymore)."""
+    expired = queue.expire_stale()
+    if expired:
+        print(f"⌛ [Worker] Expired {expired} stale pending job(s).")
+
+
+def prefetch_swatch(url: str | None) -> str | None:
+    """
+    Download an http(s) swatch into SWATCH_CACHE_DIR and return the local path
+    (generators accept paths). Anything else, or a failed download, is
+    returned unchanged and the generator fetches it itself.
+    """
+    if not url or urlparse(url).scheme not in ("http", "https"):
+        return url
+    cache = Path(SWATCH_CACHE_DIR)
+    path = cache / swatch_key(url)  # the key workers advertise as a warm swatch
+    if path.exists():
+        path.touch()  # keep recently used swatches when pruning
+        return str(path)
+
+    try:
+        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 (HFVirtualStylist/1.0)"})
+        with urllib.request.urlopen(req, timeout=15) as r:
+            data = r.read()
     except Exception as e:
-        # Mark job as failed
-        job.status = "failed"
-        job.error_message = str(e)
-        job.completed_at = datetime.utcnow()
-        job.updated_at = datetime.utcnow()
-        db.commit()
+        print(f"⚠️  [Worker] Swatch prefetch failed, the generator will retry: {e}")
+        return url
+
+    cache.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    for old in sorted(cache.iterdir(), key=lambda p: p.stat().st_mtime)[:-SWATCH_CACHE_MAX_FILES]:
+        old.unlink(missing_ok=True)
+    return str(path)
+
+
+def _fail_unstarted(job: JobRecord, error: Exception) -> None:
+    """A job failed before inference started: same retry rules as a render failure."""
+    fail_job(pipeline.start_job(job.job_id, job.to_request()), error)
+
 
-        print(f"❌ [Job {job.job_id}] Failed: {e}")
+def prepare_job(job: JobRecord) -> GenerationRequest | None:
+    """
+    I/O before inference: upload cuts left in the spool by an earlier attempt
+    and prefetch the swatch. Returns the request for the missing cuts, or
+    None if nothing is left to render.
+    """
+    print(f"🔄 [Job {job.job_id}] Starting processing (attempt {job.attempts})...")
+
+    # Cuts rendered by a previous attempt but not uploaded yet
+    for entry in spool.entries(job.job_id):
+        job = _upload_spooled(entry, WORKER_ID) or job
+
+    missing = job.missing_cuts
+    if not missing:
+        if queue.complete(job.job_id, worker_id=WORKER_ID) is None:
+            _lease_lost(job.job_id, "the completion")
+            return None
+        print(f"✅ [Job {job.job_id}] All cuts already done; completed without rendering.")
+        return None
+    # A batch job re-renders the colors with a cut missing, for the cuts missing in any of them
+    colors = job.missing_colors if job.colors else None
+    if len(missing) < len(job.cuts) or (colors is not None and len(colors) < len(job.colors)):
+        print(f"♻️  [Job {job.job_id}] Resuming: rendering only {missing}"
+              + (f" in {[c['color_id'] for c in colors]}" if colors is not None else ""))
+
+    request = job.to_request(missing, colors)
+    colors = [c.model_copy(update={"swatch_url": prefetch_swatch(c.swatch_url)}) for c in request.colors]
+    return request.model_copy(update={
+        "swatch_url": colors[0].swatch_url if colors else prefetch_swatch(request.swatch_url),
+        "colors": colors,
+    })
+
+
+def render_job(job_id: str, request: GenerationRequest) -> None:
+    """Inference for a prepared job; post-processing continues in the pipeline."""
+    _set_worker_state("busy", job_id)
+    ticket = pipeline.start_job(job_id, request)
+
+    try:
+        # Run SDXL inference; each cut is handed off as soon as it is rendered.
+        # On shutdown the current cut may finish within the grace period, but
+        # no further cut starts; the rest resumes on another worker.
+        # A batch job's colors are rendered together, one batched call per cut.
+        rendered_cuts = 0
+        render = generator.render_colors if request.colors else generator.render
+        for rendered in render(request, should_stop=shutdown.grace_expired):
+            pipeline.submit(ticket, rendered)
+            rendered_cuts += 1
+            if shutdown.requested and rendered_cuts < request.image_count:
+                raise GenerationInterrupted(f"worker shutting down after {rendered.cut}")
+        pipeline.finish_job(ticket)
+    except Exception as e:
+        pipeline.abort_job(ticket, e)
+
+    try:
+        advertise_capabilities()
+    except Exception as e:
+        print(f"⚠️  [Worker] Could not advertise capabilities: {e}")
+
+
+def process_job(job: JobRecord) -> None:
+    """
+    Run inference for the job's missing cuts; post-processing continues in the pipeline.
+
+    Cuts finished by an earlier attempt (stored results or images still in
+    the spool) are never rendered again. The base seed was pinned at claim
+    time, so a retry derives the same per-cut seeds.
+    """
+    try:
+        request = prepare_job(job)
+    except Exception as e:
+        _fail_unstarted(job, e)
+        return
+    if request is not None:
+        render_job(job.job_id, request)
 
 
 def worker_loop(poll_interval: int = 5) -> None:
@@ -116,32 +495,168 @@ def worker_loop(poll_interval: int = 5) -> None:
 
     print(f"🚀 [Worker] Starting worker loop (polling every {poll_interval}s)...")
 
-    while True:
-        db = SessionLocal()
+    register_worker()
+    shutdown.install()
+    heartbeat_thread = HeartbeatThread()
+    heartbeat_thread.start()
+    warm_up()
+
+    forced = False
+    while not shutdown.requested:
         try:
-            # Query for pending jobs (oldest first)
-            pending_jobs = db.query(GenerationJob)\
-                .filter(GenerationJob.status == "pending")\
-                .order_by(GenerationJob.created_at)\
-                .limit(1)\
-                .all()
-
-            if pending_jobs:
-                for job in pending_jobs:
-                    process_job(db, job)
+            # Jobs orphaned by crashed workers go back to the queue first,
+            # then jobs nobody is waiting for anymore are dropped
+            reclaim_expired_leases()
+            expire_stale_jobs()
+
+            job = claim_job()
+            if job is not None:
+                process_job(job)
             else:
-                # No jobs, wait before next poll
-                time.sleep(poll_interval)
+                # No jobs, wait before next poll (a shutdown signal ends the wait)
+                _set_worker_state("idle")
+                shutdown.event.wait(poll_interval)
 
         except KeyboardInterrupt:
-            print("\n⚠️  [Worker] Received interrupt signal. Shutting down...")
-            db.close()
-            sys.exit(0)
+            print("\n⚠️  [Worker] Second interrupt. Stopping without waiting for uploads...")
+            forced = True
+            break
         except Exception as e:
             print(f"❌ [Worker] Error in worker loop: {e}")
-            time.sleep(poll_interval)
-        finally:
-            db.close()
+            shutdown.event.wait(poll_interval)
+
+    stop_worker(heartbeat_thread, forced)
+
+
+async def async_worker_loop(
+    poll_interval: float = 5, prefetch: int = WORKER_PREFETCH, concurrency: int | None = None
+) -> None:
+    """
+    Asyncio runtime: queue calls and downloads run in threads driven by the
+    event loop, so up to `prefetch` jobs are claimed and prepared while the
+    inference threads render. Up to `concurrency` jobs (default
+    generator.concurrency(), its pipeline replicas) render at once. Returns on
+    shutdown once the running renders have stopped; jobs claimed but not
+    rendered are released by stop_worker.
+    """
+    loop = asyncio.get_running_loop()
+    concurrency = concurrency or generator.concurrency()
+    inference = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="inference")
+    # Jobs claimed and not yet rendered, including the running ones
+    slots = asyncio.Semaphore(prefetch + concurrency - 1)
+    renders = asyncio.Semaphore(concurrency)
+    ready: asyncio.Queue = asyncio.Queue()
+    preparing: set[asyncio.Task] = set()
+    rendering: set[asyncio.Future] = set()
+    held = 0
+
+    def release_slot() -> None:
+        nonlocal held
+        held -= 1
+        slots.release()
+
+    async def prepare(job: JobRecord) -> None:
+        try:
+            request = await asyncio.to_thread(prepare_job, job)
+        except Exception as e:
+            await asyncio.to_thread(_fail_unstarted, job, e)
+            request = None
+        if request is None:
+            release_slot()
+            return
+        await ready.put((job.job_id, request))
+
+    async def claim_loop() -> None:
+        nonlocal held
+        while True:
+            await slots.acquire()
+            held += 1
+            try:
+                # Jobs orphaned by crashed workers go back to the queue first,
+                # then jobs nobody is waiting for anymore are dropped
+                await asyncio.to_thread(reclaim_expired_leases)
+                await asyncio.to_thread(expire_stale_jobs)
+                job = await asyncio.to_thread(claim_job)
+            except Exception as e:
+                print(f"❌ [Worker] Error in claim loop: {e}")
+                job = None
+            if job is not None:
+                task = asyncio.create_task(prepare(job))
+                preparing.add(task)
+                task.add_done_callback(preparing.discard)
+                continue
+            release_slot()
+            if held == 0:
+                await asyncio.to_thread(_set_worker_state, "idle")
+            await asyncio.to_thread(shutdown.event.wait, poll_interval)
+
+    def render_done(future: asyncio.Future) -> None:
+        rendering.discard(future)
+        renders.release()
+        release_slot()
+
+    async def inference_loop() -> None:
+        while True:
+            await renders.acquire()
+            try:
+                job_id, request = await ready.get()
+            except asyncio.CancelledError:
+                renders.release()
+                raise
+            future = loop.run_in_executor(inference, render_job, job_id, request)
+            rendering.add(future)
+            future.add_done_callback(render_done)
+
+    tasks = [asyncio.create_task(claim_loop()), asyncio.create_task(inference_loop())]
+    await asyncio.to_thread(shutdown.event.wait)
+
+    current = list(rendering)
+    for task in [*tasks, *preparing]:
+        task.cancel()
+    await asyncio.gather(*tasks, *preparing, return_exceptions=True)
+    # The running renders honour the drain grace period; let them stop
+    await asyncio.gather(*current, return_exceptions=True)
+    inference.shutdown(wait=False)
+
+
+def run_async_worker(poll_interval: int = 5) -> None:
+    """WORKER_RUNTIME=async entry point."""
+
+    print(f"🚀 [Worker] Starting asyncio runtime (prefetch {WORKER_PREFETCH}, "
+          f"{generator.concurrency()} concurrent render(s), polling every {poll_interval}s)...")
+
+    register_worker()
+    shutdown.install()
+    heartbeat_thread = HeartbeatThread()
+    heartbeat_thread.start()
+    warm_up()
+
+    forced = False
+    try:
+        asyncio.run(async_worker_loop(poll_interval))
+    except KeyboardInterrupt:
+        print("\n⚠️  [Worker] Second interrupt. Stopping without waiting for uploads...")
+        forced = True
+
+    stop_worker(heartbeat_thread, forced)
+
+
+def stop_worker(heartbeat_thread: HeartbeatThread, forced: bool = False) -> None:
+    """Flush in-flight uploads, hand unfinished jobs back to the queue and exit."""
+    # Heartbeats keep renewing the lease while uploads drain
+    drained = pipeline.close(timeout=0 if forced else WORKER_FLUSH_TIMEOUT_SECONDS)
+    if not drained:
+        print(f"⚠️  [Worker] Uploads still in flight; their images stay in {spool.root} for the next start")
+    released = release_held_jobs()
+    heartbeat_thread.stop()
+    if WORKER_READY_FILE:
+        Path(WORKER_READY_FILE).unlink(missing_ok=True)
+    _set_worker_state("stopped")
+    print(f"👋 [Worker] Stopped ({released} job(s) re-queued).")
+    if forced or not drained:
+        # Abandoned upload/inference threads would otherwise block interpreter exit
+        os._exit(1)
+    sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -149,9 +664,16 @@ if __name__ == "__main__":
     print("🎨 HF Virtual Stylist - Generation Worker")
     print("="*60)
     print(f"Database: {SQLALCHEMY_DATABASE_URL[:50]}...")
+    print(f"Queue: {type(queue).__name__}")
     print(f"Storage: {settings.storage_backend}")
     print(f"Generator: {generator_name}")
     print(f"Mode: {GENERATOR_MODE}")
+    print(f"Worker ID: {WORKER_ID}")
+    print(f"Runtime: {WORKER_RUNTIME}")
     print("="*60)
 
-    worker_loop()
+    finalize_spool()
+    if WORKER_RUNTIME == "async":
+        run_async_worker()
+    else:
+        worker_loop()
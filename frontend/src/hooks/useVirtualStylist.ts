@@ -9,6 +9,15 @@ import {
 
 const EMPTY_CATALOG: CatalogResponse = { families: [] };
 
+function toGeneratedImage(img: ImageResult): GeneratedImage {
+  return {
+    cut: img.cut,
+    url: img.url,
+    width: img.width,
+    height: img.height,
+  };
+}
+
 function getDefaultFamily(families: Family[]): Family | undefined {
   return families.find((family) => family.status === "active") ?? families[0];
 }
@@ -154,26 +163,24 @@ export function useVirtualStylist() {
         swatch_url: swatchUrl,
       });
 
-      // Step 2: Poll for completion
+      // Step 2: Poll for completion, showing each cut as soon as it is ready
       const finalResponse = await waitForJobCompletion(jobResponse.request_id, {
         pollIntervalMs: 2000,
         maxWaitMs: 300000, // 5 minutes
+        onProgress: (progress) => {
+          if (progress.images.length > 0) {
+            setImages(progress.images.map(toGeneratedImage));
+          }
+        },
       });
 
       // Step 3: Check if generation succeeded
-      if (finalResponse.status === "failed") {
+      if (finalResponse.status === "failed" || finalResponse.status === "expired") {
         throw new Error(finalResponse.meta?.error || "Generation failed");
       }
 
       // Step 4: Convert ImageResult to GeneratedImage
-      const generatedImages: GeneratedImage[] = finalResponse.images.map((img: ImageResult) => ({
-        cut: img.cut,
-        url: img.url,
-        width: img.width,
-        height: img.height,
-      }));
-
-      setImages(generatedImages);
+      setImages(finalResponse.images.map(toGeneratedImage));
     } catch (error) {
       console.error(error);
       setGenerationError(
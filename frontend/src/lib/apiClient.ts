@@ -119,6 +119,8 @@ export type GenerateRequest = {
   seed?: number;
   quality?: "preview" | "final";
   swatch_url?: string;  // Custom swatch image URL for IP-Adapter
+  mode?: "full" | "inpaint";  // Generator the job needs (any worker if omitted)
+  profile?: string;  // Generation profile (worker default if omitted)
 };
 
 export type ImageResult = {
@@ -132,7 +134,7 @@ export type ImageResult = {
 
 export type GenerateResponse = {
   request_id: string;
-  status: "completed" | "pending" | "failed";
+  status: "completed" | "pending" | "processing" | "failed" | "expired";
   images: ImageResult[];
   duration_ms?: number;
   meta?: Record<string, string>;
@@ -161,18 +163,25 @@ export const getJobStatus = (jobId: string) =>
 // Helper: Poll job until completion or failure
 export async function waitForJobCompletion(
   jobId: string,
-  options: { pollIntervalMs?: number; maxWaitMs?: number } = {}
+  options: {
+    pollIntervalMs?: number;
+    maxWaitMs?: number;
+    // Called with each poll response; processing jobs already carry finished cuts
+    onProgress?: (response: GenerateResponse) => void;
+  } = {}
 ): Promise<GenerateResponse> {
-  const { pollIntervalMs = 2000, maxWaitMs = 300000 } = options; // 2s poll, 5min max
+  const { pollIntervalMs = 2000, maxWaitMs = 300000, onProgress } = options; // 2s poll, 5min max
   const startTime = Date.now();
 
   while (true) {
     const response = await getJobStatus(jobId);
 
-    if (response.status === "completed" || response.status === "failed") {
+    if (response.status === "completed" || response.status === "failed" || response.status === "expired") {
       return response;
     }
 
+    onProgress?.(response);
+
     // Check timeout
     if (Date.now() - startTime > maxWaitMs) {
       throw new Error(`Job ${jobId} timed out after ${maxWaitMs}ms`);